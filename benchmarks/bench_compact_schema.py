@@ -0,0 +1,78 @@
+"""
+Benchmark of the memory used by the frames of the pipeline with the default
+dtypes and with the compact schema, on synthetic data of growing size.
+
+Run from the root of the repo with:
+    python -m benchmarks.bench_compact_schema
+"""
+
+import os
+import tempfile
+
+from benchmarks.synthetic_data import (
+    DATATYPES,
+    make_weather,
+    monthly_utility,
+    write_cdo_json,
+)
+from functions.functions_manage_data import (
+    flatten_json,
+    merge_all_df,
+    read_utility,
+)
+
+ROW_COUNTS = (10**4, 10**5, 10**6)
+
+
+def frame_mb(df):
+    """
+    Measure the memory used by a dataframe, including its strings.
+
+    Args:
+        df: a pandas dataframe.
+    Returns:
+        A float of the memory in MB.
+    """
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def main():
+    """
+    Print the memory of the flattened, utility and merged frames with both
+    schemas.
+    """
+    print(f"{'rows':>8} {'frame':<10}{'default MB':>12}{'compact MB':>12}")
+    for n_rows in ROW_COUNTS:
+        with tempfile.TemporaryDirectory() as directory:
+            for seed, datatype in enumerate(DATATYPES):
+                write_cdo_json(
+                    os.path.join(directory, f"{datatype}.json"),
+                    n_rows,
+                    datatype,
+                    seed,
+                )
+            util_path = os.path.join(directory, "utility.csv")
+            monthly_utility(make_weather(n_rows)).to_csv(util_path, index=False)
+
+            sizes = {}
+            for compact in (False, True):
+                list_df_weather = [
+                    flatten_json(datatype, data_dir=directory, compact=compact)
+                    for datatype in DATATYPES
+                ]
+                df_util = read_utility(util_path, compact=compact)
+                df_all_data = merge_all_df(list_df_weather, df_util, compact)
+                sizes[compact] = {
+                    "flattened": sum(map(frame_mb, list_df_weather)),
+                    "utility": frame_mb(df_util),
+                    "merged": frame_mb(df_all_data),
+                }
+            for frame in sizes[False]:
+                print(
+                    f"{n_rows:>8} {frame:<10}{sizes[False][frame]:>12.2f}"
+                    f"{sizes[True][frame]:>12.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
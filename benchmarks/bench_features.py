@@ -0,0 +1,74 @@
+"""
+Benchmark of building a few hundred candidate features from decades of daily
+climate data.
+
+Run from the root of the repo with:
+    python -m benchmarks.bench_features
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from functions.functions_features import build_features, monthly_features
+
+N_YEARS = 50
+DATATYPES = ("TAVG", "TMAX", "TMIN", "PRCP", "SNOW", "SNWD", "AWND", "WSF2")
+BASES = (50, 55, 60, 65, 70)
+LAGS = (1, 2, 3, 7, 14, 30)
+WINDOWS = (7, 30, 90, 365)
+
+
+def make_wide(n_years=N_YEARS, seed=0):
+    """
+    Make a wide table of random daily climate data.
+
+    Args:
+        n_years: an integer of the number of years of data.
+        seed: an integer seed of the random values.
+    Returns:
+        A pandas dataframe shaped like the output of `build_wide_table`.
+    """
+    dates = pd.date_range("1970-01-01", periods=round(n_years * 365.25))
+    rng = np.random.default_rng(seed)
+    df_wide = pd.DataFrame(
+        rng.normal(50, 20, (len(dates), len(DATATYPES))), columns=DATATYPES
+    )
+    df_wide.insert(0, "date", dates)
+    return df_wide
+
+
+def main():
+    """
+    Print the number of features and the time taken to build them.
+    """
+    df_wide = make_wide()
+    start = time.perf_counter()
+    df_features = build_features(
+        df_wide, bases=BASES, lags=LAGS, windows=WINDOWS
+    )
+    built = time.perf_counter()
+    df_monthly = monthly_features(df_features)
+    end = time.perf_counter()
+    print(
+        f"{len(df_wide)} days x {df_features.shape[1] - 1} features: "
+        f"built in {built - start:.2f} s, "
+        f"averaged to {len(df_monthly)} months in {end - built:.2f} s"
+    )
+
+    # Reference: the same rolling features with pandas, column by column
+    start = time.perf_counter()
+    for column in DATATYPES:
+        for window in WINDOWS:
+            rolling = df_wide[column].rolling(window)
+            rolling.apply(np.mean, raw=True)
+            rolling.apply(np.max, raw=True)
+    print(
+        f"rolling().apply on the {len(DATATYPES)} raw columns: "
+        f"{time.perf_counter() - start:.2f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark of the concurrent CDO fetcher against a local stand-in HTTP server
+that adds a fixed latency to every response.
+
+Run from the root of the repo with:
+    python -m benchmarks.bench_fetch_data
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from functions.functions_fetch_data import (
+    RateLimiter,
+    build_queries,
+    fetch_data,
+)
+
+LATENCY = 0.1
+RESULT_COUNT = 3000
+PAGE_LIMIT = 1000
+DATATYPES = ["TAVG", "PRCP", "AWND", "TMAX", "TMIN", "SNOW"]
+
+
+class SlowCDOHandler(BaseHTTPRequestHandler):
+    """
+    Serves paginated CDO-shaped results after sleeping for `LATENCY` seconds.
+    """
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Respond with the page of results requested by `offset` and `limit`.
+        """
+        time.sleep(LATENCY)
+        query = parse_qs(urlparse(self.path).query)
+        offset = int(query["offset"][0])
+        limit = int(query["limit"][0])
+        results = [
+            {"date": "2013-01-01T00:00:00", "value": float(i)}
+            for i in range(offset, min(offset + limit, RESULT_COUNT + 1))
+        ]
+        body = json.dumps(
+            {
+                "metadata": {"resultset": {"count": RESULT_COUNT}},
+                "results": results,
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+def main():
+    """
+    Time fetching every datatype with an increasing number of workers.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowCDOHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/data"
+
+    queries = build_queries(
+        "GSOM", ["GHCND:A"], DATATYPES, "2013-01-01", "2013-12-31", "standard"
+    )
+    n_requests = len(queries) * -(-RESULT_COUNT // PAGE_LIMIT)
+    print(f"{n_requests} requests, {LATENCY * 1000:.0f} ms latency each")
+    for workers in (1, 2, 5, 10):
+        # The benchmark measures concurrency, so lift the CDO quotas and
+        # leave the daily usage of the real API untouched
+        limiter = RateLimiter(
+            per_second=1000, per_day=10**6, usage_path=None
+        )
+        start = time.perf_counter()
+        fetch_data(
+            queries,
+            "token",
+            url=url,
+            limit=PAGE_LIMIT,
+            max_workers=workers,
+            limiter=limiter,
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f"workers={workers:>2}: {elapsed:.2f} s "
+            f"(N x latency / workers = {n_requests * LATENCY / workers:.2f} s)"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
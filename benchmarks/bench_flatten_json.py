@@ -0,0 +1,97 @@
+"""
+Benchmark of the peak memory of `flatten_json_chunks` against loading the
+whole .json file, as the file grows.
+
+Each measurement runs in a fresh interpreter so that its peak resident set
+size (RSS) is not affected by the previous ones.
+
+Run from the root of the repo with:
+    python -m benchmarks.bench_flatten_json
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROW_COUNTS = (10**4, 10**5, 10**6)
+
+
+def write_cdo_json(path, n_rows):
+    """
+    Write a .json file shaped like a CDO response with `n_rows` results.
+
+    Args:
+        path: a string of the path of the file to write.
+        n_rows: an integer of the number of results.
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('{"metadata": {"resultset": {"offset": 1, "count": ')
+        file.write(f'{n_rows}, "limit": {n_rows}}}}},\n"results": [\n')
+        for i in range(n_rows):
+            row = {
+                "date": f"{1900 + i // 365 % 120}-01-01T00:00:00",
+                "datatype": "TAVG",
+                "station": f"GHCND:USW000{i % 100:05d}",
+                "attributes": ",W",
+                "value": i % 1000 / 10,
+            }
+            file.write(("," if i else "") + json.dumps(row) + "\n")
+        file.write("]}\n")
+
+
+def measure(mode, data_dir, name):
+    """
+    Flatten a .json file in a child process and return its peak RSS.
+
+    Args:
+        mode: "stream" to use `flatten_json_chunks`, "full" to load the
+        whole file with `json.loads` and `pd.json_normalize`.
+        data_dir: a string of the folder containing the file.
+        name: a string of the file name without extension.
+    Returns:
+        A float of the peak RSS of the child process in MB.
+    """
+    json_path = os.path.join(data_dir, name + ".json")
+    code = f"""
+import json, resource
+import pandas as pd
+from functions.functions_manage_data import flatten_json_chunks
+if {mode!r} == "stream":
+    chunks = flatten_json_chunks({name!r}, 10000, {data_dir!r})
+    rows = sum(len(chunk) for chunk in chunks)
+else:
+    with open({json_path!r}, encoding="utf-8") as file:
+        data = json.loads(file.read())
+    rows = len(pd.json_normalize(data, record_path=["results"]))
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024**2 if sys.platform == "darwin" else 1024
+    return int(output.split()[-1]) / scale
+
+
+def main():
+    """
+    Print the peak RSS of both modes for each file size.
+    """
+    with tempfile.TemporaryDirectory() as data_dir:
+        for n_rows in ROW_COUNTS:
+            name = f"bench_{n_rows}"
+            write_cdo_json(os.path.join(data_dir, name + ".json"), n_rows)
+            size = os.path.getsize(os.path.join(data_dir, name + ".json"))
+            size /= 1024**2
+            stream = measure("stream", data_dir, name)
+            full = measure("full", data_dir, name)
+            print(
+                f"{n_rows:>8} rows ({size:6.1f} MB file): "
+                f"stream {stream:7.1f} MB, full {full:7.1f} MB peak RSS"
+            )
+
+
+if __name__ == "__main__":
+    main()
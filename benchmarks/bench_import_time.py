@@ -0,0 +1,52 @@
+"""
+Benchmark of the cold import time of every helper module, measured with
+`python -X importtime` in a new interpreter for each module.
+
+Run from the root of the repo with:
+    python -m benchmarks.bench_import_time
+"""
+
+import glob
+import os
+import subprocess
+import sys
+
+REPEAT = 3
+
+
+def cumulative_import_time(module):
+    """
+    Measure the cumulative import time of a module in a new interpreter.
+
+    Args:
+        module: a string of the name of the module to import.
+    Returns:
+        A float of the import time in seconds.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in process.stderr.splitlines():
+        if line.rstrip().endswith(f"| {module}"):
+            return int(line.split("|")[1]) / 1e6
+    raise ValueError(f"{module} was not imported")
+
+
+def main():
+    """
+    Print the best of `REPEAT` import times of each module.
+    """
+    modules = ["pandas"] + sorted(
+        "functions." + os.path.basename(path)[:-3]
+        for path in glob.glob("functions/functions_*.py")
+    )
+    for module in modules:
+        best = min(cumulative_import_time(module) for _ in range(REPEAT))
+        print(f"{module:<36} {best * 1000:>7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
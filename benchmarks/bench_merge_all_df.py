@@ -0,0 +1,105 @@
+"""
+Benchmark of `build_wide_table` against the iterative merge loop that
+`merge_all_df` used before, as the number of datatypes grows.
+
+Run from the root of the repo with:
+    python -m benchmarks.bench_merge_all_df
+"""
+
+import itertools
+import string
+import time
+
+import numpy as np
+import pandas as pd
+
+from functions.functions_manage_data import build_wide_table
+
+N_DATES = 3650
+DATATYPE_COUNTS = (3, 10, 25, 50, 100)
+
+
+def merge_loop(list_df_weather):
+    """
+    The previous implementation: one merge per dataframe, renaming the
+    columns from the `datatype` columns at each step.
+
+    Args:
+        list_df_weather: a list of climate pandas dataframes.
+    Returns:
+        A pandas dataframe with a `date` column and one column per datatype.
+    """
+    col_names = ["date"]
+    df_merge = list_df_weather[0]
+    for dataframe in list_df_weather[1:]:
+        df_merge = pd.merge(left=df_merge, right=dataframe, on="date")
+        df_filtered = df_merge.filter(regex="date|value|[A-Z]{4}", axis=1)
+        col_names = (
+            col_names + df_merge.filter(regex="datatype").iloc[0, :].tolist()
+        )
+        df_filtered.columns = col_names
+        df_merge = df_filtered
+    return df_merge
+
+
+def make_frames(datatypes):
+    """
+    Create one CDO-shaped dataframe of daily values per datatype.
+
+    Args:
+        datatypes: a list of strings of datatype IDs.
+    Returns:
+        A list of pandas dataframes.
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2013-01-01", periods=N_DATES, freq="D")
+    return [
+        pd.DataFrame(
+            {
+                "date": dates,
+                "datatype": datatype,
+                "station": "GHCND:USW00014739",
+                "attributes": ",W",
+                "value": rng.normal(size=N_DATES),
+            }
+        )
+        for datatype in datatypes
+    ]
+
+
+def best_time(function, *args, repeat=3):
+    """
+    Return the fastest of `repeat` calls of `function`, in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    """
+    Print the time of both implementations for each number of datatypes.
+    """
+    # The old loop only keeps columns named with four capital letters, so
+    # pad the datatypes listed in data/datatypes.csv with made-up ones
+    ids = pd.read_csv("data/datatypes.csv")["id"]
+    ids = ids[ids.str.fullmatch("[A-Z]{4}")].unique().tolist()
+    ids += [
+        "X" + "".join(letters)
+        for letters in itertools.product(string.ascii_uppercase, repeat=3)
+    ][: max(DATATYPE_COUNTS) - len(ids)]
+    for count in DATATYPE_COUNTS:
+        frames = make_frames(ids[:count])
+        loop = best_time(merge_loop, frames)
+        wide = best_time(build_wide_table, frames)
+        print(
+            f"{count:>3} datatypes: loop {loop * 1000:8.1f} ms, "
+            f"wide table {wide * 1000:6.1f} ms ({loop / wide:5.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark of the shared date and time-of-day parsing against parsing with
+format inference.
+
+Run from the root of the repo with:
+    python -m benchmarks.bench_parse
+"""
+
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from functions.functions_parse import time_to_minutes, to_datetime64
+
+N_ROWS = 10**6
+
+
+def best_time(function, repeat=3):
+    """
+    Get the best time of several calls of a function without arguments.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    """
+    Print the time of each way of parsing a column of `N_ROWS` strings.
+    """
+    warnings.filterwarnings("ignore", "Could not infer format")
+    rng = np.random.default_rng(0)
+    minutes = rng.integers(0, 24 * 60, N_ROWS)
+    times = pd.Series(
+        [f"{minute // 60:02d}:{minute % 60:02d}:00" for minute in minutes]
+    )
+    dates = pd.Series(
+        pd.date_range("1970-01-01", periods=N_ROWS, freq="h").strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+    )
+
+    cases = {
+        "times, to_datetime twice": lambda: (
+            pd.to_datetime(times).dt.hour
+            + pd.to_datetime(times).dt.minute / 60
+        ),
+        "times, time_to_minutes": lambda: time_to_minutes(times),
+        "dates, inferred format": lambda: pd.to_datetime(dates),
+        "dates, to_datetime64": lambda: to_datetime64(dates),
+    }
+    print(f"{N_ROWS} rows")
+    for name, function in cases.items():
+        repeat = 1 if "twice" in name else 3
+        print(f"{name:<26}{best_time(function, repeat):>8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
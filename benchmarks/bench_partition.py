@@ -0,0 +1,92 @@
+"""
+Benchmark of merging and scoring synthetic data all at once against doing it
+one partition of years at a time, in this process and over a process pool.
+
+Run from the root of the repo with:
+    python -m benchmarks.bench_partition
+
+The peak memory of the process pool runs only counts the parent process.
+"""
+
+import os
+import tempfile
+
+from benchmarks.bench_suite import measure
+from benchmarks.synthetic_data import (
+    DATATYPES,
+    make_weather,
+    monthly_utility,
+    write_cdo_json,
+)
+from functions.functions_f_test import IncrementalFRegression
+from functions.functions_manage_data import (
+    flatten_json,
+    merge_all_df,
+    read_utility,
+    update_columnar,
+)
+from functions.functions_partition import (
+    TARGETS,
+    merge_and_score_partitioned,
+)
+
+ROW_COUNTS = (10**5, 10**6)
+
+
+def merge_and_score(directory, util_path):
+    """
+    Merge all the data and score it in one go, as the notebook does.
+    """
+    list_df_weather = [
+        flatten_json(datatype, data_dir=directory) for datatype in DATATYPES
+    ]
+    df_all_data = merge_all_df(list_df_weather, read_utility(util_path))
+    features = [
+        column
+        for column in df_all_data.select_dtypes("number").columns
+        if column not in TARGETS
+    ]
+    return IncrementalFRegression(features, TARGETS).update(
+        df_all_data, df_all_data
+    )
+
+
+def main():
+    """
+    Print the time and peak memory of each way of merging and scoring.
+    """
+    n_cpus = os.cpu_count() or 1
+    print(f"{'rows':>8} {'mode':<16}{'seconds':>10}{'peak MB':>10}")
+    for n_rows in ROW_COUNTS:
+        with tempfile.TemporaryDirectory() as directory:
+            for seed, datatype in enumerate(DATATYPES):
+                write_cdo_json(
+                    os.path.join(directory, f"{datatype}.json"),
+                    n_rows,
+                    datatype,
+                    seed,
+                )
+                update_columnar(datatype, directory)
+            util_path = os.path.join(directory, "utility.csv")
+            monthly_utility(make_weather(n_rows)).to_csv(util_path, index=False)
+
+            cases = {"whole": lambda: merge_and_score(directory, util_path)}
+            for n_workers in sorted({1, n_cpus}):
+                cases[f"partitioned x{n_workers}"] = (
+                    lambda n_workers=n_workers: merge_and_score_partitioned(
+                        DATATYPES,
+                        util_path,
+                        directory,
+                        max_workers=n_workers,
+                    )
+                )
+            for name, function in cases.items():
+                result = measure(function, repeat=1)
+                print(
+                    f"{n_rows:>8} {name:<16}{result['seconds']:>10.2f}"
+                    f"{result['peak_mb']:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark of the render time and SVG size of `plot_weather_util_2_plots` as
+the number of rows grows, to check that decimation keeps both flat.
+
+Run from the root of the repo with:
+    python -m benchmarks.bench_plot_data
+"""
+
+import io
+import time
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+from functions.functions_plot_data import (
+    FIGSIZE_2_PLOTS,
+    plot_weather_util_2_plots,
+)
+
+ROW_COUNTS = (10**3, 10**4, 10**5, 10**6)
+
+
+def make_hourly(n_rows, seed=0):
+    """
+    Make an hourly temperature and consumption series with daily and yearly
+    cycles and noise.
+
+    Args:
+        n_rows: an integer of the number of hours.
+        seed: an integer seed of the random noise.
+    Returns:
+        A pandas dataframe shaped like the output of `join_dataframes`.
+    """
+    rng = np.random.default_rng(seed)
+    hours = np.arange(n_rows)
+    temperature = (
+        50
+        - 20 * np.cos(2 * np.pi * hours / 8766)
+        - 8 * np.cos(2 * np.pi * hours / 24)
+        + rng.normal(0, 3, n_rows)
+    )
+    return pd.DataFrame(
+        {
+            "date": pd.date_range("2000-01-01", periods=n_rows, freq="h"),
+            "datatype": "TAVG",
+            "value": temperature,
+            "total_consumption": (
+                500 + 8 * np.abs(temperature - 60) + rng.normal(0, 20, n_rows)
+            ),
+        }
+    )
+
+
+def main():
+    """
+    Time rendering one figure to SVG for an increasing number of rows.
+    """
+    for n_rows in ROW_COUNTS:
+        df_util_weather = make_hourly(n_rows)
+        start = time.perf_counter()
+        fig = plot_weather_util_2_plots(
+            df_util_weather, fig=Figure(figsize=FIGSIZE_2_PLOTS), show=False
+        )
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="svg")
+        elapsed = time.perf_counter() - start
+        print(
+            f"rows={n_rows:>8}: {elapsed:.2f} s, "
+            f"{buffer.tell() / 1e6:.2f} MB of SVG"
+        )
+
+
+if __name__ == "__main__":
+    main()
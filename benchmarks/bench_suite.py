@@ -0,0 +1,186 @@
+"""
+Benchmark suite timing and memory-profiling the data pipeline on synthetic
+data of growing size, compared against saved baseline results.
+
+Run from the root of the repo with:
+    python -m benchmarks.bench_suite [--max-exp 7] [--save]
+
+Sizes go from 10^2 rows to 10^`--max-exp` rows. `--save` overwrites the
+baseline file, so a regression shows up in its diff.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic_data import (
+    DATATYPES,
+    make_utility,
+    make_weather,
+    monthly_utility,
+    write_cdo_json,
+)
+from functions.functions_f_test import feature_selection
+from functions.functions_manage_data import (
+    calc_weather_util_corr,
+    filter_season,
+    flatten_json,
+    join_dataframes,
+    merge_all_df,
+)
+from jitter_data import jitter_utility_df
+
+BASELINE_PATH = "benchmarks/baselines/suite.json"
+MIN_EXP = 2
+MAX_EXP = 5
+REPEAT = 3
+
+
+def measure(function, repeat=REPEAT):
+    """
+    Time a function and measure its peak memory allocations.
+
+    Args:
+        function: a function without arguments.
+        repeat: an integer of the number of timed calls.
+    Returns:
+        A dictionary with the best time in `seconds` and the peak memory
+        allocated during one more call, traced by `tracemalloc`, in `peak_mb`.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(best, 4), "peak_mb": round(peak / 1e6, 2)}
+
+
+def make_cases(n_rows, directory):
+    """
+    Write the synthetic input files and prepare the benchmarked calls.
+
+    Args:
+        n_rows: an integer of the number of weather results per datatype, and
+        of utility bills for the jitter.
+        directory: a string of the folder the synthetic files are written to.
+    Returns:
+        A dictionary mapping the name of each case to a function without
+        arguments.
+    """
+    for seed, datatype in enumerate(DATATYPES):
+        write_cdo_json(
+            os.path.join(directory, f"{datatype}.json"), n_rows, datatype, seed
+        )
+    util_path = os.path.join(directory, "utility.csv")
+    make_utility(n_rows).to_csv(util_path, index=False)
+    store_dir = os.path.join(directory, "columnar")
+
+    def flatten_cold():
+        shutil.rmtree(store_dir, ignore_errors=True)
+        return flatten_json("TAVG", data_dir=directory)
+
+    list_df_weather = [
+        flatten_json(datatype, data_dir=directory) for datatype in DATATYPES
+    ]
+    df_util = monthly_utility(make_weather(n_rows))
+    df_util_temp = join_dataframes(list_df_weather[0], df_util)
+    df_all_data = merge_all_df(list_df_weather, df_util)
+    features = df_all_data.drop(columns=["total_consumption", "year-month"])
+    target = df_all_data["total_consumption"]
+
+    return {
+        "flatten_json (cold)": flatten_cold,
+        "flatten_json (warm)": lambda: flatten_json("TAVG", data_dir=directory),
+        "join_dataframes": lambda: join_dataframes(
+            list_df_weather[0], df_util
+        ),
+        "merge_all_df": lambda: merge_all_df(list_df_weather, df_util),
+        "filter_season": lambda: filter_season("Winter", df_util_temp),
+        "calc_weather_util_corr": lambda: calc_weather_util_corr(df_util_temp),
+        "feature_selection": lambda: feature_selection(features, target),
+        "jitter_utility_df": lambda: jitter_utility_df(
+            util_path, os.path.join(directory, "jittered.csv"), seed=0
+        ),
+    }
+
+
+def load_baseline(baseline_path):
+    """
+    Load saved benchmark results.
+
+    Args:
+        baseline_path: a string of the path of the baseline .json file.
+    Returns:
+        A dictionary mapping each case name to a dictionary mapping each
+        number of rows, as a string, to the output of `measure`.
+    """
+    try:
+        with open(baseline_path, encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def run(max_exp=MAX_EXP, baseline=None):
+    """
+    Run every case at every size, printing the results and their ratio to
+    the baseline.
+
+    Args:
+        max_exp: an integer of the exponent of the largest number of rows.
+        baseline: an optional dictionary of results, as returned by
+        `load_baseline`.
+    Returns:
+        A dictionary of the results, shaped like `baseline`.
+    """
+    baseline = baseline or {}
+    results = {}
+    print(f"{'case':<24}{'rows':>10}{'seconds':>10}{'peak MB':>10}{'ratio':>8}")
+    for exp in range(MIN_EXP, max_exp + 1):
+        n_rows = 10**exp
+        with tempfile.TemporaryDirectory() as directory:
+            for name, function in make_cases(n_rows, directory).items():
+                # Large sizes take long enough to be timed once
+                result = measure(function, REPEAT if exp < 6 else 1)
+                results.setdefault(name, {})[str(n_rows)] = result
+                previous = baseline.get(name, {}).get(str(n_rows))
+                ratio = (
+                    f"{result['seconds'] / previous['seconds']:.2f}"
+                    if previous and previous["seconds"]
+                    else "-"
+                )
+                print(
+                    f"{name:<24}{n_rows:>10}{result['seconds']:>10.4f}"
+                    f"{result['peak_mb']:>10.2f}{ratio:>8}"
+                )
+    return results
+
+
+def main():
+    """
+    Parse the command line arguments and run the suite.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-exp", type=int, default=MAX_EXP)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args.max_exp, load_baseline(args.baseline))
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=1, sort_keys=True)
+            file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
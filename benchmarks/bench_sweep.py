@@ -0,0 +1,99 @@
+"""
+Benchmark of the feature-selection sweep against a loop over the same
+configurations that copies the data for each one.
+
+Run from the root of the repo with:
+    python -m benchmarks.bench_sweep
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from functions.functions_f_test import (
+    SWEEP_KS,
+    SWEEP_SCORE_FUNCTIONS,
+    feature_selection_sweep,
+)
+from functions.functions_manage_data import SEASONS
+
+N_ROWS = 2000
+N_FEATURES = 100
+N_SPLITS = 5
+
+
+def make_data(n_rows=N_ROWS, n_features=N_FEATURES, seed=0):
+    """
+    Make random features, a month column and a target depending on the
+    first few features.
+
+    Returns:
+        A tuple of a pandas dataframe of features and a pandas series of the
+        target.
+    """
+    rng = np.random.default_rng(seed)
+    features = pd.DataFrame(
+        rng.standard_normal((n_rows, n_features)),
+        columns=[f"x{i}" for i in range(n_features)],
+    )
+    features["month"] = rng.integers(1, 13, n_rows)
+    target = features.iloc[:, :5].sum(axis=1) + rng.standard_normal(n_rows)
+    return features, target
+
+
+def loop_sweep(features, target, seed=0):
+    """
+    Score every configuration of the sweep in a loop, selecting the rows of
+    each one from the dataframe.
+    """
+    from sklearn.feature_selection import f_regression, mutual_info_regression
+    from sklearn.model_selection import KFold
+
+    score = {
+        "f_regression": lambda x, y: f_regression(x, y)[0],
+        "mutual_info": lambda x, y: mutual_info_regression(
+            x, y, random_state=seed
+        ),
+    }
+    subsets = {"All": features}
+    for season, months in SEASONS.items():
+        subsets[season] = features[features["month"].isin(map(int, months))]
+    for df_subset in subsets.values():
+        y_subset = target.loc[df_subset.index]
+        for score_function in SWEEP_SCORE_FUNCTIONS:
+            score[score_function](df_subset, y_subset)
+            folds = KFold(N_SPLITS, shuffle=True, random_state=seed)
+            for train, _ in folds.split(df_subset):
+                score[score_function](
+                    df_subset.iloc[train], y_subset.iloc[train]
+                )
+
+
+def main():
+    """
+    Print the time of the loop and of the sweep with one and all CPUs.
+    """
+    features, target = make_data()
+    cases = {"loop": lambda: loop_sweep(features, target)}
+    for n_workers in sorted({1, os.cpu_count() or 1}):
+        cases[f"sweep x{n_workers}"] = (
+            lambda n_workers=n_workers: feature_selection_sweep(
+                features,
+                target,
+                ks=SWEEP_KS,
+                n_splits=N_SPLITS,
+                seed=0,
+                max_workers=n_workers,
+            )
+        )
+    print(f"{N_ROWS} rows x {N_FEATURES} features")
+    for name, function in cases.items():
+        start = time.perf_counter()
+        function()
+        print(f"{name:<10}{time.perf_counter() - start:>8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
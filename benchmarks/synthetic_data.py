@@ -0,0 +1,164 @@
+"""
+Generator of synthetic CDO weather .json files and utility .csv files of any
+size, shaped like the files in `data/`, for the benchmarks.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from functions.functions_parse import to_datetime64
+
+DATATYPES = ("TAVG", "PRCP", "AWND")
+START_DATE = "1950-01-01"
+
+# Dates per station before more stations are added, and the frequencies
+# tried in order until a series of that length ends before the year 2200
+MAX_DATES = 36525
+FREQUENCIES = ("MS", "D", "h", "min")
+LAST_DATE = pd.Timestamp("2200-01-01")
+
+# Rows converted to JSON text at a time
+WRITE_CHUNK = 200000
+
+
+def pick_freq(n_dates, start_date=START_DATE):
+    """
+    Pick the coarsest frequency at which `n_dates` dates from `start_date` end
+    before `LAST_DATE`.
+
+    Args:
+        n_dates: an integer of the number of dates.
+        start_date: a string of the first date.
+    Returns:
+        A string of a pandas frequency.
+    """
+    for freq in FREQUENCIES:
+        end = pd.date_range(start_date, periods=2, freq=freq)[1]
+        step = end - pd.Timestamp(start_date)
+        if pd.Timestamp(start_date) + step * n_dates < LAST_DATE:
+            return freq
+    raise ValueError(f"{n_dates} dates do not fit at any frequency")
+
+
+def _weather_values(datatype, dates, rng):
+    day_of_year = dates.dayofyear.to_numpy()
+    season = np.cos(2 * np.pi * (day_of_year - 200) / 365.25)
+    noise = rng.standard_normal(len(dates))
+    if datatype == "TAVG":
+        return np.round(50 + 22 * season + 4 * noise, 1)
+    if datatype == "PRCP":
+        return np.round(np.abs(4 + 1.5 * noise), 2)
+    return np.round(np.abs(10 - 2 * season + 1.5 * noise), 1)
+
+
+def make_weather(n_rows, datatype="TAVG", seed=0):
+    """
+    Make CDO-shaped weather results of one datatype, split over as many
+    stations as needed to keep at most `MAX_DATES` dates per station.
+
+    Args:
+        n_rows: an integer of the number of results.
+        datatype: a string of the CDO datatype ID.
+        seed: an integer seed of the random values.
+    Returns:
+        A pandas dataframe with the `date`, `datatype`, `station`,
+        `attributes` and `value` columns of CDO results, dates as strings.
+    """
+    rng = np.random.default_rng(seed)
+    n_stations = -(-n_rows // MAX_DATES)
+    n_dates = -(-n_rows // n_stations)
+    dates = pd.date_range(START_DATE, periods=n_dates, freq=pick_freq(n_dates))
+    station_ids = [f"GHCND:SYN{i:08d}" for i in range(n_stations)]
+    positions = np.arange(n_rows)
+    return pd.DataFrame(
+        {
+            "date": dates.strftime("%Y-%m-%dT%H:%M:%S")[positions % n_dates],
+            "datatype": datatype,
+            "station": np.array(station_ids)[positions // n_dates],
+            "attributes": ",W",
+            "value": _weather_values(
+                datatype, dates[positions % n_dates], rng
+            ),
+        }
+    )
+
+
+def write_cdo_json(json_path, n_rows, datatype="TAVG", seed=0):
+    """
+    Write a synthetic CDO response to a .json file, like the ones written by
+    `get_data_api`.
+
+    Args:
+        json_path: a string of the path of the .json file.
+        n_rows: an integer of the number of results.
+        datatype: a string of the CDO datatype ID.
+        seed: an integer seed of the random values.
+    Returns:
+        Nothing.
+    """
+    df_weather = make_weather(n_rows, datatype, seed)
+    metadata = {"resultset": {"offset": 1, "count": n_rows, "limit": n_rows}}
+    with open(json_path, "w", encoding="utf-8") as file:
+        file.write('{"metadata": ' + json.dumps(metadata) + ', "results": [')
+        for start in range(0, n_rows, WRITE_CHUNK):
+            chunk = df_weather.iloc[start : start + WRITE_CHUNK]
+            if start:
+                file.write(",")
+            # Strip the brackets of the array of records
+            file.write(chunk.to_json(orient="records")[1:-1])
+        file.write("]}")
+
+
+def make_utility(n_rows, start_date=START_DATE, seed=0):
+    """
+    Make utility bills shaped like `electricity_FY13_23_jittered.csv`, read
+    at the coarsest frequency that fits `n_rows` consecutive bills.
+
+    Args:
+        n_rows: an integer of the number of bills.
+        start_date: a string of the first read date.
+        seed: an integer seed of the random values.
+    Returns:
+        A pandas dataframe of the `start_read_date`, `end_read_date`,
+        `total_consumption`, `time_of_peak_demand` and `total_cost` columns.
+    """
+    rng = np.random.default_rng(seed)
+    reads = pd.date_range(
+        start_date, periods=n_rows + 1, freq=pick_freq(n_rows + 1, start_date)
+    )
+    day_of_year = reads[:-1].dayofyear.to_numpy()
+    season = np.cos(4 * np.pi * (day_of_year - 20) / 365.25)
+    consumption = 3e5 + 4e4 * season + 2e4 * rng.standard_normal(n_rows)
+    cost = 0.17 * consumption + 3e3 * rng.standard_normal(n_rows)
+    minutes = rng.integers(9 * 60, 18 * 60, n_rows)
+    time_labels = np.array(
+        [f"{minute // 60:02d}:{minute % 60:02d}:00" for minute in range(1440)]
+    )
+    return pd.DataFrame(
+        {
+            "start_read_date": reads[:-1].strftime("%Y-%m-%d %H:%M:%S"),
+            "end_read_date": reads[1:].strftime("%Y-%m-%d %H:%M:%S"),
+            "total_consumption": consumption,
+            "time_of_peak_demand": time_labels[minutes],
+            "total_cost": cost,
+        }
+    )
+
+
+def monthly_utility(df_weather, seed=0):
+    """
+    Make one monthly utility bill for every month covered by weather data.
+
+    Args:
+        df_weather: a pandas dataframe with a `date` column.
+        seed: an integer seed of the random values.
+    Returns:
+        A pandas dataframe of utility bills, as returned by `make_utility`.
+    """
+    months = to_datetime64(df_weather["date"]).astype("datetime64[M]")
+    n_months = int(months.max() - months.min()) + 1
+    return make_utility(
+        n_months, str(months.min().astype("datetime64[D]")), seed
+    )
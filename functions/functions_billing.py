@@ -0,0 +1,97 @@
+"""
+File containing helper functions that aggregate daily weather data over the
+exact billing period of each utility bill.
+"""
+
+import numpy as np
+import pandas as pd
+
+from functions.functions_parse import to_datetime64
+
+BILLING_STATS = ("sum", "mean", "min", "max", "coverage")
+
+
+def _window_reduce(ufunc, values, lo, hi):
+    """
+    Reduce `values[lo[i]:hi[i]]` with `ufunc` for every window at once.
+
+    `ufunc.reduceat` reduces between consecutive indices, so interleaving the
+    start and end of each window gives every window's reduction at the even
+    positions, even when windows overlap. Empty windows give NaN.
+    """
+    if len(values) == 0:
+        return np.full(len(lo), np.nan)
+    # Pad with one value so that an end index equal to len(values) is valid
+    padded = np.append(values, values[-1])
+    bounds = np.column_stack([lo, hi]).ravel()
+    reduced = ufunc.reduceat(padded, bounds)[::2]
+    return np.where(hi > lo, reduced, np.nan)
+
+
+def aggregate_billing_windows(df_daily, df_util, stats=BILLING_STATS):
+    """
+    Aggregate daily weather values over the billing period of every bill.
+
+    Each bill covers the days from `start_read_date` up to, but not
+    including, `end_read_date`, so consecutive bills sharing a read date do
+    not count it twice. For each datatype the dates are sorted once and the
+    first and last day of every bill are found with `searchsorted`. Sums and
+    means come from cumulative sums and minima and maxima from one
+    `reduceat`, so all bills are aggregated in a single vectorized pass.
+    Bills may overlap or leave gaps between them.
+
+    Args:
+        df_daily: a pandas dataframe of daily weather data with `date`,
+        `datatype` and `value` columns, for a single station.
+        df_util: a pandas dataframe of utility bills with `start_read_date`
+        and `end_read_date` columns.
+        stats: a tuple of strings of the statistics to compute, among "sum",
+        "mean", "min", "max" and "coverage" (the fraction of days in the bill
+        with a value).
+    Returns:
+        A copy of `df_util` with parsed read dates and a column named
+        "<datatype>_<stat>" for each datatype and statistic.
+    """
+    df_bills = df_util.assign(
+        start_read_date=to_datetime64(df_util["start_read_date"]),
+        end_read_date=to_datetime64(df_util["end_read_date"]),
+    )
+    starts = df_bills["start_read_date"].to_numpy("datetime64[D]")
+    ends = df_bills["end_read_date"].to_numpy("datetime64[D]")
+    n_days = (ends - starts).astype(np.int64)
+
+    days = to_datetime64(df_daily["date"]).astype("datetime64[D]")
+    values = df_daily["value"].to_numpy(float)
+    datatype_codes, datatypes = pd.factorize(df_daily["datatype"])
+
+    new_columns = {}
+    for code, datatype in enumerate(datatypes):
+        mask = (datatype_codes == code) & ~np.isnan(values)
+        order = np.argsort(days[mask], kind="stable")
+        datatype_days = days[mask][order]
+        datatype_values = values[mask][order]
+
+        lo = np.searchsorted(datatype_days, starts, "left")
+        hi = np.searchsorted(datatype_days, ends, "left")
+        count = hi - lo
+        cumsum = np.concatenate([[0.0], np.cumsum(datatype_values)])
+        total = cumsum[hi] - cumsum[lo]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            results = {
+                "sum": np.where(count > 0, total, np.nan),
+                "mean": total / count,
+                "coverage": count / n_days,
+            }
+        if "min" in stats:
+            results["min"] = _window_reduce(
+                np.minimum, datatype_values, lo, hi
+            )
+        if "max" in stats:
+            results["max"] = _window_reduce(
+                np.maximum, datatype_values, lo, hi
+            )
+        for stat in stats:
+            new_columns[f"{datatype}_{stat}"] = results[stat]
+
+    return df_bills.assign(**new_columns)
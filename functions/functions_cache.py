@@ -0,0 +1,375 @@
+"""
+File containing a persistent, incremental cache of CDO API responses, so
+that refreshing the climate data only fetches the dates that are missing.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from functions.functions_fetch_data import build_queries
+
+CACHE_DIR = "data/cache"
+INDEX_NAME = "index.json"
+# File locked while the index is updated, so that several processes can
+# share a cache folder
+LOCK_NAME = "index.lock"
+
+# Entries not used for this many days, or beyond this many entries (least
+# recently used first), are dropped by `ResponseCache.evict`
+MAX_AGE_DAYS = 365
+MAX_ENTRIES = 1000
+
+
+def make_key(dataset_id, station_id, datatype_id, start_date, units):
+    """
+    Compute the cache key of a query.
+
+    The end date is not part of the key: an entry covers everything from
+    `start_date` to the last date recorded with it and grows as it is
+    refreshed.
+
+    Args:
+        dataset_id: a string of the CDO dataset ID.
+        station_id: a string of the CDO station ID.
+        datatype_id: a string of the CDO datatype ID.
+        start_date: a string of the first date in "YYYY-MM-DD" format.
+        units: a string of the units parameter.
+    Returns:
+        A string of the hexadecimal SHA-256 digest of the parameters.
+    """
+    params = [dataset_id, station_id, datatype_id, start_date, units]
+    return hashlib.sha256(json.dumps(params).encode()).hexdigest()
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _file_lock(path):
+    """
+    Hold an exclusive lock on a file, shared by every process.
+    """
+    with open(path, "a+b") as file:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ResponseCache:
+    """
+    Stores the results of CDO queries on disk.
+
+    Results are stored as content-addressed blobs (named by the hash of their
+    content) and an index maps each query key to its blob, the last date it
+    covers and when it was last used. Its methods can be called from several
+    threads at once, and several instances (also in other processes) can
+    share a folder: every change reloads the index from disk under a file
+    lock before saving it, and only deletes the blobs of the entries it
+    dropped itself.
+    """
+
+    def __init__(self, directory=CACHE_DIR, clock=time.time):
+        """
+        Args:
+            directory: a string of the folder the cache is stored in.
+            clock: a function returning the current time in seconds.
+        """
+        self.directory = directory
+        self._clock = clock
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, INDEX_NAME)
+        self._lock_path = os.path.join(directory, LOCK_NAME)
+        self._lock = threading.RLock()
+        self._index_stat = None
+        # Access times of `get` calls, saved with the next change
+        self._accessed = {}
+        self.index = {}
+        self._reload()
+
+    def _reload(self):
+        """
+        Read the index from disk if it changed since it was last read.
+        """
+        try:
+            stat = os.stat(self._index_path)
+        except FileNotFoundError:
+            self.index, self._index_stat = {}, None
+            return
+        signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if signature != self._index_stat:
+            with open(self._index_path, encoding="utf-8") as file:
+                self.index = json.load(file)
+            self._index_stat = signature
+
+    @contextmanager
+    def _update(self):
+        """
+        Change the index: yields the index freshly read from disk, then saves
+        it and deletes the blobs of the entries removed or replaced in the
+        block that no entry uses any more.
+        """
+        with self._lock, _file_lock(self._lock_path):
+            self._reload()
+            for key, last_access in self._accessed.items():
+                if key in self.index:
+                    self.index[key]["last_access"] = max(
+                        self.index[key]["last_access"], last_access
+                    )
+            self._accessed.clear()
+            blobs_before = {
+                key: entry["blob"] for key, entry in self.index.items()
+            }
+            yield self.index
+            used = {entry["blob"] for entry in self.index.values()}
+            dropped = {
+                blob
+                for key, blob in blobs_before.items()
+                if self.index.get(key, {}).get("blob") != blob
+            }
+            self._save_index()
+            for blob in dropped - used:
+                try:
+                    os.remove(self._blob_path(blob))
+                except FileNotFoundError:
+                    pass
+
+    def _save_index(self):
+        _write_atomic(
+            self._index_path, json.dumps(self.index, indent=1).encode()
+        )
+        stat = os.stat(self._index_path)
+        self._index_stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, digest + ".json")
+
+    def get(self, key):
+        """
+        Look up the cached results of a query.
+
+        The access time is kept in memory and saved with the next change to
+        the cache or call of `flush`, so lookups do not rewrite the index.
+
+        Args:
+            key: a string of the key returned by `make_key`.
+        Returns:
+            A tuple of the list of results and a string of the last date
+            covered, or None if the query is not cached.
+        """
+        with self._lock:
+            self._reload()
+            entry = self.index.get(key)
+            if entry is None:
+                return None
+            blob_path = self._blob_path(entry["blob"])
+            try:
+                with open(blob_path, encoding="utf-8") as file:
+                    results = json.load(file)
+            except FileNotFoundError:
+                with self._update() as index:
+                    if index.get(key, {}).get("blob") == entry["blob"]:
+                        del index[key]
+                return None
+            self._accessed[key] = self._clock()
+            return results, entry["covered_end"]
+
+    def flush(self):
+        """
+        Save the access times of the lookups made since the last change.
+
+        Returns:
+            Nothing.
+        """
+        with self._lock:
+            if not self._accessed:
+                return
+            with self._update():
+                pass
+
+    def put(self, key, results, covered_end):
+        """
+        Store the results of a query.
+
+        Args:
+            key: a string of the key returned by `make_key`.
+            results: a list of result dictionaries.
+            covered_end: a string of the last date covered by `results`.
+        Returns:
+            Nothing.
+        """
+        data = json.dumps(results, ensure_ascii=False).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        with self._update() as index:
+            if not os.path.isfile(self._blob_path(digest)):
+                _write_atomic(self._blob_path(digest), data)
+            index[key] = {
+                "blob": digest,
+                "covered_end": covered_end,
+                "last_access": self._clock(),
+            }
+
+    def invalidate(self, key=None):
+        """
+        Remove one query, or every query, from the cache.
+
+        Args:
+            key: a string of the key to remove. All keys are removed if None.
+        Returns:
+            Nothing.
+        """
+        with self._update() as index:
+            if key is None:
+                index.clear()
+            else:
+                index.pop(key, None)
+
+    def evict(self, max_age_days=MAX_AGE_DAYS, max_entries=MAX_ENTRIES):
+        """
+        Drop entries that were not used recently.
+
+        Args:
+            max_age_days: a number of days after which an unused entry is
+            dropped.
+            max_entries: an integer of the number of most recently used
+            entries to keep.
+        Returns:
+            A list of strings of the keys that were dropped.
+        """
+        with self._update() as index:
+            oldest = self._clock() - max_age_days * 86400
+            by_access = sorted(
+                index, key=lambda k: index[k]["last_access"], reverse=True
+            )
+            dropped = [
+                key
+                for i, key in enumerate(by_access)
+                if i >= max_entries or index[key]["last_access"] < oldest
+            ]
+            for key in dropped:
+                del index[key]
+        return dropped
+
+
+def merge_results(old_results, new_results):
+    """
+    Merge newly fetched results into cached ones, keeping the new value when
+    a (date, station, datatype) appears in both.
+
+    Args:
+        old_results: a list of cached result dictionaries.
+        new_results: a list of newly fetched result dictionaries.
+    Returns:
+        A list of result dictionaries sorted by date.
+    """
+    merged = {}
+    for row in old_results + new_results:
+        merged[(row["date"], row.get("station"), row.get("datatype"))] = row
+    return sorted(merged.values(), key=lambda row: row["date"])
+
+
+def cached_fetch(
+    fetch,
+    dataset_id,
+    station_ids,
+    datatype_ids,
+    start_date,
+    end_date,
+    units,
+    cache=None,
+):
+    """
+    Fetch results for every station and datatype, only requesting the dates
+    after the last date each one's cache entry covers.
+
+    Args:
+        fetch: a function that takes a list of query parameter dictionaries
+        and returns a list of lists of results, like `fetch_data`.
+        dataset_id: a string of the CDO dataset ID.
+        station_ids: a list of strings of the CDO station IDs.
+        datatype_ids: a list of strings of the CDO datatype IDs.
+        start_date: a string of the first date in "YYYY-MM-DD" format.
+        end_date: a string of the last date in "YYYY-MM-DD" format.
+        units: a string of the units parameter.
+        cache: an optional `ResponseCache`, by default one in `CACHE_DIR`.
+    Returns:
+        A dictionary mapping (station ID, datatype ID) tuples to the list of
+        results between `start_date` and `end_date`.
+    """
+    if cache is None:
+        cache = ResponseCache()
+
+    cached = {}
+    queries = []
+    for station_id in station_ids:
+        for datatype_id in datatype_ids:
+            key = make_key(
+                dataset_id, station_id, datatype_id, start_date, units
+            )
+            hit = cache.get(key)
+            if hit is None:
+                results, fetch_start = [], start_date
+            else:
+                results, covered_end = hit
+                fetch_start = (
+                    date.fromisoformat(covered_end) + timedelta(days=1)
+                ).isoformat()
+            cached[(station_id, datatype_id)] = (key, results, hit is None)
+            if fetch_start <= end_date:
+                queries += build_queries(
+                    dataset_id,
+                    [station_id],
+                    [datatype_id],
+                    fetch_start,
+                    end_date,
+                    units,
+                )
+
+    new_results = {pair: [] for pair in cached}
+    if queries:
+        for query, results in zip(queries, fetch(queries)):
+            pair = (query["stationid"], query["datatypeid"])
+            new_results[pair].extend(results)
+
+    output = {}
+    for pair, (key, results, missed) in cached.items():
+        if new_results[pair]:
+            results = merge_results(results, new_results[pair])
+            # Cover up to the last date with data, so that months published
+            # late are fetched again on the next refresh
+            cache.put(key, results, results[-1]["date"][:10])
+        elif missed:
+            # Queries without any data are cached up to `end_date`, so that
+            # they are not fetched again in full on every refresh
+            cache.put(key, [], end_date)
+        output[pair] = [
+            row for row in results if row["date"][:10] <= end_date
+        ]
+    # Refreshes without new data change nothing else, but their lookups must
+    # count as uses for `evict`
+    cache.flush()
+    return output
@@ -0,0 +1,198 @@
+"""
+File containing helper functions that compute Pearson correlations between
+every weather feature and the electricity consumption at once, including
+rolling-window correlations and bootstrap confidence intervals.
+"""
+
+import numpy as np
+import pandas as pd
+
+TARGET = "total_consumption"
+ROLLING_WINDOWS = (12, 24)
+N_BOOTSTRAP = 10000
+
+# Number of bootstrap resamples computed per matrix product, to bound memory
+BOOTSTRAP_BATCH = 2000
+
+
+def _features_and_target(df_all_data, target, features):
+    """
+    Split a wide dataframe into a float feature matrix and a target vector,
+    keeping only rows without missing values, and return the index of those
+    rows.
+    """
+    if features is None:
+        features = [
+            column
+            for column in df_all_data.select_dtypes("number").columns
+            if column != target
+        ]
+    x_values = df_all_data[features].to_numpy(float)
+    y_values = df_all_data[target].to_numpy(float)
+    complete = np.isfinite(x_values).all(axis=1) & np.isfinite(y_values)
+    index = df_all_data.index[complete]
+    return list(features), x_values[complete], y_values[complete], index
+
+
+def _pearson_from_sums(n, sx, sy, sxx, syy, sxy):
+    """
+    Compute Pearson's r from counts, sums, sums of squares and sums of
+    cross-products. All arguments broadcast together.
+    """
+    cov = n * sxy - sx * sy
+    var_x = n * sxx - sx**2
+    var_y = n * syy - sy**2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return cov / np.sqrt(var_x * var_y)
+
+
+def corr_with_target(df_all_data, target=TARGET, features=None):
+    """
+    Calculate Pearson's correlation coefficient between every feature and the
+    target with one matrix product.
+
+    Args:
+        df_all_data: a pandas dataframe with one column per feature and a
+        target column, such as the output of `merge_all_df`.
+        target: a string of the name of the target column.
+        features: an optional list of strings of the feature columns. All
+        other numeric columns are used if None.
+    Returns:
+        A pandas series of the correlation of each feature, indexed by
+        feature name.
+    """
+    features, x_values, y_values, _ = _features_and_target(
+        df_all_data, target, features
+    )
+    x_centered = x_values - x_values.mean(axis=0)
+    y_centered = y_values - y_values.mean()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r_values = (y_centered @ x_centered) / np.sqrt(
+            (x_centered**2).sum(axis=0) * (y_centered**2).sum()
+        )
+    return pd.Series(r_values, index=features, name="pearson_r_value")
+
+
+def rolling_corr(
+    df_all_data, target=TARGET, features=None, windows=ROLLING_WINDOWS
+):
+    """
+    Calculate rolling-window correlations between every feature and the
+    target.
+
+    The sums needed for each window are differences of running sums, so the
+    cost does not depend on the window length. Rows must be in time order.
+
+    Args:
+        df_all_data: a pandas dataframe with one column per feature and a
+        target column, with one row per period in time order.
+        target: a string of the name of the target column.
+        features: an optional list of strings of the feature columns. All
+        other numeric columns are used if None.
+        windows: a tuple of integers of the window lengths, in rows.
+    Returns:
+        A pandas dataframe with the same index as the complete rows of
+        `df_all_data` and a column named "<feature>_<window>" for each
+        feature and window. Rows before a window is full are NaN.
+    """
+    features, x_values, y_values, index = _features_and_target(
+        df_all_data, target, features
+    )
+    # Centering first keeps the running sums small, which avoids losing
+    # precision when they are subtracted
+    x_values = x_values - x_values.mean(axis=0)
+    y_values = (y_values - y_values.mean())[:, None]
+
+    def running(values):
+        return np.vstack([np.zeros((1, values.shape[1])), values.cumsum(0)])
+
+    sums = [
+        running(values)
+        for values in (
+            x_values,
+            y_values,
+            x_values**2,
+            y_values**2,
+            x_values * y_values,
+        )
+    ]
+    columns = {}
+    for window in windows:
+        window_sums = [total[window:] - total[:-window] for total in sums]
+        r_values = _pearson_from_sums(window, *window_sums)
+        n_padding = min(window - 1, len(index))
+        r_values = np.vstack(
+            [np.full((n_padding, len(features)), np.nan), r_values]
+        )
+        for i, feature in enumerate(features):
+            columns[f"{feature}_{window}"] = r_values[:, i]
+    return pd.DataFrame(columns, index=index)
+
+
+def bootstrap_corr_ci(
+    df_all_data,
+    target=TARGET,
+    features=None,
+    n_bootstrap=N_BOOTSTRAP,
+    confidence=0.95,
+    seed=None,
+):
+    """
+    Calculate bootstrap confidence intervals of the correlation between every
+    feature and the target.
+
+    Each resample is represented by how many times it draws each row, so the
+    sums of all resamples for all features are a few matrix products of the
+    resample counts with the data, computed in batches of `BOOTSTRAP_BATCH`.
+
+    Args:
+        df_all_data: a pandas dataframe with one column per feature and a
+        target column.
+        target: a string of the name of the target column.
+        features: an optional list of strings of the feature columns. All
+        other numeric columns are used if None.
+        n_bootstrap: an integer of the number of resamples.
+        confidence: a float of the confidence level of the intervals.
+        seed: an optional integer seed of the random number generator.
+    Returns:
+        A pandas dataframe with a row per feature and the columns
+        "pearson_r_value", "ci_low" and "ci_high".
+    """
+    features, x_values, y_values, _ = _features_and_target(
+        df_all_data, target, features
+    )
+    n_rows = len(y_values)
+    x_values = x_values - x_values.mean(axis=0)
+    y_values = y_values - y_values.mean()
+    x_squared = x_values**2
+    x_times_y = x_values * y_values[:, None]
+
+    rng = np.random.default_rng(seed)
+    r_values = np.empty((n_bootstrap, len(features)))
+    for start in range(0, n_bootstrap, BOOTSTRAP_BATCH):
+        n_batch = min(BOOTSTRAP_BATCH, n_bootstrap - start)
+        draws = rng.integers(0, n_rows, size=(n_batch, n_rows))
+        draws += np.arange(n_batch)[:, None] * n_rows
+        counts = np.bincount(draws.ravel(), minlength=n_batch * n_rows)
+        counts = counts.reshape(n_batch, n_rows).astype(float)
+        r_values[start : start + n_batch] = _pearson_from_sums(
+            n_rows,
+            counts @ x_values,
+            (counts @ y_values)[:, None],
+            counts @ x_squared,
+            (counts @ y_values**2)[:, None],
+            counts @ x_times_y,
+        )
+
+    alpha = (1 - confidence) / 2
+    ci_low, ci_high = np.nanquantile(r_values, [alpha, 1 - alpha], axis=0)
+    return pd.DataFrame(
+        {
+            "pearson_r_value": corr_with_target(
+                df_all_data, target, features
+            ).to_numpy(),
+            "ci_low": ci_low,
+            "ci_high": ci_high,
+        },
+        index=features,
+    )
@@ -0,0 +1,189 @@
+"""
+File containing helper functions that read the fiscal-year sheets of the Olin
+utility spreadsheet in parallel, caching each parsed sheet so that only new
+or changed sheets are parsed again.
+"""
+
+import hashlib
+import os
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import pandas as pd
+
+SHEET_PATTERN = re.compile(r"FY\d{2}")
+SHEET_CACHE_DIR = "data/cache/sheets"
+
+# Change this whenever `parse_sheet` changes, so that cached sheets parsed
+# the old way are not reused
+PARSER_VERSION = "1"
+
+USEFUL_COLS = [
+    "Start Read Date",
+    "End Read Date",
+    "Time of Peak Demand",
+    "Total Cons. (kwh)",
+    "Total Monthly Electricity Cost",
+]
+COLUMN_NAMES = [
+    "start_read_date",
+    "end_read_date",
+    "total_consumption",
+    "time_of_peak_demand",
+    "total_cost",
+]
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = (
+    "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+)
+_SHARED_STRING_CELL = re.compile(rb'<c [^>]*t="s"[^>]*>\s*<v>(\d+)</v>')
+
+
+def file_hash(path):
+    """
+    Compute the SHA-256 digest of a file's content.
+
+    Args:
+        path: a string of the path to the file.
+    Returns:
+        A string of the hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sheet_hashes(workbook_path):
+    """
+    Compute a content hash of every sheet of an .xlsx workbook without
+    parsing the cells.
+
+    The hash of a sheet covers its XML and the text of the shared strings it
+    uses, so it does not change when other sheets are edited or added.
+    Workbooks that are not .xlsx files fall back to the hash of the whole
+    file for every sheet.
+
+    Args:
+        workbook_path: a string of the path to the workbook.
+    Returns:
+        A dictionary mapping each sheet name to a string of its digest, in
+        workbook order.
+    """
+    if not zipfile.is_zipfile(workbook_path):
+        digest = file_hash(workbook_path)
+        sheet_names = pd.ExcelFile(workbook_path).sheet_names
+        return {name: f"{digest}-{name}" for name in sheet_names}
+
+    with zipfile.ZipFile(workbook_path) as archive:
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        targets = {rel.get("Id"): rel.get("Target") for rel in rels}
+        shared_strings = []
+        if "xl/sharedStrings.xml" in archive.namelist():
+            strings = ET.fromstring(archive.read("xl/sharedStrings.xml"))
+            shared_strings = [
+                "".join(text.text or "" for text in item.iter(_NS_MAIN + "t"))
+                for item in strings.iter(_NS_MAIN + "si")
+            ]
+
+        hashes = {}
+        for sheet in workbook.iter(_NS_MAIN + "sheet"):
+            target = targets[sheet.get(_NS_REL + "id")]
+            if target.startswith("/"):
+                target = target[1:]
+            else:
+                target = "xl/" + target
+            sheet_xml = archive.read(target)
+            digest = hashlib.sha256(sheet_xml)
+            for index in _SHARED_STRING_CELL.findall(sheet_xml):
+                digest.update(shared_strings[int(index)].encode("utf-8"))
+                digest.update(b"\0")
+            hashes[sheet.get("name")] = digest.hexdigest()
+    return hashes
+
+
+def parse_sheet(workbook_path, sheet_name):
+    """
+    Read one fiscal-year sheet and keep the columns relevant to the project.
+
+    The sheet is transposed so that each month becomes a row, the columns
+    with an empty header are dropped, and the useful columns are renamed to
+    snakecase.
+
+    Args:
+        workbook_path: a string of the path to the workbook.
+        sheet_name: a string of the name of the sheet (ex. FY13).
+    Returns:
+        A pandas dataframe with the columns in `COLUMN_NAMES`.
+    """
+    df_electric = pd.read_excel(
+        workbook_path, sheet_name, header=None, usecols="C:O", nrows=44
+    )
+    df_electric_transpose = df_electric.T
+    valid_cols_mask = df_electric_transpose.iloc[0, :].notnull()
+    df_electric_select = df_electric_transpose.loc[:, valid_cols_mask]
+
+    index_useful = df_electric_select.iloc[0, :].isin(USEFUL_COLS)
+    df_electric_filtered = df_electric_select.loc[:, index_useful]
+    df_electric_filtered.columns = COLUMN_NAMES
+    return df_electric_filtered.iloc[1:, :]
+
+
+def load_sheets(workbook_path, cache_dir=SHEET_CACHE_DIR, max_workers=None):
+    """
+    Parse every fiscal-year sheet of a workbook, reusing cached sheets whose
+    content has not changed and parsing the others in a process pool.
+
+    Sheets are discovered by matching their names with `SHEET_PATTERN`.
+
+    Args:
+        workbook_path: a string of the path to the workbook.
+        cache_dir: a string of the folder parsed sheets are cached in.
+        max_workers: an optional integer of the number of processes. Defaults
+        to the number of CPUs.
+    Returns:
+        A list of pandas dataframes, one per fiscal-year sheet, sorted by
+        sheet name.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    hashes = {
+        name: digest
+        for name, digest in sheet_hashes(workbook_path).items()
+        if SHEET_PATTERN.fullmatch(name)
+    }
+    sheet_names = sorted(hashes)
+
+    def cache_path(name):
+        key = hashlib.sha256(
+            f"{PARSER_VERSION}:{hashes[name]}".encode()
+        ).hexdigest()
+        return os.path.join(cache_dir, key + ".pkl")
+
+    frames = {}
+    stale = []
+    for name in sheet_names:
+        if os.path.isfile(cache_path(name)):
+            frames[name] = pd.read_pickle(cache_path(name))
+        else:
+            stale.append(name)
+
+    parsed = []
+    if len(stale) == 1:
+        # Starting a process pool costs more than parsing a single sheet
+        parsed = [parse_sheet(workbook_path, stale[0])]
+    elif stale:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            parsed = list(
+                executor.map(parse_sheet, repeat(workbook_path), stale)
+            )
+    for name, df_sheet in zip(stale, parsed):
+        df_sheet.to_pickle(cache_path(name))
+        frames[name] = df_sheet
+
+    return [frames[name] for name in sheet_names]
@@ -2,14 +2,37 @@
 File containing helper functions for conducting the F-Test statistical analysis
 """
 
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.feature_selection import SelectKBest, f_regression
 
-plt.rcParams["font.family"] = "Helvetica"
+from functions.functions_manage_data import SEASONS
+from functions.functions_plot_data import new_figure, show_figures
 
+# sklearn, scipy and matplotlib take seconds to import, so they are imported
+# by the functions that use them
+# pylint: disable=import-outside-toplevel
 
-def feature_selection(features, target):
+# Number of permutations scored per matrix product, to bound memory
+PERMUTATION_CHUNK = 2000
+# Permutation counts from which the work is spread over a process pool
+PERMUTATION_POOL_THRESHOLD = 200000
+
+# Configurations of `feature_selection_sweep`
+SWEEP_SCORE_FUNCTIONS = ("f_regression", "mutual_info")
+SWEEP_KS = (3, 5, 10)
+SWEEP_SPLITS = 5
+# Number of scored cells (rows x features x configurations) from which the
+# sweep is spread over a process pool
+SWEEP_POOL_THRESHOLD = 10**7
+
+
+def feature_selection(
+    features, target, n_permutations=None, seed=None, max_workers=None
+):
     """
     Compute the F-scores and p-values of `features` for `target`.
 
@@ -18,23 +41,38 @@ def feature_selection(features, target):
     the f-scores and p-values. Return them with the features as a pandas
     dataframe.
 
+    If `n_permutations` is given, the p-values come from a permutation test
+    (see `permutation_p_values`) instead of the F distribution.
+
     Args:
         features: a pandas dataframe that represents each feature as its
         column.
         target: a pandas dataframe of a single column that represents the
         target variable.
+        n_permutations: an optional integer of the number of permutations of
+        the target used to compute the p-values.
+        seed: an optional integer seed of the permutations.
+        max_workers: an optional integer of the number of processes used for
+        the permutations.
     Returns:
         df_results: a pandas dataframe that contains the f-score and p-value
         for each feature.
     """
+    from sklearn.feature_selection import SelectKBest, f_regression
+
     # Create an instance of SelectKBest using the f_regression method
     selector_k_best = SelectKBest(score_func=f_regression, k="all")
     selector_k_best.fit_transform(features, target)
+    p_values = selector_k_best.pvalues_
+    if n_permutations is not None:
+        p_values = permutation_p_values(
+            features, target, n_permutations, seed, max_workers
+        )
     df_results = pd.DataFrame(
         {
             "Feature": features.columns,
             "F-Score": selector_k_best.scores_,
-            "p-value": selector_k_best.pvalues_,
+            "p-value": p_values,
         }
     )
     df_results = df_results.sort_values("F-Score", ascending=False)
@@ -42,15 +80,540 @@ def feature_selection(features, target):
     return df_results
 
 
-def plot_f_test(df_results):
+def _count_exceedances(x_std, y_std, abs_corr, chunks):
+    """
+    Count, for each feature, how many permutations of the target are at least
+    as correlated with it as the observed target. `chunks` is a list of
+    (number of permutations, seed sequence) pairs.
+    """
+    n_rows = len(y_std)
+    counts = np.zeros(x_std.shape[1], dtype=np.int64)
+    for n_chunk, seed_seq in chunks:
+        rng = np.random.default_rng(seed_seq)
+        permuted = rng.permuted(np.tile(y_std, (n_chunk, 1)), axis=1)
+        corr = permuted @ x_std / n_rows
+        counts += (np.abs(corr) >= abs_corr - 1e-12).sum(axis=0)
+    return counts
+
+
+def _count_exceedances_shared(name, shape, abs_corr, chunks):
+    """
+    Run `_count_exceedances` on data stored in shared memory by
+    `permutation_p_values`, with the target as the last column.
+    """
+    shared = shared_memory.SharedMemory(name=name)
+    try:
+        data = np.ndarray(shape, dtype=float, buffer=shared.buf)
+        return _count_exceedances(data[:, :-1], data[:, -1], abs_corr, chunks)
+    finally:
+        shared.close()
+
+
+def permutation_p_values(
+    features, target, n_permutations, seed=None, max_workers=None
+):
+    """
+    Compute permutation-test p-values of the F-test of every feature.
+
+    The F-score only depends on the squared correlation, so the p-value of a
+    feature is the fraction of permutations of the target whose absolute
+    correlation with it is at least the observed one. All features are scored
+    against a chunk of permutations with one matrix product of standardized
+    data. From `PERMUTATION_POOL_THRESHOLD` permutations, or when
+    `max_workers` is above 1, the chunks are spread over a process pool that
+    reads the data from shared memory instead of copying it.
+
+    Args:
+        features: a pandas dataframe that represents each feature as its
+        column.
+        target: a pandas series or single-column dataframe of the target.
+        n_permutations: an integer of the number of permutations.
+        seed: an optional integer seed. Each chunk of `PERMUTATION_CHUNK`
+        permutations gets an independent stream derived from it, so a seed
+        gives the same p-values with or without a process pool.
+        max_workers: an optional integer of the number of processes.
+    Returns:
+        A numpy array of the p-value of each feature.
+    """
+    x_values = features.to_numpy(float)
+    y_values = np.asarray(target, dtype=float).ravel()
+    x_std = x_values - x_values.mean(axis=0)
+    x_scale = x_std.std(axis=0)
+    # Constant features are left at zero so they are never correlated
+    x_std = np.divide(
+        x_std, x_scale, out=np.zeros_like(x_std), where=x_scale > 0
+    )
+    y_std = (y_values - y_values.mean()) / y_values.std()
+    abs_corr = np.abs(y_std @ x_std / len(y_std))
+
+    if max_workers is None:
+        use_pool = n_permutations >= PERMUTATION_POOL_THRESHOLD
+        max_workers = os.cpu_count() or 1
+    else:
+        use_pool = max_workers > 1
+
+    # One stream per chunk, so that the permutations do not depend on how the
+    # chunks are shared between processes
+    sizes = [
+        min(PERMUTATION_CHUNK, n_permutations - start)
+        for start in range(0, n_permutations, PERMUTATION_CHUNK)
+    ]
+    chunks = list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+    max_workers = min(max_workers, len(chunks))
+    if not use_pool or max_workers <= 1:
+        counts = _count_exceedances(x_std, y_std, abs_corr, chunks)
+    else:
+        data = np.column_stack([x_std, y_std])
+        shared = shared_memory.SharedMemory(create=True, size=data.nbytes)
+        try:
+            np.ndarray(data.shape, dtype=float, buffer=shared.buf)[:] = data
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        _count_exceedances_shared,
+                        shared.name,
+                        data.shape,
+                        abs_corr,
+                        chunks[i::max_workers],
+                    )
+                    for i in range(max_workers)
+                ]
+                counts = sum(future.result() for future in futures)
+        finally:
+            shared.close()
+            shared.unlink()
+
+    return (counts + 1) / (n_permutations + 1)
+
+
+def f_scores_from_corr(corr, n_rows):
+    """
+    Compute the F-scores and p-values of a univariate linear regression from
+    Pearson's correlation coefficients, the same way `f_regression` does.
+
+    Constant features get an F-score of 0 and a p-value of 1, and perfectly
+    correlated features get the largest float as F-score and a p-value of 0.
+
+    Args:
+        corr: a numpy array of correlation coefficients.
+        n_rows: an integer of the number of rows the correlations come from.
+    Returns:
+        A tuple of numpy arrays of the F-scores and the p-values, with the
+        shape of `corr`.
+    """
+    from scipy import stats
+
+    corr = np.nan_to_num(np.asarray(corr, dtype=float), nan=0.0)
+    deg_of_freedom = n_rows - 2
+    corr_squared = corr**2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f_scores = corr_squared / (1 - corr_squared) * deg_of_freedom
+    f_scores = np.where(np.isinf(f_scores), np.finfo(float).max, f_scores)
+    p_values = stats.f.sf(f_scores, 1, deg_of_freedom)
+    return f_scores, p_values
+
+
+class IncrementalFRegression:
+    """
+    Computes the F-test of `feature_selection` for many targets at once from
+    running statistics, which can be updated with new rows without going
+    through the previous ones.
+
+    The state holds, for every feature and target, the row count, the means,
+    the sums of squared deviations and the sums of cross-deviations between
+    each feature and each target. Batches are combined with the pairwise
+    update of Chan et al., which stays accurate for large counts.
+    """
+
+    def __init__(self, features, targets):
+        """
+        Args:
+            features: a list of strings of the feature names.
+            targets: a list of strings of the target names.
+        """
+        self.features = list(features)
+        self.targets = list(targets)
+        self.n_rows = 0
+        self.mean_x = np.zeros(len(self.features))
+        self.mean_y = np.zeros(len(self.targets))
+        self.m2_x = np.zeros(len(self.features))
+        self.m2_y = np.zeros(len(self.targets))
+        self.cross = np.zeros((len(self.features), len(self.targets)))
+
+    def _combine(self, n_rows, mean_x, mean_y, m2_x, m2_y, cross):
+        total = self.n_rows + n_rows
+        if total == 0:
+            return
+        delta_x = mean_x - self.mean_x
+        delta_y = mean_y - self.mean_y
+        weight = self.n_rows * n_rows / total
+        self.m2_x = self.m2_x + m2_x + delta_x**2 * weight
+        self.m2_y = self.m2_y + m2_y + delta_y**2 * weight
+        self.cross = self.cross + cross + np.outer(delta_x, delta_y) * weight
+        self.mean_x = self.mean_x + delta_x * n_rows / total
+        self.mean_y = self.mean_y + delta_y * n_rows / total
+        self.n_rows = total
+
+    def update(self, features, targets):
+        """
+        Add new rows to the running statistics.
+
+        Args:
+            features: a pandas dataframe with a column for every feature.
+            targets: a pandas dataframe with a column for every target, or a
+            pandas series if there is a single target.
+        Returns:
+            The updated `IncrementalFRegression`, to allow chaining.
+        """
+        x_values = features[self.features].to_numpy(float)
+        if isinstance(targets, pd.Series):
+            targets = targets.to_frame()
+        y_values = targets[self.targets].to_numpy(float)
+        if len(x_values) == 0:
+            return self
+        mean_x = x_values.mean(axis=0)
+        mean_y = y_values.mean(axis=0)
+        x_centered = x_values - mean_x
+        y_centered = y_values - mean_y
+        self._combine(
+            len(x_values),
+            mean_x,
+            mean_y,
+            (x_centered**2).sum(axis=0),
+            (y_centered**2).sum(axis=0),
+            x_centered.T @ y_centered,
+        )
+        return self
+
+    def merge(self, other):
+        """
+        Add the statistics of another `IncrementalFRegression` with the same
+        features and targets, as if its rows had been added with `update`.
+
+        Args:
+            other: an `IncrementalFRegression`.
+        Returns:
+            The updated `IncrementalFRegression`, to allow chaining.
+        """
+        if other.features != self.features or other.targets != self.targets:
+            raise ValueError("Features and targets must be the same")
+        self._combine(
+            other.n_rows,
+            other.mean_x,
+            other.mean_y,
+            other.m2_x,
+            other.m2_y,
+            other.cross,
+        )
+        return self
+
+    def corr(self):
+        """
+        Compute Pearson's correlation coefficient of every feature with every
+        target.
+
+        Returns:
+            A numpy array of the correlations, with one row per feature and
+            one column per target, and NaN for constant columns.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.cross / np.sqrt(np.outer(self.m2_x, self.m2_y))
+
+    def f_scores(self):
+        """
+        Compute the F-scores and p-values of every feature for every target.
+
+        Returns:
+            A tuple of numpy arrays of the F-scores and p-values, with one
+            row per feature and one column per target.
+        """
+        return f_scores_from_corr(self.corr(), self.n_rows)
+
+    def results(self, target=None):
+        """
+        Get the F-test results for one target, in the same format as
+        `feature_selection`.
+
+        Args:
+            target: a string of the target name. Defaults to the first one.
+        Returns:
+            df_results: a pandas dataframe that contains the f-score and
+            p-value for each feature.
+        """
+        column = 0 if target is None else self.targets.index(target)
+        f_scores, p_values = self.f_scores()
+        df_results = pd.DataFrame(
+            {
+                "Feature": self.features,
+                "F-Score": f_scores[:, column],
+                "p-value": p_values[:, column],
+            }
+        )
+        return df_results.sort_values("F-Score", ascending=False)
+
+    def to_dict(self):
+        """
+        Convert the state to a dictionary of plain Python types, which can be
+        saved as JSON.
+
+        Returns:
+            A dictionary of the state.
+        """
+        return {
+            "features": self.features,
+            "targets": self.targets,
+            "n_rows": self.n_rows,
+            "mean_x": self.mean_x.tolist(),
+            "mean_y": self.mean_y.tolist(),
+            "m2_x": self.m2_x.tolist(),
+            "m2_y": self.m2_y.tolist(),
+            "cross": self.cross.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Restore an `IncrementalFRegression` from the output of `to_dict`.
+
+        Args:
+            state: a dictionary of the state.
+        Returns:
+            An `IncrementalFRegression`.
+        """
+        scorer = cls(state["features"], state["targets"])
+        scorer.n_rows = state["n_rows"]
+        for name in ("mean_x", "mean_y", "m2_x", "m2_y"):
+            setattr(scorer, name, np.array(state[name], dtype=float))
+        scorer.cross = np.array(state["cross"], dtype=float).reshape(
+            len(scorer.features), len(scorer.targets)
+        )
+        return scorer
+
+    def save(self, path):
+        """
+        Save the state to a .json file.
+
+        Args:
+            path: a string of the path of the file.
+        Returns:
+            Nothing.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a state saved with `save`.
+
+        Args:
+            path: a string of the path of the file.
+        Returns:
+            An `IncrementalFRegression`.
+        """
+        with open(path, encoding="utf-8") as file:
+            return cls.from_dict(json.load(file))
+
+
+def _score_rows(data, rows, score_function, seed):
+    """
+    Score the features (all columns of `data` but the last) for the target
+    (the last column) on some rows, returning the scores and p-values.
+    """
+    from sklearn.feature_selection import f_regression, mutual_info_regression
+
+    x_values = data[rows, :-1]
+    y_values = data[rows, -1]
+    if score_function == "f_regression":
+        return f_regression(x_values, y_values)
+    if score_function == "mutual_info":
+        scores = mutual_info_regression(x_values, y_values, random_state=seed)
+        return scores, np.full(len(scores), np.nan)
+    raise ValueError(f"Unknown score function: {score_function}")
+
+
+def _score_batch_shared(name, shape, tasks):
+    """
+    Run `_score_rows` for a batch of (rows, score_function, seed) tasks on
+    data stored in shared memory by `feature_selection_sweep`.
+    """
+    shared = shared_memory.SharedMemory(name=name)
+    try:
+        data = np.ndarray(shape, dtype=float, buffer=shared.buf)
+        return [_score_rows(data, *task) for task in tasks]
+    finally:
+        shared.close()
+
+
+def feature_selection_sweep(
+    features,
+    target,
+    months=None,
+    score_functions=SWEEP_SCORE_FUNCTIONS,
+    seasons=None,
+    ks=SWEEP_KS,
+    n_splits=SWEEP_SPLITS,
+    seed=None,
+    max_workers=None,
+):
+    """
+    Score the features for the target with several score functions, over
+    all months and over each season, and measure how stable the top k
+    features of each configuration are across cross-validation folds.
+
+    Every configuration is scored on all of its rows and, once per fold, on
+    the rows outside the fold. The stability of a feature is the fraction of
+    folds in which it is among the top k. From `SWEEP_POOL_THRESHOLD` scored
+    cells, or when `max_workers` is above 1, the scoring is spread over a
+    process pool that reads the data from shared memory instead of copying
+    it.
+
+    Args:
+        features: a pandas dataframe that represents each feature as its
+        column.
+        target: a pandas series or single-column dataframe of the target.
+        months: an optional array-like of the month (1 to 12) of each row.
+        Defaults to the "month" column of `features` if there is one,
+        otherwise only all months are scored.
+        score_functions: a tuple of "f_regression" and/or "mutual_info".
+        seasons: an optional dictionary mapping each season name to its
+        months. Defaults to `SEASONS`.
+        ks: a tuple of integers of the numbers of selected features.
+        n_splits: an integer of the number of cross-validation folds.
+        seed: an optional integer seed of the folds and of the mutual
+        information estimates.
+        max_workers: an optional integer of the number of processes.
+    Returns:
+        A tidy pandas dataframe with one row per score function, season, k
+        and feature, and the columns "score_function", "season", "k",
+        "feature", "score", "p_value" (NaN for mutual information), "rank"
+        (1 for the best score), "selected" and "stability".
+    """
+    if seasons is None:
+        seasons = SEASONS
+    if months is None and "month" in features.columns:
+        months = features["month"]
+    data = np.column_stack(
+        [features.to_numpy(float), np.asarray(target, dtype=float).ravel()]
+    )
+    n_rows = len(data)
+
+    subsets = {"All": np.arange(n_rows)}
+    if months is not None:
+        months = np.asarray(months, dtype=int)
+        for season, season_months in seasons.items():
+            in_season = np.isin(months, [int(month) for month in season_months])
+            subsets[season] = np.flatnonzero(in_season)
+
+    rng = np.random.default_rng(seed)
+    tasks = {}
+    for season, rows in subsets.items():
+        folds = np.array_split(rng.permutation(rows), n_splits)
+        # Scores need at least 3 rows, so seasons too small are skipped
+        if len(rows) - max(map(len, folds)) < 3:
+            continue
+        for score_function in score_functions:
+            tasks[score_function, season, None] = (rows, score_function, seed)
+            for fold, test_rows in enumerate(folds):
+                train_rows = np.setdiff1d(rows, test_rows)
+                tasks[score_function, season, fold] = (
+                    train_rows,
+                    score_function,
+                    seed,
+                )
+
+    cells = sum(len(rows) for rows, _, _ in tasks.values()) * data.shape[1]
+    if max_workers is None:
+        use_pool = cells >= SWEEP_POOL_THRESHOLD
+        max_workers = os.cpu_count() or 1
+    else:
+        use_pool = max_workers > 1
+
+    if not use_pool:
+        outputs = [_score_rows(data, *task) for task in tasks.values()]
+    else:
+        shared = shared_memory.SharedMemory(create=True, size=data.nbytes)
+        try:
+            np.ndarray(data.shape, dtype=float, buffer=shared.buf)[:] = data
+            task_list = list(tasks.values())
+            batches = [
+                task_list[i::max_workers]
+                for i in range(min(max_workers, len(task_list)))
+            ]
+            with ProcessPoolExecutor(max_workers=len(batches)) as executor:
+                results = list(
+                    executor.map(
+                        _score_batch_shared,
+                        [shared.name] * len(batches),
+                        [data.shape] * len(batches),
+                        batches,
+                    )
+                )
+        finally:
+            shared.close()
+            shared.unlink()
+        # Undo the round-robin split of the tasks into batches
+        outputs = [None] * len(task_list)
+        for i, batch_outputs in enumerate(results):
+            outputs[i :: len(batches)] = batch_outputs
+    scores = dict(zip(tasks, outputs))
+
+    def rank(values):
+        # Missing scores (of constant features) are ranked last
+        return pd.Series(values).rank(
+            ascending=False, method="first", na_option="bottom"
+        )
+
+    tables = []
+    n_features = features.shape[1]
+    for score_function, season, fold in tasks:
+        if fold is not None:
+            continue
+        full_scores, p_values = scores[score_function, season, None]
+        full_rank = rank(full_scores).to_numpy(int)
+        fold_ranks = np.array(
+            [
+                rank(scores[score_function, season, fold][0])
+                for fold in range(n_splits)
+            ]
+        )
+        for k in ks:
+            k = min(k, n_features)
+            tables.append(
+                pd.DataFrame(
+                    {
+                        "score_function": score_function,
+                        "season": season,
+                        "k": k,
+                        "feature": features.columns,
+                        "score": full_scores,
+                        "p_value": p_values,
+                        "rank": full_rank,
+                        "selected": full_rank <= k,
+                        "stability": (fold_ranks <= k).mean(axis=0),
+                    }
+                )
+            )
+    df_sweep = pd.concat(tables, ignore_index=True)
+    # Seasons are sorted in the order of `seasons` rather than by name
+    df_sweep["season"] = pd.Categorical(df_sweep["season"], list(subsets))
+    return df_sweep.sort_values(
+        ["score_function", "season", "k", "rank"], ignore_index=True
+    )
+
+
+def plot_f_test(df_results, fig=None, show=True):
     """
     Displays a horizontal bar plot of the f-scores with all features.
 
     Args:
         df_results: a pandas dataframe of the results of the ANOVA F-test using
         the `f_regression` method in sklearn module.
+        fig: an optional empty matplotlib figure to draw on. A new pyplot
+        figure if None.
+        show: a boolean of whether to display the figure with `plt.show()`.
     Returns:
-        Nothing.
+        The matplotlib figure.
     """
     df_results = df_results.sort_values("F-Score", ascending=True)
     ylabels = [
@@ -62,11 +625,15 @@ def plot_f_test(df_results):
         "Total Monthly\n Electricity Cost",
     ]
 
-    _, ax1 = plt.subplots()
+    if fig is None:
+        fig = new_figure()
+    ax1 = fig.subplots()
     ax1.barh(ylabels, df_results["F-Score"])
     ax1.set_ylabel("Features")
     ax1.set_xlabel("F-Score")
     ax1.set_title(
         "F-Score of Features for \nTotal Monthly Electricity Consumption"
     )
-    plt.show()
+    if show:
+        show_figures()
+    return fig
@@ -0,0 +1,233 @@
+"""
+File containing helper functions that engineer candidate features from the
+climate data, such as heating and cooling degree days, lagged values and
+rolling means and maxima, and shape them into a matrix ready for
+`feature_selection`.
+
+Every feature family is computed for all columns at once with array
+operations: degree days by broadcasting against the base temperatures,
+rolling means from cumulative sums and rolling maxima from strided windows.
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from functions.functions_manage_data import (
+    build_wide_table,
+    join_dataframes,
+    month_key,
+)
+
+TEMPERATURE = "TAVG"
+TARGET = "total_consumption"
+
+# Base temperatures of the degree days, in degrees Fahrenheit (the standard
+# units of CDO), 65 being the usual base for buildings
+DEGREE_DAY_BASES = (55, 60, 65)
+
+# Lags and rolling windows are counted in rows of the wide table, so in days
+# for daily data and in months for monthly data
+LAGS = (1, 2, 3)
+WINDOWS = (3, 6, 12)
+
+
+def degree_days(temperatures, bases=DEGREE_DAY_BASES):
+    """
+    Compute the heating and cooling degree days of average temperatures for
+    several base temperatures at once.
+
+    For monthly average temperatures, this is the usual approximation of the
+    average daily degree days of the month.
+
+    Args:
+        temperatures: a numpy array of average temperatures.
+        bases: a tuple of the base temperatures.
+    Returns:
+        A tuple of numpy arrays of the heating and cooling degree days, with
+        one row per temperature and one column per base.
+    """
+    difference = np.asarray(bases, dtype=float) - np.asarray(
+        temperatures, dtype=float
+    ).reshape(-1, 1)
+    return np.maximum(difference, 0), np.maximum(-difference, 0)
+
+
+def lag(values, lags=LAGS):
+    """
+    Shift every column of a matrix down by several lags, padding with NaN.
+
+    Args:
+        values: a 2-D numpy array with one row per date.
+        lags: a tuple of positive integers of the lags, in rows.
+    Returns:
+        A list of 2-D numpy arrays shaped like `values`, one per lag.
+    """
+    blocks = []
+    for n_rows in lags:
+        block = np.full(values.shape, np.nan)
+        block[n_rows:] = values[: len(values) - n_rows]
+        blocks.append(block)
+    return blocks
+
+
+def rolling_mean(values, window):
+    """
+    Compute the mean of every column over a rolling window of rows, from the
+    differences of cumulative sums.
+
+    Missing values are summed as zeros and counted separately, so that they
+    only make the windows containing them missing.
+
+    Args:
+        values: a 2-D numpy array with one row per date.
+        window: an integer of the number of rows of the window.
+    Returns:
+        A 2-D numpy array shaped like `values`, with NaN in the first
+        `window - 1` rows and in the windows with a missing value.
+    """
+    present = ~np.isnan(values)
+    sums = np.zeros((len(values) + 1, values.shape[1]))
+    np.cumsum(np.where(present, values, 0), axis=0, out=sums[1:])
+    counts = np.zeros(sums.shape, dtype=np.int64)
+    np.cumsum(present, axis=0, out=counts[1:])
+    means = np.full(values.shape, np.nan)
+    complete = counts[window:] - counts[:-window] == window
+    means[window - 1 :] = np.where(
+        complete, (sums[window:] - sums[:-window]) / window, np.nan
+    )
+    return means
+
+
+def rolling_max(values, window):
+    """
+    Compute the maximum of every column over a rolling window of rows, from
+    a strided view of the windows.
+
+    Args:
+        values: a 2-D numpy array with one row per date.
+        window: an integer of the number of rows of the window.
+    Returns:
+        A 2-D numpy array shaped like `values`, with NaN in the first
+        `window - 1` rows.
+    """
+    maxima = np.full(values.shape, np.nan)
+    if window <= len(values):
+        windows = sliding_window_view(values, window, axis=0)
+        maxima[window - 1 :] = windows.max(axis=-1)
+    return maxima
+
+
+def build_features(
+    df_wide,
+    temperature=TEMPERATURE,
+    bases=DEGREE_DAY_BASES,
+    lags=LAGS,
+    windows=WINDOWS,
+):
+    """
+    Build the candidate features of a wide climate table.
+
+    The base columns are the datatypes of the table, followed by the heating
+    ("HDD_<base>") and cooling ("CDD_<base>") degree days of the temperature
+    column if the table has it. Each base column is then lagged
+    ("<column>_lag<n>") and averaged ("<column>_mean<n>") and maximized
+    ("<column>_max<n>") over rolling windows.
+
+    Args:
+        df_wide: a pandas dataframe with a `date` column and one column per
+        datatype, sorted by date, as returned by `build_wide_table`.
+        temperature: a string of the column of average temperatures.
+        bases: a tuple of the base temperatures of the degree days.
+        lags: a tuple of positive integers of the lags, in rows.
+        windows: a tuple of integers of the rolling windows, in rows.
+    Returns:
+        A pandas dataframe with the `date` column followed by one column per
+        feature.
+    """
+    names = [column for column in df_wide.columns if column != "date"]
+    blocks = [df_wide[names].to_numpy(float)]
+    if temperature in names and len(bases) > 0:
+        heating, cooling = degree_days(df_wide[temperature], bases)
+        blocks += [heating, cooling]
+        names += [f"HDD_{base}" for base in bases]
+        names += [f"CDD_{base}" for base in bases]
+    base_values = np.hstack(blocks)
+
+    blocks = [base_values]
+    columns = list(names)
+    blocks += lag(base_values, lags)
+    columns += [f"{name}_lag{n_rows}" for n_rows in lags for name in names]
+    for window in windows:
+        blocks += [
+            rolling_mean(base_values, window),
+            rolling_max(base_values, window),
+        ]
+        columns += [f"{name}_mean{window}" for name in names]
+        columns += [f"{name}_max{window}" for name in names]
+
+    df_features = pd.DataFrame(np.hstack(blocks), columns=columns)
+    df_features.insert(0, "date", df_wide["date"].to_numpy())
+    return df_features
+
+
+def monthly_features(df_features):
+    """
+    Average the features of every month, so that daily features line up with
+    monthly utility bills. Monthly features are left as they are.
+
+    Args:
+        df_features: a pandas dataframe with a `date` column and one column
+        per feature, as returned by `build_features`.
+    Returns:
+        A pandas dataframe with the first day of each month in the `date`
+        column and the mean of each feature over the month, ignoring NaN.
+    """
+    codes, months = pd.factorize(month_key(df_features["date"]), sort=True)
+    values = df_features.drop(columns="date").to_numpy(float)
+    present = np.isfinite(values)
+
+    n_columns = values.shape[1]
+    flat_index = (codes[:, None] * n_columns + np.arange(n_columns)).ravel()
+    size = len(months) * n_columns
+    sums = np.bincount(
+        flat_index, np.where(present, values, 0).ravel(), minlength=size
+    )
+    counts = np.bincount(flat_index, present.ravel(), minlength=size)
+    with np.errstate(invalid="ignore"):
+        means = (sums / counts).reshape(len(months), n_columns)
+
+    df_monthly = pd.DataFrame(means, columns=df_features.columns[1:])
+    df_monthly.insert(
+        0, "date", np.asarray(months).astype("datetime64[M]").astype("M8[ns]")
+    )
+    return df_monthly
+
+
+def feature_matrix(list_df_weather, df_util, target=TARGET, **options):
+    """
+    Build the candidate features of the climate data and line them up with
+    the monthly utility bills, ready to be scored.
+
+    Args:
+        list_df_weather: a list of climate pandas dataframes, each with
+        `date`, `datatype` and `value` columns.
+        df_util: a pandas dataframe of the utility data.
+        target: a string of the utility column to score the features for.
+        **options: the `temperature`, `bases`, `lags` and `windows` of
+        `build_features`.
+    Returns:
+        A tuple of a pandas dataframe of the features and a pandas series of
+        the target, with one row per bill and without missing values, to pass
+        to `feature_selection`.
+    """
+    df_features = monthly_features(
+        build_features(build_wide_table(list_df_weather), **options)
+    )
+    df_joined = join_dataframes(
+        df_features, df_util[["start_read_date", target]]
+    )
+    feature_columns = list(df_features.columns[1:])
+    complete = df_joined[feature_columns + [target]].notna().all(axis=1)
+    df_joined = df_joined[complete].reset_index(drop=True)
+    return df_joined[feature_columns], df_joined[target].astype(float)
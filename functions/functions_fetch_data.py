@@ -0,0 +1,359 @@
+"""
+File containing helper functions that fetch data from the NOAA Climate Data
+Online (CDO) API concurrently, following the API's offset pagination and
+staying under its request quotas.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+CDO_URL = "https://www.ncei.noaa.gov/cdo-web/api/v2/data"
+
+# The CDO API returns at most 1000 results per request
+PAGE_LIMIT = 1000
+MAX_WORKERS = 5
+
+# Quotas documented by the CDO API for every token
+REQUESTS_PER_SECOND = 5
+REQUESTS_PER_DAY = 10000
+
+# Requests made today, shared by every process next to the response cache
+USAGE_PATH = "data/cache/cdo_usage.json"
+
+# Monthly and annual datasets may span ten years per request, every other
+# dataset (e.g. daily GHCND) only one year
+MAX_RANGE_YEARS = {"GSOM": 10, "GSOY": 10}
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket used to throttle requests.
+
+    The bucket holds up to `capacity` tokens and refills at `rate` tokens per
+    second. Each request takes one token and waits when the bucket is empty.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            rate: a float of how many tokens are added per second.
+            capacity: an integer of the maximum number of stored tokens.
+            clock: a function returning the current time in seconds.
+            sleep: a function that blocks for a given number of seconds.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._last) * self.rate
+        )
+        self._last = now
+
+    def acquire(self):
+        """
+        Take a single token from the bucket, blocking until one is available.
+
+        Returns:
+            Nothing.
+        """
+        with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                self._sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class DailyUsage:
+    """
+    Counts the requests made each (UTC) day in a file shared by every
+    process, so that the daily quota also holds across runs.
+
+    Once `limit` requests were made today, each request waits for the next
+    day.
+    """
+
+    def __init__(self, path, limit, clock=time.time, sleep=time.sleep):
+        """
+        Args:
+            path: a string of the path of the JSON file of the usage.
+            limit: an integer of the maximum number of requests per day.
+            clock: a function returning the current Unix time in seconds.
+            sleep: a function that blocks for a given number of seconds.
+        """
+        self.path = path
+        self.limit = limit
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def acquire(self):
+        """
+        Count a single request, blocking until the daily quota allows it.
+
+        Returns:
+            Nothing.
+        """
+        # The cache module imports this one, so import its helpers here
+        # pylint: disable-next=import-outside-toplevel
+        from functions.functions_cache import _file_lock, _write_atomic
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            while True:
+                now = self._clock()
+                today = datetime.fromtimestamp(now, timezone.utc)
+                today = today.date().isoformat()
+                with _file_lock(f"{self.path}.lock"):
+                    usage = self._read()
+                    count = usage.get(today, 0)
+                    if count < self.limit:
+                        data = json.dumps({today: count + 1})
+                        _write_atomic(self.path, data.encode("utf-8"))
+                        return
+                self._sleep(86400 - now % 86400)
+
+
+class RateLimiter:
+    """
+    Combines a per-second token bucket and a per-day quota, mirroring the two
+    quotas enforced by the CDO API.
+
+    The per-second rate is enforced within this process. The per-day quota is
+    counted in `usage_path`, shared by every process and run of the same day.
+    """
+
+    def __init__(
+        self,
+        per_second=REQUESTS_PER_SECOND,
+        per_day=REQUESTS_PER_DAY,
+        clock=time.monotonic,
+        sleep=time.sleep,
+        usage_path=USAGE_PATH,
+    ):
+        """
+        Args:
+            per_second: an integer of the maximum number of requests per
+            second.
+            per_day: an integer of the maximum number of requests per day.
+            clock: a function returning the current time in seconds.
+            sleep: a function that blocks for a given number of seconds.
+            usage_path: an optional string of the file counting the requests
+            made each day. If None, the per-day quota only counts the
+            requests of this limiter.
+        """
+        if usage_path is None:
+            daily = TokenBucket(per_day / 86400, per_day, clock, sleep)
+        else:
+            daily = DailyUsage(usage_path, per_day, sleep=sleep)
+        self.buckets = [
+            daily,
+            TokenBucket(per_second, per_second, clock, sleep),
+        ]
+
+    def acquire(self):
+        """
+        Block until a request is allowed by every quota.
+
+        Returns:
+            Nothing.
+        """
+        for bucket in self.buckets:
+            bucket.acquire()
+
+
+def make_session(pool_size=MAX_WORKERS):
+    """
+    Create a `requests` session with a connection pool large enough for
+    `pool_size` concurrent requests, retrying on throttling and server errors.
+
+    Args:
+        pool_size: an integer of the number of pooled connections.
+    Returns:
+        A `requests.Session` object.
+    """
+    # Imported here so that modules only reading local data start quickly
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def split_date_range(start_date, end_date, years):
+    """
+    Split a date range into consecutive ranges of at most `years` years.
+
+    Args:
+        start_date: a string of the first date in "YYYY-MM-DD" format.
+        end_date: a string of the last date in "YYYY-MM-DD" format.
+        years: an integer of the maximum number of years in each range.
+    Returns:
+        A list of (start, end) tuples of "YYYY-MM-DD" strings.
+    """
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    ranges = []
+    while start <= end:
+        try:
+            next_start = start.replace(year=start.year + years)
+        except ValueError:
+            # February 29th in a non leap year
+            next_start = start.replace(year=start.year + years, day=28)
+        chunk_end = min(end, date.fromordinal(next_start.toordinal() - 1))
+        ranges.append((start.isoformat(), chunk_end.isoformat()))
+        start = next_start
+    return ranges
+
+
+def build_queries(
+    dataset_id, station_ids, datatype_ids, start_date, end_date, units
+):
+    """
+    Build the query parameters needed to fetch every station and datatype
+    over a date range, split to fit the CDO date range limits.
+
+    Args:
+        dataset_id: a string of the CDO dataset ID (ex. GSOM).
+        station_ids: a list of strings of the CDO station IDs.
+        datatype_ids: a list of strings of the CDO datatype IDs.
+        start_date: a string of the first date in "YYYY-MM-DD" format.
+        end_date: a string of the last date in "YYYY-MM-DD" format.
+        units: a string of the units parameter ("standard" or "metric").
+    Returns:
+        A list of dictionaries of query parameters.
+    """
+    years = MAX_RANGE_YEARS.get(dataset_id, 1)
+    return [
+        {
+            "datasetid": dataset_id,
+            "stationid": station_id,
+            "datatypeid": datatype_id,
+            "units": units,
+            "startdate": chunk_start,
+            "enddate": chunk_end,
+        }
+        for station_id in station_ids
+        for datatype_id in datatype_ids
+        for chunk_start, chunk_end in split_date_range(
+            start_date, end_date, years
+        )
+    ]
+
+
+def fetch_page(session, limiter, token, params, offset, limit, url=CDO_URL):
+    """
+    Request a single page of results from the CDO API.
+
+    Args:
+        session: a `requests.Session` to send the request with.
+        limiter: a `RateLimiter` (or anything with an `acquire` method).
+        token: a string of the CDO API token.
+        params: a dictionary of query parameters.
+        offset: an integer of the 1-based offset of the first result.
+        limit: an integer of the number of results per page.
+        url: a string of the endpoint URL.
+    Returns:
+        A dictionary of the decoded JSON response. Queries without any data
+        return an empty dictionary.
+    """
+    limiter.acquire()
+    response = session.get(
+        url,
+        params={**params, "offset": offset, "limit": limit},
+        headers={"token": token},
+        timeout=60,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_data(
+    queries,
+    token,
+    url=CDO_URL,
+    limit=PAGE_LIMIT,
+    max_workers=MAX_WORKERS,
+    limiter=None,
+    session=None,
+):
+    """
+    Fetch every page of every query concurrently.
+
+    The first page of each query is requested to learn its result count from
+    `metadata.resultset`, then all remaining pages are requested at once. All
+    requests share one pooled session and one rate limiter.
+
+    Args:
+        queries: a list of dictionaries of query parameters.
+        token: a string of the CDO API token.
+        url: a string of the endpoint URL.
+        limit: an integer of the number of results per page.
+        max_workers: an integer of the number of concurrent requests.
+        limiter: an optional `RateLimiter`, by default one that follows the
+        CDO quotas.
+        session: an optional `requests.Session`.
+    Returns:
+        A list with the list of results for each query, in the same order as
+        `queries`.
+    """
+    if limiter is None:
+        limiter = RateLimiter()
+    if session is None:
+        session = make_session(max_workers)
+
+    def get(query_offset):
+        query, offset = query_offset
+        return fetch_page(session, limiter, token, query, offset, limit, url)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        first_pages = list(
+            executor.map(get, [(query, 1) for query in queries])
+        )
+
+        # Every remaining (query index, offset) pair
+        remaining = []
+        for i, page in enumerate(first_pages):
+            resultset = page.get("metadata", {}).get("resultset", {})
+            count = resultset.get("count", 0)
+            for offset in range(1 + limit, count + 1, limit):
+                remaining.append((i, offset))
+        other_pages = executor.map(
+            get, [(queries[i], offset) for i, offset in remaining]
+        )
+
+        results = [page.get("results", []) for page in first_pages]
+        for (i, _), page in zip(remaining, other_pages):
+            results[i].extend(page.get("results", []))
+
+    return results
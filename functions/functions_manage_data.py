@@ -3,15 +3,33 @@ File containing helper functions that manage and format data retrieved from
 the weather API and the Olin utility spreadsheet.
 """
 import json
-import requests
+import os
+import re
 import pandas as pd
 import numpy as np
+from functions.functions_cache import cached_fetch
+from functions.functions_excel import load_sheets
+from functions.functions_fetch_data import fetch_data
+from functions.functions_parse import (
+    DATE_FORMAT,
+    time_to_minutes,
+    to_datetime64,
+)
+from functions.functions_store import (
+    is_up_to_date,
+    read_columnar,
+    write_columnar,
+)
 
 STATION_ID = "GHCND:USW00014739"
 DATASET_ID = "GSOM"
 START_DATE = "2013-04-01"
 END_DATE = "2022-12-31"
-LIMIT = "120"
+LIMIT = "1000"
+
+# Number of bytes read at a time and rows per chunk when streaming .json files
+READ_SIZE = 1 << 16
+CHUNK_SIZE = 10000
 
 PATH_UTILITY = "data/electricity_FY13_23.csv"
 PATH_UTILITY_JITTERED = "data/electricity_FY13_23_jittered.csv"
@@ -23,67 +41,340 @@ SEASONS = {
     "Fall": ("09", "10", "11"),
 }
 
+# Olin's fiscal year starts in July, and is named after the year it ends in
+FISCAL_YEAR_START_MONTH = 7
+SEASON_QUANTILES = (0.0, 0.25, 0.5, 0.75, 1.0)
+
+# Dtypes of the compact schema, used with `compact=True`: measurements as
+# float32 (about 7 significant digits), month keys as int32, months as int8
+# and times of peak demand as int16 minutes since midnight
+COMPACT_FLOAT = np.float32
+COMPACT_UTILITY_DTYPES = {
+    "total_consumption": COMPACT_FLOAT,
+    "total_cost": COMPACT_FLOAT,
+}
+
+
+def read_api_key():
+    """
+    Reads the CDO API token stored in `API_KEY.txt`.
+
+    Returns:
+        A string containing the API token.
+    """
+    with open("API_KEY.txt", "r", encoding="utf-8") as file:
+        return file.read().strip()
+
 
 def get_data_api(datatype_id):
     """
-    Calls the Weather API to receive data of a desired datatype and stores
-    into a .json file in the data folder.
+    Calls the Weather API to receive data of the desired datatypes and stores
+    each datatype into a .json file in the data folder.
+
+    Every page of results is fetched, so date ranges longer than the API's
+    per-request limits are retrieved in full. Multiple datatypes are fetched
+    concurrently. Responses are cached in `data/cache`, so calling this again
+    only requests the dates after the last cached one.
 
     Args:
         datatype_id: a string that specifies the datatype ID parameter in
-        the API function call.
+        the API function call, or a list of such strings.
     Returns:
         Nothing.
     """
-    url = (
-        f"https://www.ncei.noaa.gov/cdo-web/api/v2/data?datasetid={DATASET_ID}"
-        + f"&stationid={STATION_ID}&units=standard&startdate={START_DATE}"
-        + f"&enddate={END_DATE}&limit={LIMIT}&datatypeid={datatype_id}"
+    if isinstance(datatype_id, str):
+        datatype_ids = [datatype_id]
+    else:
+        datatype_ids = list(datatype_id)
+
+    def fetch(queries):
+        return fetch_data(queries, read_api_key(), limit=int(LIMIT))
+
+    results = cached_fetch(
+        fetch,
+        DATASET_ID,
+        [STATION_ID],
+        datatype_ids,
+        START_DATE,
+        END_DATE,
+        "standard",
     )
 
-    with open("API_KEY.txt", "r", encoding="utf-8") as file:
-        token = file.read()
+    for datatype in datatype_ids:
+        datatype_results = results[(STATION_ID, datatype)]
+        response_json = {
+            "metadata": {
+                "resultset": {
+                    "offset": 1,
+                    "count": len(datatype_results),
+                    "limit": len(datatype_results),
+                }
+            },
+            "results": datatype_results,
+        }
+        json_name = f"{datatype}.json"
+
+        with open("./data/" + json_name, "w", encoding="utf-8") as file:
+            json.dump(response_json, file, ensure_ascii=False, indent=4)
+
+
+def flatten_json(
+    json_name,
+    columns=None,
+    start_date=None,
+    end_date=None,
+    data_dir="./data/",
+    compact=False,
+):
+    """
+    Flattens .json file into a pandas dataframe.
 
-    response = requests.get(url, headers={"token": token})
-    response_json = response.json()
-    json_name = f"{datatype_id}.json"
+    The first time a .json file is loaded (or after it changes), it is
+    converted to a columnar store in the `columnar` folder of `data_dir`,
+    which later calls read directly. Only the requested columns and dates are
+    then loaded.
 
-    with open("./data/" + json_name, "w", encoding="utf-8") as file:
-        json.dump(response_json, file, ensure_ascii=False, indent=4)
+    Args:
+        json_name: a string containing the name of the .json file.
+        columns: an optional list of strings of the columns to load. All
+        columns are loaded if None.
+        start_date: an optional string of the first date to load.
+        end_date: an optional string of the last date to load.
+        data_dir: a string of the folder containing the .json file.
+        compact: a boolean of whether to load the `station`, `datatype` and
+        `attributes` columns as categoricals and `value` as float32.
+    Returns:
+        A pandas dataframe containing the information in the .json file.
+    """
+    store_dir = update_columnar(json_name, data_dir)
+    return read_columnar(
+        json_name, columns, start_date, end_date, store_dir, compact
+    )
 
 
-def flatten_json(json_name):
+def update_columnar(json_name, data_dir="./data/"):
     """
-    Flattens .json file into a pandas dataframe.
+    Converts a .json file to a columnar store in the `columnar` folder of
+    `data_dir`, unless the store is already newer than the file.
 
     Args:
         json_name: a string containing the name of the .json file.
+        data_dir: a string of the folder containing the .json file.
     Returns:
-        A pandas dataframe containing the information in the .json file.
+        A string of the folder containing the store.
+    """
+    json_path = os.path.join(data_dir, json_name + ".json")
+    store_dir = os.path.join(data_dir, "columnar")
+    if not is_up_to_date(json_name, json_path, store_dir):
+        with open(json_path, encoding="utf-8") as file:
+            data = json.loads(file.read())
+        records = pd.json_normalize(data, record_path=["results"])
+        write_columnar(records, json_name, store_dir)
+    return store_dir
+
+
+def iter_json_results(json_path, read_size=READ_SIZE):
+    """
+    Iterates over the items of the "results" array of a CDO .json file
+    without loading the whole file.
+
+    The file is read `read_size` characters at a time and each result is
+    decoded as soon as it is complete, so memory use does not grow with the
+    size of the file.
+
+    Args:
+        json_path: a string of the path to the .json file.
+        read_size: an integer of the number of characters read at a time.
+    Yields:
+        A dictionary for each result.
+    """
+    decoder = json.JSONDecoder()
+    start_pattern = re.compile(r'"results"\s*:\s*\[')
+    with open(json_path, encoding="utf-8") as file:
+        # Skip everything up to the start of the results array
+        buffer = ""
+        while True:
+            block = file.read(read_size)
+            buffer += block
+            match = start_pattern.search(buffer)
+            if match:
+                buffer = buffer[match.end() :]
+                break
+            if not block:
+                return
+            # Keep enough of the tail in case the key is split across reads
+            buffer = buffer[-32:]
+
+        pos = 0
+        at_eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                if pos == len(buffer):
+                    raise json.JSONDecodeError("Need more data", buffer, pos)
+                result, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if at_eof:
+                    raise
+                block = file.read(read_size)
+                at_eof = not block
+                buffer = buffer[pos:] + block
+                pos = 0
+                continue
+            yield result
+
+
+def flatten_json_chunks(json_name, chunk_size=CHUNK_SIZE, data_dir="./data/"):
+    """
+    Flattens a .json file into pandas dataframes of at most `chunk_size` rows,
+    one chunk at a time.
+
+    Unlike `flatten_json`, the file is never fully loaded in memory, so peak
+    memory is bounded by the chunk size rather than the size of the file.
+
+    Args:
+        json_name: a string containing the name of the .json file.
+        chunk_size: an integer of the maximum number of rows per chunk.
+        data_dir: a string of the folder containing the .json file.
+    Yields:
+        A pandas dataframe for each chunk, with `date` parsed as datetimes
+        and `value` as floats.
+    """
+
+    def to_frame(rows):
+        data_frame = pd.DataFrame.from_records(rows)
+        data_frame["date"] = to_datetime64(data_frame["date"])
+        data_frame["value"] = data_frame["value"].astype(float)
+        return data_frame
+
+    rows = []
+    json_path = os.path.join(data_dir, json_name + ".json")
+    for result in iter_json_results(json_path):
+        rows.append(result)
+        if len(rows) == chunk_size:
+            yield to_frame(rows)
+            rows = []
+    if rows:
+        yield to_frame(rows)
+
+
+def month_key(dates):
+    """
+    Converts dates into integer month keys, the number of months since
+    January 1970, without formatting any strings.
+
+    Args:
+        dates: a pandas series of datetimes or of date strings.
+    Returns:
+        A numpy array of int64 month keys.
+    """
+    return to_datetime64(dates).astype("datetime64[M]").astype(np.int64)
+
+
+def format_month_key(keys, categorical=False):
+    """
+    Converts integer month keys back into "YYYY-MM" strings for display.
+
+    Only the distinct keys are formatted, so the cost depends on the number
+    of months rather than the number of rows.
+
+    Args:
+        keys: an array-like of integer month keys from `month_key`.
+        categorical: a boolean of whether to return a categorical, storing
+        each distinct string once.
+    Returns:
+        A numpy array or a pandas categorical of "YYYY-MM" strings.
+    """
+    uniques, inverse = np.unique(np.asarray(keys), return_inverse=True)
+    labels = np.datetime_as_string(uniques.astype("datetime64[M]"))
+    if categorical:
+        return pd.Categorical.from_codes(inverse, labels)
+    return labels.astype(object)[inverse]
+
+
+def utility_path():
+    """
+    Find the utility data, falling back to the jittered data when the
+    original data is missing.
+
+    Returns:
+        A string of the path of the utility .csv file.
+    """
+    if os.path.isfile(PATH_UTILITY):
+        return PATH_UTILITY
+    return PATH_UTILITY_JITTERED
+
+
+def read_utility(path=None, compact=False):
+    """
+    Reads the utility data .csv file.
+
+    Args:
+        path: an optional string of the path of the .csv file. Defaults to the
+        Olin utility data, or to the jittered data if it is missing.
+        compact: a boolean of whether to parse the read dates as datetimes,
+        the consumption and cost as float32 and the time of peak demand as
+        int16 minutes, while reading the file.
+    Returns:
+        A pandas dataframe of the utility data.
     """
-    with open("./data/" + json_name + ".json", encoding="utf-8") as file:
-        data = json.loads(file.read())
-    data_frame = pd.json_normalize(data, record_path=["results"])
-    return data_frame
+    if path is None:
+        path = utility_path()
+    if not compact:
+        return pd.read_csv(path)
+
+    df_util = pd.read_csv(
+        path,
+        dtype=COMPACT_UTILITY_DTYPES,
+        parse_dates=["start_read_date", "end_read_date"],
+        date_format=DATE_FORMAT,
+    )
+    df_util["time_of_peak_demand"] = time_to_minutes(
+        df_util["time_of_peak_demand"]
+    )
+    return df_util
 
 
-def join_dataframes(df_weather, df_util):
+def join_dataframes(df_weather, df_util, year_month=False, compact=False):
     """
     Joins the chosen weather information dataframe with the Olin utilities
-    dataframe by columns, and merges based on the column "year-month".
+    dataframe by columns, and merges based on the month of the start read
+    date and of the weather date.
+
+    The months are compared as integer keys (stored in the "period" column)
+    and neither input dataframe is modified.
 
     Args:
         df_weather: the dataframe containing a specified type of weather
         information.
         df_util: the dataframe containing the Olin utility information.
+        year_month: a boolean of whether to add a "year-month" column of
+        "YYYY-MM" strings after the "period" column, for display.
+        compact: a boolean of whether to store the "period" keys as int32 and
+        the "year-month" strings as a categorical.
     Returns:
         A joined pandas dataframe with df_weather and df_util.
     """
-    df_util["start_read_date"] = pd.to_datetime(df_util["start_read_date"])
-    df_util["year-month"] = df_util["start_read_date"].dt.strftime("%Y-%m")
-    df_weather["date"] = pd.to_datetime(df_weather["date"])
-    df_weather["year-month"] = df_weather["date"].dt.strftime("%Y-%m")
-    df_util_weather = pd.merge(left=df_util, right=df_weather, on="year-month")
+    key_dtype = np.int32 if compact else np.int64
+    util_dates = to_datetime64(df_util["start_read_date"])
+    weather_dates = to_datetime64(df_weather["date"])
+    df_left = df_util.assign(
+        start_read_date=util_dates,
+        period=month_key(util_dates).astype(key_dtype),
+    )
+    df_right = df_weather.assign(
+        date=weather_dates, period=month_key(weather_dates).astype(key_dtype)
+    )
+    df_util_weather = pd.merge(left=df_left, right=df_right, on="period")
+    if year_month:
+        df_util_weather.insert(
+            df_util_weather.columns.get_loc("period") + 1,
+            "year-month",
+            format_month_key(df_util_weather["period"], compact),
+        )
     return df_util_weather
 
 
@@ -105,6 +396,113 @@ def calc_weather_util_corr(df_util_weather):
     return np.corrcoef(weather_data, consumption_data)[0][1]
 
 
+def season_codes(dates, seasons=None):
+    """
+    Labels dates with the season they fall in, using integer months only.
+
+    Args:
+        dates: a pandas series or numpy array of datetimes or date strings.
+        seasons: an optional dictionary mapping each season name to the
+        months (as "MM" strings or integers) it contains. Defaults to
+        `SEASONS`.
+    Returns:
+        A pandas categorical of season names, with the seasons in the order
+        of `seasons`. Dates in months outside every season are NaN.
+    """
+    if seasons is None:
+        seasons = SEASONS
+    # Lookup table from month number (1 to 12) to season code
+    month_to_code = np.full(13, -1, dtype=np.int8)
+    for code, months in enumerate(seasons.values()):
+        month_to_code[[int(month) for month in months]] = code
+    months = month_key(dates) % 12 + 1
+    return pd.Categorical.from_codes(
+        month_to_code[months], categories=list(seasons)
+    )
+
+
+def fiscal_year(dates, start_month=FISCAL_YEAR_START_MONTH):
+    """
+    Finds the fiscal year of dates, named after the calendar year it ends in.
+
+    Args:
+        dates: a pandas series or numpy array of datetimes or date strings.
+        start_month: an integer of the first month of the fiscal year.
+    Returns:
+        A numpy array of integer fiscal years.
+    """
+    keys = month_key(dates)
+    years = keys // 12 + 1970
+    if start_month == 1:
+        return years
+    return years + (keys % 12 + 1 >= start_month)
+
+
+def partition_seasons(df_util_weather, seasons=None, date_column="date"):
+    """
+    Splits a dataframe into one dataframe per season in a single pass.
+
+    Args:
+        df_util_weather: a pandas dataframe with a column of dates.
+        seasons: an optional dictionary mapping each season name to its
+        months. Defaults to `SEASONS`.
+        date_column: a string of the name of the column of dates.
+    Returns:
+        A dictionary mapping each season name to a dataframe of its rows.
+        Seasons without rows map to empty dataframes.
+    """
+    codes = season_codes(df_util_weather[date_column], seasons)
+    groups = dict(
+        list(df_util_weather.groupby(codes, observed=True, sort=False))
+    )
+    return {
+        season: groups.get(season, df_util_weather.iloc[:0])
+        for season in codes.categories
+    }
+
+
+def season_summary(
+    df_util_weather,
+    column="total_consumption",
+    seasons=None,
+    quantiles=SEASON_QUANTILES,
+    by_fiscal_year=False,
+    date_column="date",
+    fiscal_year_start=FISCAL_YEAR_START_MONTH,
+):
+    """
+    Computes the summary statistics of a column for every season at once,
+    such as those drawn by a box plot.
+
+    Args:
+        df_util_weather: a pandas dataframe with a column of dates.
+        column: a string of the name of the column to summarize.
+        seasons: an optional dictionary mapping each season name to its
+        months. Defaults to `SEASONS`.
+        quantiles: a tuple of floats of the quantiles to compute.
+        by_fiscal_year: a boolean of whether to also group by fiscal year.
+        date_column: a string of the name of the column of dates.
+        fiscal_year_start: an integer of the first month of the fiscal year.
+    Returns:
+        A pandas dataframe indexed by season (and fiscal year) with the
+        columns "count", "mean" and "q<quantile>" for each quantile.
+    """
+    dates = df_util_weather[date_column]
+    keys = [pd.Series(season_codes(dates, seasons), name="season")]
+    if by_fiscal_year:
+        keys.append(
+            pd.Series(
+                fiscal_year(dates, fiscal_year_start), name="fiscal_year"
+            )
+        )
+    values = pd.Series(df_util_weather[column].to_numpy(float))
+    grouped = values.groupby(keys, observed=True)
+    df_summary = grouped.agg(["count", "mean"])
+    df_quantiles = grouped.quantile(list(quantiles)).unstack()
+    df_quantiles.columns = [f"q{quantile:g}" for quantile in quantiles]
+    return df_summary.join(df_quantiles)
+
+
 def filter_season(season, df_util_weather):
     """
     Filters the joined utilities and weather dataframe to only include rows
@@ -116,14 +514,18 @@ def filter_season(season, df_util_weather):
     Returns:
         A dataframe containing the joint weather and utilities data only from
         the specified season.
+    Raises:
+        KeyError: if `season` is not one of the `SEASONS`.
     """
+    if season not in SEASONS:
+        raise KeyError(f"Unknown season: {season}")
     df_season = df_util_weather[
-        df_util_weather["date"].dt.strftime("%m").isin(SEASONS[season])
+        season_codes(df_util_weather["date"]) == season
     ]
     return df_season
 
 
-def tidy_data(utility_data):
+def tidy_data(utility_data, output_path=PATH_UTILITY, max_workers=None):
     """
     Tidy the utility data excel file.
 
@@ -132,52 +534,28 @@ def tidy_data(utility_data):
         1. Every column is a variable.
         2. Every row is an observation.
         3. Every cell is a single value.
-    First, read the excel file to a create dataframes for each fiscal year from
-    2013 to 2023 with the information. Filter any columns with empty cells and
-    transpose the dataframes. Additionally, filter only columns that are
-    relevant to the scope of the project. Change the column names to snakecase
-    and concacenate the dataframes to create a single dataframe that contains
-    all the fiscal years. Save the dataframe locally as a .csv file.
+    First, find every fiscal year sheet (named like FY13) in the excel file
+    and read each one into a dataframe, in parallel. Filter any columns with
+    empty cells and transpose the dataframes. Additionally, filter only
+    columns that are relevant to the scope of the project. Change the column
+    names to snakecase and concacenate the dataframes to create a single
+    dataframe that contains all the fiscal years. Save the dataframe locally
+    as a .csv file.
+
+    Parsed sheets are cached by their content in `data/cache/sheets`, so only
+    sheets that are new or changed since the last call are read again.
 
     Args:
         utility data: a string that represent the path to the excel sheet
         containing the utility data.
+        output_path: a string of the path of the .csv file to save.
+        max_workers: an optional integer of the number of processes used to
+        read the sheets. Defaults to the number of CPUs.
     Returns:
         Nothing.
     """
-
-    # Read the excel sheet and store them as a list of dataframes
-    df_electric_all = []
-    excel_electricity = pd.ExcelFile(utility_data)
-    for i in range(13, 24):
-        df_electric = pd.read_excel(
-            excel_electricity, f"FY{i}", header=None, usecols="C:O", nrows=44
-        )
-        df_electric_transpose = df_electric.T
-        valid_cols_mask = df_electric_transpose.iloc[0, :].notnull()
-        df_electric_select = df_electric_transpose.loc[:, valid_cols_mask]
-        df_electric_all.append(df_electric_select)
-
-    # Select relevant data (columns) for the scope of the project
-    df_electric_filtered = []
-    for i in range(0, 11):
-        useful_cols = [
-            "Start Read Date",
-            "End Read Date",
-            "Time of Peak Demand",
-            "Total Cons. (kwh)",
-            "Total Monthly Electricity Cost",
-        ]
-        index_useful = df_electric_all[i].iloc[0, :].isin(useful_cols)
-        df_electric_filtered.append(df_electric_all[i].loc[:, index_useful])
-        df_electric_filtered[i].columns = [
-            "start_read_date",
-            "end_read_date",
-            "total_consumption",
-            "time_of_peak_demand",
-            "total_cost",
-        ]
-        df_electric_filtered[i] = df_electric_filtered[i].iloc[1:, :]
+    # Read the fiscal year sheets and store them as a list of dataframes
+    df_electric_filtered = load_sheets(utility_data, max_workers=max_workers)
 
     # Concatenating dataframes into a single long dataframe
     df_electric_long = pd.concat(df_electric_filtered, ignore_index=True)
@@ -186,50 +564,93 @@ def tidy_data(utility_data):
     df_electric_long.dropna(axis=0, inplace=True)
 
     # Save dataframe locally as a .csv file
-    df_electric_long.to_csv("data/electricity_FY13_23.csv", index=False)
+    df_electric_long.to_csv(output_path, index=False)
 
 
-def merge_all_df(list_df_weather):
+def build_wide_table(list_df_weather, dtype=float):
+    """
+    Combine climate dataframes into a single wide dataframe with one row per
+    date and one column per datatype.
+
+    The long-format columns of every dataframe are concatenated once and
+    placed into a date by datatype matrix in a single vectorized step, with
+    the column names taken from each record's `datatype`. Only dates that
+    have a value for every datatype are kept. Values sharing a date and
+    datatype (ex. from several stations) are averaged.
+
+    Args:
+        list_df_weather: a list of climate pandas dataframes, each with
+        `date`, `datatype` and `value` columns.
+        dtype: the numpy dtype of the datatype columns. Averages are always
+        computed in float64.
+    Returns:
+        A pandas dataframe with a `date` column followed by one column per
+        datatype, in the order the datatypes first appear.
+    """
+    date_codes, dates = pd.factorize(
+        np.concatenate(
+            [to_datetime64(df["date"]) for df in list_df_weather]
+        ),
+        sort=True,
+    )
+    type_codes, datatypes = pd.factorize(
+        np.concatenate(
+            [df["datatype"].to_numpy(object) for df in list_df_weather]
+        )
+    )
+    values = np.concatenate(
+        [df["value"].to_numpy(float) for df in list_df_weather]
+    )
+
+    shape = (len(dates), len(datatypes))
+    flat_index = date_codes * shape[1] + type_codes
+    sums = np.bincount(flat_index, values, minlength=shape[0] * shape[1])
+    counts = np.bincount(flat_index, minlength=shape[0] * shape[1])
+    with np.errstate(invalid="ignore"):
+        wide = (sums / counts).reshape(shape)
+
+    complete = (counts.reshape(shape) > 0).all(axis=1)
+    df_wide = pd.DataFrame(
+        wide[complete].astype(dtype, copy=False), columns=list(datatypes)
+    )
+    df_wide.insert(0, "date", dates[complete])
+    return df_wide
+
+
+def merge_all_df(list_df_weather, df_util=None, compact=False):
     """
     Merge all dataframes containing climate data and utility data.
 
-    The function joins the climate dataframes by their `date` and uses the
-    `join_dataframes` function to merge the utility dataframe with the merged
-    climate dataframe. Additionally, the function wrangles the time and date
-    columns into floats in order to utilize them in statistical tests.
+    The function builds a wide table of the climate dataframes with
+    `build_wide_table`, which averages the values sharing a date and datatype
+    (ex. from several stations), and uses the `join_dataframes` function to
+    merge the utility dataframe with the merged climate dataframe.
+    Additionally, the function wrangles the time and date columns into floats
+    in order to utilize them in statistical tests.
 
     Args:
         list_df_weather: a list of climate pandas dataframes to be merged with
         the utility dataframe.
+        df_util: an optional pandas dataframe of utility data. Defaults to the
+        Olin utility data saved in the data folder.
+        compact: a boolean of whether to use the compact schema: float32
+        measurements, a categorical "year-month", an int8 month and the time
+        of peak demand as int16 minutes instead of float hours.
     Returns:
         df_all_data: a pandas dataframe that contains all the information from
         the utility dataset as well as the climate data.
     """
-    col_names = ["date"]
-    df_merge = list_df_weather[0]
-    for dataframe in list_df_weather[1:]:
-        # Merge all the weather data together into a single dataframe
-        df_merge = pd.merge(left=df_merge, right=dataframe, on="date")
-
-        # Keep only useful data
-        df_filtered = df_merge.filter(regex="date|value|[A-Z]{4}", axis=1)
-
-        # Set column name to the datatype (ex. TAVG)
-        col_names = (
-            col_names + df_merge.filter(regex="datatype").iloc[0, :].tolist()
-        )
-        df_filtered.columns = col_names
-        df_merge = df_filtered
-
-    # Merge another dataframe
+    df_filtered = build_wide_table(
+        list_df_weather, COMPACT_FLOAT if compact else float
+    )
 
     # Join the utility data and the weather data
-    try:
-        df_util = pd.read_csv(PATH_UTILITY)
-    except FileNotFoundError:
-        df_util = pd.read_csv(PATH_UTILITY_JITTERED)
+    if df_util is None:
+        df_util = read_utility(compact=compact)
 
-    df_all_data = join_dataframes(df_filtered, df_util)
+    df_all_data = join_dataframes(
+        df_filtered, df_util, year_month=True, compact=compact
+    )
 
     # Drop unnecessary columns
     df_all_data = df_all_data.drop(
@@ -237,10 +658,19 @@ def merge_all_df(list_df_weather):
     )
 
     # Convert time information to numerical values
+    if compact:
+        peak_times = df_all_data["time_of_peak_demand"]
+        if not pd.api.types.is_numeric_dtype(peak_times):
+            df_all_data["time_of_peak_demand"] = time_to_minutes(peak_times)
+        df_all_data = df_all_data.astype(COMPACT_UTILITY_DTYPES)
+        df_all_data["month"] = (df_all_data.pop("period") % 12 + 1).astype(
+            np.int8
+        )
+        return df_all_data
+
     df_all_data["time_of_peak_demand"] = (
-        pd.to_datetime(df_all_data["time_of_peak_demand"]).dt.hour
-        + pd.to_datetime(df_all_data["time_of_peak_demand"]).dt.minute / 60
+        time_to_minutes(df_all_data["time_of_peak_demand"]) / 60
     )
-    df_all_data["month"] = pd.to_datetime(df_all_data["year-month"]).dt.month
+    df_all_data["month"] = df_all_data.pop("period") % 12 + 1
 
     return df_all_data
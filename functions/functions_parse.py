@@ -0,0 +1,62 @@
+"""
+File containing the date and time-of-day parsing shared by the data
+functions.
+
+Dates are parsed with a fixed format instead of having pandas infer one, and
+times of day are converted to minutes without building datetimes.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Every date string in the data is ISO 8601: "2013-04-01T00:00:00" in CDO
+# results and "2013-04-05 00:00:00" in the utility data
+DATE_FORMAT = "ISO8601"
+
+
+def to_datetime64(dates):
+    """
+    Converts dates into a numpy array of datetime64[ns], skipping the parsing
+    when they are already datetimes.
+
+    Date strings are parsed as ISO 8601 without inferring their format.
+
+    Args:
+        dates: a pandas series or numpy array of datetimes or of date
+        strings.
+    Returns:
+        A numpy array of datetime64[ns].
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return np.asarray(dates, dtype="datetime64[ns]")
+    return pd.to_datetime(dates, format=DATE_FORMAT).to_numpy("datetime64[ns]")
+
+
+def _parse_minutes(times):
+    # Times of day repeat a lot (there are only 1440 minutes in a day), so
+    # only the distinct strings are split
+    codes, uniques = pd.factorize(times)
+    parts = pd.Series(uniques, dtype=str).str.split(":", n=2, expand=True)
+    minutes = np.zeros(len(codes), dtype=np.int16)
+    if len(uniques) > 0:
+        unique_minutes = parts[0].astype(int) * 60 + parts[1].astype(int)
+        minutes = unique_minutes.to_numpy(np.int16).take(codes)
+    missing = codes < 0
+    if missing.any():
+        return pd.arrays.IntegerArray(minutes, missing)
+    return minutes
+
+
+def time_to_minutes(times):
+    """
+    Converts "HH:MM[:SS]" strings into minutes since midnight, ignoring
+    seconds, without parsing them as datetimes.
+
+    Args:
+        times: a pandas series of "HH:MM[:SS]" strings.
+    Returns:
+        A pandas series of int16 minutes, or of nullable Int16 minutes if
+        some times are missing, with the index of `times`.
+    """
+    minutes = _parse_minutes(times)
+    return pd.Series(minutes, index=times.index, name=times.name)
@@ -0,0 +1,259 @@
+"""
+File containing helper functions that merge the weather and utility data and
+compute the correlation and F-test statistics one partition of years at a
+time, spreading the partitions over a process pool.
+
+Weather and utility rows are joined by month, so splitting both by year gives
+partitions that join independently. Each partition only loads its own rows
+(the weather from the memory-mapped columnar store, the utility data from a
+split of the .csv file), so peak memory depends on the partition size rather
+than on the whole history. The partial statistics of the partitions are
+combined exactly with `IncrementalFRegression.merge`.
+"""
+
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from functions.functions_f_test import IncrementalFRegression
+from functions.functions_manage_data import (
+    CHUNK_SIZE,
+    merge_all_df,
+    read_utility,
+    update_columnar,
+    utility_path,
+)
+from functions.functions_parse import to_datetime64
+from functions.functions_store import read_columnar
+
+TARGETS = ("total_consumption",)
+WEATHER_COLUMNS = ["date", "datatype", "value"]
+
+
+def partition_years(dates, years_per_partition=1):
+    """
+    Get the first year of the partition of each date.
+
+    Args:
+        dates: a pandas series of datetimes or of date strings.
+        years_per_partition: an integer of the number of calendar years in
+        each partition.
+    Returns:
+        A numpy array of integer years.
+    """
+    years = to_datetime64(dates).astype("datetime64[Y]").astype(np.int64)
+    years = years + 1970
+    return years - years % years_per_partition
+
+
+def split_utility(util_path, directory, years_per_partition=1, chunksize=None):
+    """
+    Split the utility data .csv file into one .csv file per partition of
+    years of the start read date, reading `chunksize` rows at a time.
+
+    Args:
+        util_path: a string of the path of the utility data .csv file.
+        directory: a string of the folder the files are written to.
+        years_per_partition: an integer of the number of calendar years in
+        each partition.
+        chunksize: an optional integer of the number of rows read at a time.
+        Defaults to `CHUNK_SIZE`.
+    Returns:
+        A dictionary mapping the first year of each partition to the path of
+        its .csv file, sorted by year.
+    """
+    paths = {}
+    for chunk in pd.read_csv(util_path, chunksize=chunksize or CHUNK_SIZE):
+        years = partition_years(chunk["start_read_date"], years_per_partition)
+        for year, df_part in chunk.groupby(years, sort=False):
+            year = int(year)
+            if year not in paths:
+                paths[year] = os.path.join(directory, f"utility_{year}.csv")
+            df_part.to_csv(
+                paths[year],
+                mode="a",
+                header=not os.path.isfile(paths[year]),
+                index=False,
+            )
+    return dict(sorted(paths.items()))
+
+
+def _default_features(util_path, datatypes, targets, compact):
+    """
+    Get the numeric columns of the merged data that are not targets, by
+    merging the first utility row with a value of every datatype, so that
+    every partition is scored on the same features.
+    """
+    df_util = read_utility(util_path, compact).head(1)
+    df_weather = pd.DataFrame(
+        {
+            "date": np.repeat(
+                to_datetime64(df_util["start_read_date"]), len(datatypes)
+            ),
+            "datatype": datatypes,
+            "value": 0.0,
+        }
+    )
+    df_all_data = merge_all_df([df_weather], df_util, compact)
+    return [
+        column
+        for column in df_all_data.select_dtypes("number").columns
+        if column not in targets
+    ]
+
+
+def _merge_and_score(
+    util_path,
+    start_date,
+    end_date,
+    datatypes,
+    store_dir,
+    targets,
+    features,
+    compact,
+    output_path,
+):
+    """
+    Merge the weather and utility data of one partition and compute its
+    statistics. Returns the state of the `IncrementalFRegression`, the
+    number of merged rows and the run time in seconds. Nothing is saved for
+    a partition that merges to no rows.
+    """
+    start = time.perf_counter()
+    scorer = IncrementalFRegression(features, targets)
+    list_df_weather = [
+        read_columnar(
+            datatype, WEATHER_COLUMNS, start_date, end_date, store_dir, compact
+        )
+        for datatype in datatypes
+    ]
+    # Without a value of every datatype no date is complete, as in the merge
+    # of all the data
+    if any(df_weather.empty for df_weather in list_df_weather):
+        return scorer.to_dict(), 0, time.perf_counter() - start
+
+    df_all_data = merge_all_df(
+        list_df_weather, read_utility(util_path, compact), compact
+    )
+    scorer.update(df_all_data, df_all_data)
+    if output_path is not None and len(df_all_data) > 0:
+        df_all_data.to_pickle(output_path)
+    return scorer.to_dict(), len(df_all_data), time.perf_counter() - start
+
+
+def merge_and_score_partitioned(
+    datatypes,
+    util_path=None,
+    data_dir="./data/",
+    targets=TARGETS,
+    features=None,
+    years_per_partition=1,
+    compact=False,
+    output_dir=None,
+    max_workers=None,
+    chunksize=None,
+):
+    """
+    Merge the climate data and the utility data and compute the correlation
+    and F-test statistics of every feature, one partition of years at a time.
+
+    The result is the same as running `merge_all_df` on all the data and
+    updating an `IncrementalFRegression` with it, up to floating-point
+    rounding. Partitions are spread over a process pool, and each worker
+    holds a single partition in memory at a time.
+
+    Args:
+        datatypes: a list of strings of the weather datatypes, each stored in
+        a .json file of `data_dir`.
+        util_path: an optional string of the path of the utility data .csv
+        file. Defaults to the file used by `read_utility`.
+        data_dir: a string of the folder containing the .json files.
+        targets: a list of strings of the target columns.
+        features: an optional list of strings of the feature columns. All
+        other numeric columns of the merged data are used if None.
+        years_per_partition: an integer of the number of calendar years in
+        each partition.
+        compact: a boolean of whether to use the compact schema of
+        `merge_all_df`.
+        output_dir: an optional string of a folder where the merged dataframe
+        of each partition with rows is saved as a .pkl file.
+        max_workers: an optional integer of the number of processes. Defaults
+        to the number of CPUs. Partitions are run in this process if it is 1.
+        chunksize: an optional integer of the number of rows of the utility
+        data read at a time.
+    Returns:
+        A tuple of the merged `IncrementalFRegression` and a pandas dataframe
+        with the first year, number of merged rows, run time in seconds and
+        output path (missing if it has no rows) of each partition.
+    """
+    if len(datatypes) == 0:
+        raise ValueError("At least one datatype is needed")
+    datatypes = list(datatypes)
+    targets = list(targets)
+    if util_path is None:
+        util_path = utility_path()
+    # Convert the .json files here, so that workers only read the stores
+    for datatype in datatypes:
+        store_dir = update_columnar(datatype, data_dir)
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as split_dir:
+        util_paths = split_utility(
+            util_path, split_dir, years_per_partition, chunksize
+        )
+        if features is None and util_paths:
+            features = _default_features(
+                next(iter(util_paths.values())), datatypes, targets, compact
+            )
+        features = list(features or [])
+        jobs = []
+        for year, part_path in util_paths.items():
+            end = np.datetime64(f"{year + years_per_partition}-01-01", "s")
+            output_path = None
+            if output_dir is not None:
+                output_path = os.path.join(output_dir, f"merged_{year}.pkl")
+            jobs.append(
+                (
+                    part_path,
+                    f"{year}-01-01",
+                    str(end - np.timedelta64(1, "s")),
+                    datatypes,
+                    store_dir,
+                    targets,
+                    features,
+                    compact,
+                    output_path,
+                )
+            )
+
+        n_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+        if n_workers <= 1:
+            outputs = [_merge_and_score(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = [
+                    executor.submit(_merge_and_score, *job) for job in jobs
+                ]
+                outputs = [future.result() for future in futures]
+
+    # Partitions are merged in order of years, so the result does not depend
+    # on the order they finish in
+    scorer = IncrementalFRegression(features, targets)
+    rows = []
+    for year, job, (state, n_rows, seconds) in zip(util_paths, jobs, outputs):
+        if n_rows > 0:
+            scorer.merge(IncrementalFRegression.from_dict(state))
+        rows.append(
+            {
+                "partition": year,
+                "rows": n_rows,
+                "seconds": seconds,
+                "path": job[-1] if n_rows > 0 else None,
+            }
+        )
+    return scorer, pd.DataFrame(rows)
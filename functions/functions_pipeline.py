@@ -0,0 +1,505 @@
+"""
+File containing a pipeline runner that models the analysis (fetching the
+climate data, flattening it, merging it with the utility data, the F-test and
+the figures) as a graph of stages, and only runs the stages whose inputs
+changed since their last run.
+
+Run from the root of the repo with:
+    python -m functions.functions_pipeline [--datatypes TAVG PRCP AWND]
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from functions.functions_excel import file_hash
+from functions.functions_f_test import feature_selection, plot_f_test
+from functions.functions_features import build_features, feature_matrix
+from functions.functions_manage_data import (
+    DATASET_ID,
+    END_DATE,
+    SEASONS,
+    START_DATE,
+    STATION_ID,
+    build_wide_table,
+    flatten_json,
+    get_data_api,
+    join_dataframes,
+    merge_all_df,
+    utility_path,
+)
+from functions.functions_plot_data import WEATHER_UTIL_PLOTS
+
+PIPELINE_DIR = "data/pipeline"
+MANIFEST_NAME = "manifest.json"
+DATATYPES = ("TAVG", "PRCP", "AWND")
+MAX_WORKERS = 4
+
+
+class Stage:
+    """
+    A step of the pipeline, run as `function(*outputs of deps, **params)`.
+
+    The fingerprint of a stage covers its parameters and settings, the
+    content of its input files, the source code of its functions and the
+    fingerprints of the stages it depends on.
+    """
+
+    def __init__(
+        self,
+        name,
+        function,
+        deps=(),
+        after=(),
+        params=None,
+        settings=None,
+        files=(),
+        code=(),
+        source=False,
+        lock=None,
+    ):
+        """
+        Args:
+            name: a string of the unique name of the stage.
+            function: the function run by the stage.
+            deps: a tuple of strings of the names of the stages whose outputs
+            are passed to `function`, in order.
+            after: a tuple of strings of the names of stages that must run
+            first, without passing their outputs (ex. stages writing files).
+            params: an optional dictionary of keyword arguments of `function`.
+            settings: an optional dictionary of other values the output
+            depends on, like module constants.
+            files: a tuple of strings of the paths of files read by
+            `function`.
+            code: a tuple of other functions called by `function`, whose
+            source code changes should make the stage run again.
+            source: a boolean of whether the stage creates its `files` from
+            outside data (like an API). It only runs again if its files are
+            missing or its parameters, settings or code change, and its
+            output is not saved.
+            lock: an optional string naming a resource used by the stage.
+            Stages with the same lock never run at the same time (ex. stages
+            sharing the CDO rate limit and response cache).
+        """
+        self.name = name
+        self.function = function
+        self.deps = tuple(deps)
+        self.after = tuple(after)
+        self.params = params or {}
+        self.settings = settings or {}
+        self.files = tuple(files)
+        self.code = (function,) + tuple(code)
+        self.source = source
+        self.lock = lock
+
+
+def load_utility(path):
+    """
+    Load the utility data.
+
+    Args:
+        path: a string of the path of the utility .csv file.
+    Returns:
+        A pandas dataframe of the utility data.
+    """
+    return pd.read_csv(path)
+
+
+def merge_stage(df_util, *list_df_weather):
+    """
+    Merge the climate data and the utility data.
+
+    Args:
+        df_util: a pandas dataframe of the utility data.
+        *list_df_weather: pandas dataframes of climate data.
+    Returns:
+        A pandas dataframe, as returned by `merge_all_df`.
+    """
+    return merge_all_df(list(list_df_weather), df_util)
+
+
+def f_test_stage(df_all_data):
+    """
+    Run the F-test of every feature for the total consumption.
+
+    Args:
+        df_all_data: a pandas dataframe, as returned by `merge_all_df`.
+    Returns:
+        A pandas dataframe, as returned by `feature_selection`.
+    """
+    features = df_all_data.drop(columns=["total_consumption", "year-month"])
+    return feature_selection(features, df_all_data["total_consumption"])
+
+
+def features_stage(df_util, *list_df_weather):
+    """
+    Build the candidate features of the climate data, lined up with the
+    utility bills.
+
+    Args:
+        df_util: a pandas dataframe of the utility data.
+        *list_df_weather: pandas dataframes of climate data.
+    Returns:
+        A tuple of the features and the target, as returned by
+        `feature_matrix`.
+    """
+    return feature_matrix(list(list_df_weather), df_util)
+
+
+def f_test_features_stage(matrix):
+    """
+    Run the F-test of every candidate feature for the total consumption.
+
+    Args:
+        matrix: a tuple of the features and the target, as returned by
+        `feature_matrix`.
+    Returns:
+        A pandas dataframe, as returned by `feature_selection`.
+    """
+    features, target = matrix
+    return feature_selection(features, target)
+
+
+def plot_stage(df_results, df_util, *list_df_weather, seasons=None):
+    """
+    Render the figures of every datatype and season, and of the F-test.
+
+    Args:
+        df_results: a pandas dataframe of the F-test results.
+        df_util: a pandas dataframe of the utility data.
+        *list_df_weather: pandas dataframes of climate data.
+        seasons: an optional dictionary mapping each season name to its
+        months.
+    Returns:
+        A list of strings of the names of the rendered figures.
+    """
+    # Imported here so that runs with nothing to plot do not load matplotlib
+    from functions.functions_render import render_figures, weather_util_jobs
+
+    jobs = weather_util_jobs(list_df_weather, df_util, seasons)
+    jobs.append(("f_test", "f_test", df_results))
+    return render_figures(jobs)
+
+
+def default_stages(datatypes=DATATYPES):
+    """
+    Build the stages of the analysis of the notebook.
+
+    Args:
+        datatypes: a tuple of strings of the CDO datatype IDs.
+    Returns:
+        A list of `Stage` objects.
+    """
+    query = {
+        "station": STATION_ID,
+        "dataset": DATASET_ID,
+        "start_date": START_DATE,
+        "end_date": END_DATE,
+    }
+    stages = []
+    for datatype in datatypes:
+        json_path = f"data/{datatype}.json"
+        stages.append(
+            Stage(
+                f"fetch_{datatype}",
+                get_data_api,
+                params={"datatype_id": datatype},
+                settings=query,
+                files=(json_path,),
+                source=True,
+                # Each fetch has its own rate limiter and response cache, so
+                # they would exceed the CDO quotas and overwrite each other's
+                # cache index if they ran at the same time
+                lock="cdo",
+            )
+        )
+        stages.append(
+            Stage(
+                f"flatten_{datatype}",
+                flatten_json,
+                after=(f"fetch_{datatype}",),
+                params={"json_name": datatype},
+                files=(json_path,),
+            )
+        )
+    flatten_names = tuple(f"flatten_{datatype}" for datatype in datatypes)
+    stages += [
+        Stage(
+            "utility",
+            load_utility,
+            params={"path": utility_path()},
+            files=(utility_path(),),
+        ),
+        Stage(
+            "merge",
+            merge_stage,
+            deps=("utility",) + flatten_names,
+            code=(merge_all_df, build_wide_table, join_dataframes),
+        ),
+        Stage(
+            "f_test",
+            f_test_stage,
+            deps=("merge",),
+            code=(feature_selection,),
+        ),
+        Stage(
+            "features",
+            features_stage,
+            deps=("utility",) + flatten_names,
+            code=(feature_matrix, build_features, build_wide_table),
+        ),
+        Stage(
+            "f_test_features",
+            f_test_features_stage,
+            deps=("features",),
+            code=(feature_selection,),
+        ),
+        Stage(
+            "plots",
+            plot_stage,
+            deps=("f_test", "utility") + flatten_names,
+            params={"seasons": SEASONS},
+            code=WEATHER_UTIL_PLOTS + (plot_f_test,),
+        ),
+    ]
+    return stages
+
+
+class Pipeline:
+    """
+    Runs stages in dependency order, skipping the stages whose fingerprint
+    matches their last run and whose output is saved.
+
+    Outputs are pickled in `directory`, next to a manifest of the
+    fingerprint of each stage's last run. Cached file hashes are reused while
+    the size and modification time of a file do not change.
+    """
+
+    def __init__(self, stages, directory=PIPELINE_DIR):
+        """
+        Args:
+            stages: a list of `Stage` objects.
+            directory: a string of the folder the outputs are saved in.
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = set(stage.deps + stage.after) - set(self.stages)
+            if missing:
+                raise ValueError(f"{stage.name} depends on unknown {missing}")
+        self.directory = directory
+        self._manifest_path = os.path.join(directory, MANIFEST_NAME)
+        try:
+            with open(self._manifest_path, encoding="utf-8") as file:
+                self.manifest = json.load(file)
+        except FileNotFoundError:
+            self.manifest = {"stages": {}, "files": {}}
+        self._outputs = {}
+
+    def _output_path(self, name):
+        return os.path.join(self.directory, name + ".pkl")
+
+    def _file_hash(self, path):
+        """
+        Hash a file, reusing the hash from the manifest if its size and
+        modification time did not change.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = [stat.st_size, stat.st_mtime_ns]
+        cached = self.manifest["files"].get(path)
+        if cached is None or cached["signature"] != signature:
+            cached = {"signature": signature, "hash": file_hash(path)}
+            self.manifest["files"][path] = cached
+        return cached["hash"]
+
+    def fingerprints(self):
+        """
+        Compute the fingerprint of every stage.
+
+        Returns:
+            A dictionary mapping each stage name to a string of its
+            hexadecimal SHA-256 fingerprint.
+        """
+        fingerprints = {}
+
+        def visit(name):
+            if name not in fingerprints:
+                stage = self.stages[name]
+                inputs = {
+                    "params": stage.params,
+                    "settings": stage.settings,
+                    # Files written by a source stage are its output
+                    "files": {
+                        path: None if stage.source else self._file_hash(path)
+                        for path in stage.files
+                    },
+                    "code": [inspect.getsource(code) for code in stage.code],
+                    "deps": [visit(dep) for dep in stage.deps + stage.after],
+                }
+                fingerprints[name] = hashlib.sha256(
+                    json.dumps(inputs, sort_keys=True, default=str).encode()
+                ).hexdigest()
+            return fingerprints[name]
+
+        for name in self.stages:
+            visit(name)
+        return fingerprints
+
+    def _is_stale(self, stage, fingerprint):
+        if stage.source:
+            # A source stage that never ran is adopted if its files exist
+            record = self.manifest["stages"].get(stage.name, fingerprint)
+            return record != fingerprint or not all(
+                os.path.isfile(path) for path in stage.files
+            )
+        return self.manifest["stages"].get(
+            stage.name
+        ) != fingerprint or not os.path.isfile(self._output_path(stage.name))
+
+    def stale(self, force=(), fingerprints=None):
+        """
+        Find the stages that need to run.
+
+        A stage is stale if it was forced, if its fingerprint changed, if its
+        output is missing, or if a stage it depends on is stale.
+
+        Args:
+            force: a list of strings of the names of stages to run anyway.
+            fingerprints: an optional dictionary of the fingerprints returned
+            by `fingerprints`, to avoid computing them again.
+        Returns:
+            A set of strings of the names of stale stages.
+        """
+        if fingerprints is None:
+            fingerprints = self.fingerprints()
+        stale = {}
+
+        def visit(name):
+            if name not in stale:
+                stage = self.stages[name]
+                upstream = [visit(dep) for dep in stage.deps + stage.after]
+                stale[name] = (
+                    name in force
+                    or any(upstream)
+                    or self._is_stale(stage, fingerprints[name])
+                )
+            return stale[name]
+
+        for name in self.stages:
+            visit(name)
+        return {name for name, is_stale in stale.items() if is_stale}
+
+    def output(self, name):
+        """
+        Load the saved output of a stage.
+
+        Args:
+            name: a string of the name of the stage.
+        Returns:
+            The output of the stage's function.
+        """
+        if name not in self._outputs:
+            with open(self._output_path(name), "rb") as file:
+                self._outputs[name] = pickle.load(file)
+        return self._outputs[name]
+
+    def _run_stage(self, name):
+        stage = self.stages[name]
+        args = [self.output(dep) for dep in stage.deps]
+        start = time.perf_counter()
+        output = stage.function(*args, **stage.params)
+        elapsed = time.perf_counter() - start
+        if stage.source:
+            return elapsed
+        tmp_path = self._output_path(name) + ".tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(output, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._output_path(name))
+        self._outputs[name] = output
+        return elapsed
+
+    def _save_manifest(self):
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.manifest, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._manifest_path)
+
+    def run(self, force=(), max_workers=MAX_WORKERS, log=print):
+        """
+        Run every stale stage, running stages that do not depend on each
+        other (and do not share a lock) at the same time in threads.
+
+        Args:
+            force: a list of strings of the names of stages to run anyway.
+            max_workers: an integer of the number of stages run at once.
+            log: a function called with a line of text for each stage.
+        Returns:
+            A dictionary mapping the name of each stage that ran to its run
+            time in seconds.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fingerprints = self.fingerprints()
+        stale = self.stale(force, fingerprints)
+        for name in self.stages:
+            if name not in stale:
+                self.manifest["stages"][name] = fingerprints[name]
+                log(f"{name}: up to date")
+
+        timings = {}
+        pending = set(stale)
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                waiting = pending | set(running.values())
+                locked = {self.stages[name].lock for name in running.values()}
+                for name in sorted(pending):
+                    stage = self.stages[name]
+                    if waiting.intersection(stage.deps + stage.after) or (
+                        stage.lock is not None and stage.lock in locked
+                    ):
+                        continue
+                    running[executor.submit(self._run_stage, name)] = name
+                    pending.discard(name)
+                    locked.add(stage.lock)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    timings[name] = future.result()
+                    log(f"{name}: ran in {timings[name]:.2f} s")
+
+        # Stages may have changed the files read by the stages after them
+        fingerprints = self.fingerprints()
+        for name in stale:
+            self.manifest["stages"][name] = fingerprints[name]
+        self._save_manifest()
+        return timings
+
+
+def main():
+    """
+    Parse the command line arguments and run the pipeline.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--datatypes", nargs="+", default=list(DATATYPES))
+    parser.add_argument(
+        "--force", nargs="*", default=[], help="names of stages to run anyway"
+    )
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--directory", default=PIPELINE_DIR)
+    args = parser.parse_args()
+
+    pipeline = Pipeline(default_stages(args.datatypes), args.directory)
+    pipeline.run(args.force, args.workers)
+
+
+if __name__ == "__main__":
+    main()
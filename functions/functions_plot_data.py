@@ -2,17 +2,110 @@
 File containing helper functions for plotting data.
 """
 
+from functools import cache
+
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 
-plt.rcParams["font.family"] = "Helvetica"
+# matplotlib is imported by the functions that use it, as it is slow to import
+# pylint: disable=import-outside-toplevel
+FONT_FAMILY = "Helvetica"
 
 WEATHER_TITLES = {
     "TAVG": ("Average Monthly Temperature", "Farenheit °", "orange"),
     "PRCP": ("Total Monthly Precipitation", "in", "dodgerblue"),
     "AWND": ("Average Monthly Wind Speed", "mph", "orchid"),
 }
+FIGSIZE_2_PLOTS = (12, 6)
+
+# Series longer than this are decimated to about the width of a figure in
+# pixels before being plotted
+MAX_POINTS = 2000
+# Scatter plots with more rows than this are drawn as hexagonal bins
+HEXBIN_THRESHOLD = 5000
+HEXBIN_GRIDSIZE = 60
+
+
+@cache
+def setup_fonts(family=FONT_FAMILY):
+    """
+    Use a font family for the plots if it is installed, otherwise keep the
+    default font. The font lookup only runs on the first call.
+
+    The plotting functions do not change the font themselves, so call this
+    once before plotting (`render_batch` does).
+
+    Args:
+        family: a string of the name of the font family.
+    Returns:
+        A boolean of whether the font family is used.
+    """
+    import matplotlib
+    from matplotlib import font_manager
+
+    try:
+        font_manager.findfont(family, fallback_to_default=False)
+    except ValueError:
+        return False
+    matplotlib.rcParams["font.family"] = family
+    return True
+
+
+def new_figure(figsize=None):
+    """
+    Create a pyplot figure, importing pyplot only when a figure is needed.
+
+    Args:
+        figsize: an optional tuple of the width and height in inches.
+    Returns:
+        The matplotlib figure.
+    """
+    import matplotlib.pyplot as plt
+
+    return plt.figure(figsize=figsize)
+
+
+def show_figures():
+    """
+    Display the open pyplot figures with `plt.show()`.
+
+    Returns:
+        Nothing.
+    """
+    import matplotlib.pyplot as plt
+
+    plt.show()
+
+
+def decimate(values, max_points=MAX_POINTS):
+    """
+    Pick the positions of the points to plot from a long series, keeping
+    the minimum and maximum of each bucket of consecutive points so that peaks
+    are not lost.
+
+    Args:
+        values: a numpy array or pandas series of floats, in plotting order.
+        max_points: an integer of the maximum number of points kept.
+    Returns:
+        A sorted numpy array of integer positions of the points to plot. All
+        positions are returned if the series has at most `max_points` points.
+    """
+    values = np.asarray(values, dtype=float)
+    n_points = len(values)
+    if n_points <= max_points:
+        return np.arange(n_points)
+
+    # Each bucket keeps 2 points, and the first and last points are kept
+    bucket_size = -(-n_points // ((max_points - 2) // 2))
+    n_buckets = -(-n_points // bucket_size)
+    padded = np.full(n_buckets * bucket_size, np.nan)
+    padded[:n_points] = values
+    buckets = padded.reshape(n_buckets, bucket_size)
+    missing = np.isnan(buckets)
+    offsets = np.arange(n_buckets) * bucket_size
+    lowest = np.where(missing, np.inf, buckets).argmin(axis=1) + offsets
+    highest = np.where(missing, -np.inf, buckets).argmax(axis=1) + offsets
+    positions = np.concatenate([[0, n_points - 1], lowest, highest])
+    return np.unique(positions[positions < n_points])
 
 
 def plot_weather_util(df_util_weather, ax1):
@@ -28,22 +121,26 @@ def plot_weather_util(df_util_weather, ax1):
     Returns:
         Nothing.
     """
+    from matplotlib import dates as mdates
+
     weather_title_loc = WEATHER_TITLES[df_util_weather["datatype"].iloc[0]]
     # make a twin axes of inputted subplot
     ax2 = ax1.twinx()
 
-    # plot weather data on axes 1
+    # plot weather data on axes 1, decimated to keep long series fast
+    weather_rows = decimate(df_util_weather["value"])
     ax1.plot(
-        df_util_weather["date"],
-        df_util_weather["value"],
+        df_util_weather["date"].iloc[weather_rows],
+        df_util_weather["value"].iloc[weather_rows],
         color=weather_title_loc[2],
         label=weather_title_loc[0],
     )
 
     # plot util data on axes 2
+    util_rows = decimate(df_util_weather["total_consumption"])
     ax2.plot(
-        df_util_weather["date"],
-        df_util_weather["total_consumption"],
+        df_util_weather["date"].iloc[util_rows],
+        df_util_weather["total_consumption"].iloc[util_rows],
         color="seagreen",
         label="Total Cons.",
     )
@@ -73,7 +170,9 @@ def plot_weather_util_corr(df_util_weather, subplot):
     """
     Plots the weather datatype against the total consumption in Olin
     electricity, with consumption on the x-axis and the weathertype
-    on the y-axis. Includes a calculated linear trendline.
+    on the y-axis. Includes a calculated linear trendline. Past
+    `HEXBIN_THRESHOLD` rows, the density of points is drawn as hexagonal bins
+    instead of a scatter plot.
 
     Args:
         df_util_weather: a pandas dataframe containing information about a
@@ -86,24 +185,36 @@ def plot_weather_util_corr(df_util_weather, subplot):
     # plot consumption data against weather data as scatter plot
     weather_data = df_util_weather["value"]
     consumption_data = df_util_weather["total_consumption"].astype(float)
-    subplot.scatter(weather_data, consumption_data, color=weather_title_loc[2])
+    if len(df_util_weather) > HEXBIN_THRESHOLD:
+        subplot.hexbin(
+            weather_data,
+            consumption_data,
+            gridsize=HEXBIN_GRIDSIZE,
+            cmap="Greens",
+            mincnt=1,
+        )
+    else:
+        subplot.scatter(
+            weather_data, consumption_data, color=weather_title_loc[2]
+        )
     subplot.set_xlabel(
         f"{weather_title_loc[0]} ({weather_title_loc[1]})", fontsize=14
     )
 
-    # calculate line of best fit
+    # calculate line of best fit, which only needs its two ends to be drawn
     poly_fit = np.polyfit(weather_data, consumption_data, 1)
     equation_fit = np.poly1d(poly_fit)
+    fit_ends = np.array([weather_data.min(), weather_data.max()])
     subplot.plot(
-        weather_data,
-        equation_fit(weather_data),
+        fit_ends,
+        equation_fit(fit_ends),
         color="red",
         label="Best Fit Line",
     )
     subplot.legend(loc="upper left")
 
 
-def plot_weather_util_2_plots(df_util_weather):
+def plot_weather_util_2_plots(df_util_weather, fig=None, show=True):
     """
     Plots two subplots of the weather datatype against consumption with
     the first being both on the same axes and the second being consumption on
@@ -112,12 +223,17 @@ def plot_weather_util_2_plots(df_util_weather):
     Args:
         df_util_weather: a pandas dataframe containing information about a
         specific weather pattern and the utility information.
+        fig: an optional empty matplotlib figure to draw on, so that one figure
+        can be reused for many plots. A new 12 x 6 pyplot figure if None.
+        show: a boolean of whether to display the figure with `plt.show()`.
     Returns:
-        Nothing.
+        The matplotlib figure.
     """
     weather_title_loc = WEATHER_TITLES[df_util_weather["datatype"].iloc[0]]
     # create figure with 2 subplots
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
+    if fig is None:
+        fig = new_figure(FIGSIZE_2_PLOTS)
+    ax1, ax2 = fig.subplots(1, 2)
 
     # plot same-axes plot on first subplot
     plot_weather_util(df_util_weather, ax1)
@@ -127,8 +243,20 @@ def plot_weather_util_2_plots(df_util_weather):
 
     # subplot formatting
     fig.tight_layout(pad=5)
-    plt.subplots_adjust(wspace=0.5)
+    fig.subplots_adjust(wspace=0.5)
     fig.suptitle(
         f"{weather_title_loc[0]} vs. Total Electricity Consumption", fontsize=20
     )
-    plt.show()
+    if show:
+        show_figures()
+    return fig
+
+
+# Functions drawing the weather against consumption figures, whose source code
+# changes should render those figures again
+WEATHER_UTIL_PLOTS = (
+    plot_weather_util_2_plots,
+    plot_weather_util,
+    plot_weather_util_corr,
+    decimate,
+)
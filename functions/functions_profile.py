@@ -0,0 +1,377 @@
+"""
+File containing an opt-in profiler that records the wall time, CPU time, peak
+memory and row count of every pipeline stage, and exports them to JSON or to
+the Chrome trace-event format (viewable in chrome://tracing or Perfetto).
+
+Profiling patches the functions of the helper modules in place while it is
+enabled, so existing code, like the notebook, is profiled without changes:
+
+    profiler = enable()
+    ...  # run the notebook cells
+    disable()
+    profiler.save_chrome_trace("trace.json")
+"""
+
+import functools
+import importlib
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+# Modules whose public functions are profiled by default
+PROFILED_MODULES = (
+    "functions.functions_billing",
+    "functions.functions_cache",
+    "functions.functions_correlation",
+    "functions.functions_f_test",
+    "functions.functions_features",
+    "functions.functions_fetch_data",
+    "functions.functions_manage_data",
+    "functions.functions_parse",
+    "functions.functions_partition",
+    "functions.functions_plot_data",
+    "functions.functions_store",
+)
+
+# The profiler recording stages, None when profiling is disabled
+_ACTIVE = None
+# Maps each patched function to its profiled wrapper
+_PATCHED = {}
+# Whether `enable` started tracemalloc, and so `disable` should stop it
+_STARTED_TRACING = False
+
+
+def _count_rows(value):
+    """
+    Count the rows of a dataframe, array or collection, or return None for
+    other values.
+    """
+    shape = getattr(value, "shape", None)
+    if shape:
+        return int(shape[0])
+    if isinstance(value, (list, tuple, dict)):
+        return len(value)
+    return None
+
+
+class Profiler:
+    """
+    Records nested stages as spans.
+
+    Each thread keeps its own stack of open stages. Peak memory is traced
+    with `tracemalloc`, which is process-wide, so it is only exact for stages
+    that do not overlap with stages of other threads. Work done in other
+    processes is not traced.
+    """
+
+    def __init__(self, trace_memory=True):
+        """
+        Args:
+            trace_memory: a boolean of whether to trace the peak memory of
+            each stage, which slows Python allocations down.
+        """
+        self.trace_memory = trace_memory
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Record a stage, nested in the stage open in the same thread if any.
+
+        Args:
+            name: a string of the name of the stage.
+        Yields:
+            The dictionary of the span, where a `rows` count can be set.
+        """
+        stack = self._stack()
+        span = {
+            "name": name,
+            "depth": len(stack),
+            "parent": stack[-1]["name"] if stack else None,
+            "thread": threading.get_ident(),
+            "rows": None,
+        }
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+            tracemalloc.reset_peak()
+            span["_start_memory"] = span["_peak"] = current
+        stack.append(span)
+        cpu_start = time.thread_time()
+        wall_start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            wall_end = time.perf_counter()
+            span["cpu_s"] = time.thread_time() - cpu_start
+            stack.pop()
+            span["start_s"] = wall_start - self._origin
+            span["wall_s"] = wall_end - wall_start
+            span["peak_mb"] = None
+            if tracing:
+                peak = max(
+                    span.pop("_peak"), tracemalloc.get_traced_memory()[1]
+                )
+                span["peak_mb"] = (peak - span.pop("_start_memory")) / 1e6
+                if stack:
+                    stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+                tracemalloc.reset_peak()
+            with self._lock:
+                self.spans.append(span)
+
+    def summary(self):
+        """
+        Summarize the spans of each stage.
+
+        Returns:
+            A pandas dataframe indexed by stage name, with the number of
+            `calls`, the total `wall_s` and `cpu_s`, the largest `peak_mb` and
+            the total `rows`, sorted by decreasing wall time.
+        """
+        df_spans = pd.DataFrame(
+            self.spans,
+            columns=["name", "wall_s", "cpu_s", "peak_mb", "rows"],
+        )
+        return (
+            df_spans.groupby("name")
+            .agg(
+                calls=("wall_s", "size"),
+                wall_s=("wall_s", "sum"),
+                cpu_s=("cpu_s", "sum"),
+                peak_mb=("peak_mb", "max"),
+                rows=("rows", "sum"),
+            )
+            .sort_values("wall_s", ascending=False)
+        )
+
+    def to_chrome_trace(self):
+        """
+        Convert the spans to the Chrome trace-event format.
+
+        Returns:
+            A dictionary with a "traceEvents" list of complete events.
+        """
+        pid = os.getpid()
+        events = [
+            {
+                "name": span["name"],
+                "cat": "pipeline",
+                "ph": "X",
+                "ts": span["start_s"] * 1e6,
+                "dur": span["wall_s"] * 1e6,
+                "pid": pid,
+                "tid": span["thread"],
+                "args": {
+                    "cpu_ms": span["cpu_s"] * 1e3,
+                    "peak_mb": span["peak_mb"],
+                    "rows": span["rows"],
+                },
+            }
+            for span in sorted(self.spans, key=lambda span: span["start_s"])
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_json(self, path):
+        """
+        Save the spans to a .json file.
+
+        Args:
+            path: a string of the path of the .json file.
+        Returns:
+            Nothing.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"spans": self.spans}, file, indent=1)
+
+    def save_chrome_trace(self, path):
+        """
+        Save the spans to a .json file in the Chrome trace-event format.
+
+        Args:
+            path: a string of the path of the .json file.
+        Returns:
+            Nothing.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_chrome_trace(), file)
+
+
+def stage(name):
+    """
+    Record a stage with the active profiler. Does nothing when profiling is
+    disabled.
+
+    Args:
+        name: a string of the name of the stage.
+    Returns:
+        A context manager yielding a dictionary, where a `rows` count can be
+        set.
+    """
+    if _ACTIVE is None:
+        return nullcontext({})
+    return _ACTIVE.stage(name)
+
+
+def profiled(function):
+    """
+    Wrap a function so that each call is recorded as a stage named after it,
+    with the row count of its output.
+
+    Args:
+        function: a function.
+    Returns:
+        The wrapped function.
+    """
+    name = f"{function.__module__.rsplit('.', 1)[-1]}.{function.__name__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _ACTIVE is None:
+            return function(*args, **kwargs)
+        with _ACTIVE.stage(name) as span:
+            output = function(*args, **kwargs)
+            span["rows"] = _count_rows(output)
+            return output
+
+    return wrapper
+
+
+def _replace(replacements, modules):
+    """
+    Replace functions by other ones in every loaded module (including the
+    namespace of a notebook) and in `modules`, wherever they were imported.
+    """
+    namespaces = {id(module): module for module in modules}
+    for module in list(sys.modules.values()):
+        namespaces.setdefault(id(module), module)
+    for module in namespaces.values():
+        namespace = getattr(module, "__dict__", None)
+        if not isinstance(namespace, dict):
+            continue
+        for name, value in list(namespace.items()):
+            if inspect.isfunction(value) and value in replacements:
+                namespace[name] = replacements[value]
+
+
+def instrument(modules=PROFILED_MODULES):
+    """
+    Profile every public function defined in some modules, everywhere they
+    were imported.
+
+    Generator functions are left untouched, as only their creation would be
+    timed.
+
+    Args:
+        modules: a list of modules or of names of modules.
+    Returns:
+        Nothing.
+    """
+    modules = [
+        importlib.import_module(module) if isinstance(module, str) else module
+        for module in modules
+    ]
+    replacements = {}
+    for module in modules:
+        for name, value in vars(module).items():
+            if (
+                inspect.isfunction(value)
+                and value.__module__ == module.__name__
+                and not name.startswith("_")
+                and not inspect.isgeneratorfunction(value)
+                and value not in _PATCHED.values()
+            ):
+                replacements[value] = _PATCHED.setdefault(
+                    value, profiled(value)
+                )
+    _replace(replacements, modules)
+
+
+def uninstrument(modules=()):
+    """
+    Restore every function patched by `instrument`.
+
+    Args:
+        modules: a list of modules not in `sys.modules` that were passed to
+        `instrument`.
+    Returns:
+        Nothing.
+    """
+    originals = {wrapper: original for original, wrapper in _PATCHED.items()}
+    _replace(originals, modules)
+    _PATCHED.clear()
+
+
+def enable(modules=PROFILED_MODULES, trace_memory=True):
+    """
+    Start profiling the functions of some modules.
+
+    Args:
+        modules: a list of modules or of names of modules to instrument.
+        trace_memory: a boolean of whether to trace the peak memory of each
+        stage, which slows Python allocations down.
+    Returns:
+        The `Profiler` recording the stages.
+    """
+    global _ACTIVE, _STARTED_TRACING  # pylint: disable=global-statement
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _STARTED_TRACING = True
+    _ACTIVE = Profiler(trace_memory)
+    instrument(modules)
+    return _ACTIVE
+
+
+def disable(modules=()):
+    """
+    Stop profiling and restore the patched functions.
+
+    Args:
+        modules: a list of modules not in `sys.modules` that were passed to
+        `enable`.
+    Returns:
+        The `Profiler` that recorded the stages, or None if profiling was not
+        enabled.
+    """
+    global _ACTIVE, _STARTED_TRACING  # pylint: disable=global-statement
+    profiler, _ACTIVE = _ACTIVE, None
+    uninstrument(modules)
+    if _STARTED_TRACING:
+        tracemalloc.stop()
+        _STARTED_TRACING = False
+    return profiler
+
+
+@contextmanager
+def profile(modules=PROFILED_MODULES, trace_memory=True):
+    """
+    Profile the functions of some modules within a `with` block.
+
+    Args:
+        modules: a list of modules or of names of modules to instrument.
+        trace_memory: a boolean of whether to trace the peak memory of each
+        stage.
+    Yields:
+        The `Profiler` recording the stages.
+    """
+    profiler = enable(modules, trace_memory)
+    try:
+        yield profiler
+    finally:
+        disable(modules)
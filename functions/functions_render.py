@@ -0,0 +1,203 @@
+"""
+File containing helper functions that render batches of figures to image
+files without a display, spreading the work over a process pool and skipping
+figures whose data has not changed.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from matplotlib.figure import Figure
+
+from functions.functions_f_test import plot_f_test
+from functions.functions_manage_data import join_dataframes, partition_seasons
+from functions.functions_plot_data import (
+    FIGSIZE_2_PLOTS,
+    WEATHER_UTIL_PLOTS,
+    plot_weather_util_2_plots,
+    setup_fonts,
+)
+
+RENDER_DIR = "figures"
+MANIFEST_NAME = "manifest.json"
+FORMATS = ("png",)
+DPI = 100
+
+# Bump when the rendering changes in a way `RENDER_CODE` does not cover, to
+# render every figure again
+RENDER_VERSION = 2
+
+# Plotting function and figure size of each kind of figure
+RENDERERS = {
+    "weather_util": (plot_weather_util_2_plots, FIGSIZE_2_PLOTS),
+    "f_test": (plot_f_test, None),
+}
+# Functions each kind of figure is drawn with, whose source code is part of
+# the fingerprint of the figure
+RENDER_CODE = {
+    "weather_util": WEATHER_UTIL_PLOTS,
+    "f_test": (plot_f_test,),
+}
+
+
+def figure_fingerprint(kind, data, formats=FORMATS):
+    """
+    Compute a fingerprint of everything a figure is drawn from, including
+    the source code of its plotting functions.
+
+    Args:
+        kind: a string of the kind of figure, a key of `RENDERERS`.
+        data: a pandas dataframe of the data plotted.
+        formats: a tuple of strings of the file formats written.
+    Returns:
+        A string of the hexadecimal SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    header = [
+        RENDER_VERSION,
+        kind,
+        list(formats),
+        list(map(str, data.columns)),
+        [inspect.getsource(code) for code in RENDER_CODE[kind]],
+    ]
+    digest.update(json.dumps(header).encode())
+    digest.update(pd.util.hash_pandas_object(data).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def render_batch(jobs, directory=RENDER_DIR, formats=FORMATS):
+    """
+    Render figures to files, reusing one figure per kind of figure.
+
+    The figures are created without pyplot, so this never opens a window and
+    works with any matplotlib backend. The fonts are set up with
+    `setup_fonts` first.
+
+    Args:
+        jobs: a list of (name, kind, data) tuples, where name is a string of
+        the file name without extension, kind a key of `RENDERERS` and data
+        the pandas dataframe passed to the plotting function.
+        directory: a string of the folder the files are written to.
+        formats: a tuple of strings of the file formats, like "png" or "svg".
+    Returns:
+        A list of strings of the names of the rendered figures.
+    """
+    setup_fonts()
+    figures = {}
+    for name, kind, data in jobs:
+        plot, figsize = RENDERERS[kind]
+        if kind in figures:
+            figures[kind].clear()
+        else:
+            figures[kind] = Figure(figsize=figsize)
+        fig = plot(data, fig=figures[kind], show=False)
+        for file_format in formats:
+            fig.savefig(
+                os.path.join(directory, f"{name}.{file_format}"), dpi=DPI
+            )
+    return [name for name, _, _ in jobs]
+
+
+def _load_manifest(directory):
+    try:
+        with open(
+            os.path.join(directory, MANIFEST_NAME), encoding="utf-8"
+        ) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def render_figures(
+    jobs, directory=RENDER_DIR, formats=FORMATS, max_workers=None
+):
+    """
+    Render every figure whose data changed since it was last rendered.
+
+    A manifest in `directory` records the fingerprint of each rendered
+    figure. Figures left to render are split into one batch per worker and
+    rendered in a process pool.
+
+    Args:
+        jobs: a list of (name, kind, data) tuples, as described in
+        `render_batch`.
+        directory: a string of the folder the files are written to.
+        formats: a tuple of strings of the file formats, like "png" or "svg".
+        max_workers: an optional integer of the number of processes. Defaults
+        to the number of CPUs.
+    Returns:
+        A list of strings of the names of the rendered figures. Figures that
+        were up to date are not included.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = _load_manifest(directory)
+
+    stale = []
+    fingerprints = {}
+    for name, kind, data in jobs:
+        fingerprints[name] = figure_fingerprint(kind, data, formats)
+        up_to_date = manifest.get(name) == fingerprints[name] and all(
+            os.path.isfile(os.path.join(directory, f"{name}.{file_format}"))
+            for file_format in formats
+        )
+        if not up_to_date:
+            stale.append((name, kind, data))
+
+    n_batches = min(max_workers or os.cpu_count() or 1, len(stale))
+    if n_batches <= 1:
+        rendered = render_batch(stale, directory, formats)
+    else:
+        batches = [stale[i::n_batches] for i in range(n_batches)]
+        with ProcessPoolExecutor(max_workers=n_batches) as executor:
+            outputs = executor.map(
+                render_batch,
+                batches,
+                [directory] * n_batches,
+                [formats] * n_batches,
+            )
+            rendered = [name for output in outputs for name in output]
+
+    for name in rendered:
+        manifest[name] = fingerprints[name]
+    _save_manifest(directory, manifest)
+    return rendered
+
+
+def weather_util_jobs(list_df_weather, df_util, seasons=None):
+    """
+    Build the jobs of the weather against consumption figures of every
+    station and datatype, over all dates and over each season.
+
+    Args:
+        list_df_weather: a list of pandas dataframes of weather data, as
+        returned by `flatten_json`.
+        df_util: a pandas dataframe of the utility data.
+        seasons: an optional dictionary mapping each season name to its
+        months. Defaults to `SEASONS`.
+    Returns:
+        A list of (name, kind, data) tuples to pass to `render_figures`.
+    """
+    jobs = []
+    for df_weather in list_df_weather:
+        df_util_weather = join_dataframes(df_weather, df_util)
+        station = df_weather["station"].iloc[0]
+        datatype = df_weather["datatype"].iloc[0]
+        prefix = f"{station}_{datatype}".replace(":", "-")
+        jobs.append((prefix, "weather_util", df_util_weather))
+        for season, df_season in partition_seasons(
+            df_util_weather, seasons
+        ).items():
+            if not df_season.empty:
+                jobs.append((f"{prefix}_{season}", "weather_util", df_season))
+    return jobs
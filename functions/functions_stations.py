@@ -0,0 +1,419 @@
+"""
+File containing helper functions that index the CDO weather stations by
+location, to pick the nearest stations with enough data for each site and run
+the analysis for many sites at once.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from functions.functions_cache import ResponseCache, cached_fetch
+from functions.functions_f_test import feature_selection
+from functions.functions_fetch_data import (
+    RateLimiter,
+    fetch_data,
+    make_session,
+)
+from functions.functions_manage_data import (
+    DATASET_ID,
+    END_DATE,
+    START_DATE,
+    merge_all_df,
+    read_api_key,
+)
+from functions.functions_parse import to_datetime64
+
+STATIONS_URL = "https://www.ncei.noaa.gov/cdo-web/api/v2/stations"
+EARTH_RADIUS_KM = 6371.0088
+MIN_COVERAGE = 0.9
+MAX_SITE_WORKERS = 4
+WEATHER_COLUMNS = ["date", "datatype", "value"]
+
+
+def _unit_vectors(latitude, longitude):
+    """
+    Convert latitudes and longitudes in degrees into points on the unit
+    sphere, where straight-line distance grows with great-circle distance.
+    """
+    lat = np.radians(np.asarray(latitude, dtype=float))
+    lon = np.radians(np.asarray(longitude, dtype=float))
+    return np.stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)],
+        axis=-1,
+    )
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Compute great-circle distances with the haversine formula, vectorized
+    over all arguments.
+
+    Args:
+        lat1: a float or numpy array of latitudes in degrees.
+        lon1: a float or numpy array of longitudes in degrees.
+        lat2: a float or numpy array of latitudes in degrees.
+        lon2: a float or numpy array of longitudes in degrees.
+    Returns:
+        A float or numpy array of distances in kilometers.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    half_chord = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(half_chord))
+
+
+class StationIndex:
+    """
+    A catalog of weather stations stored as arrays, with a KD-tree over their
+    positions on the unit sphere for nearest-neighbour lookups.
+    """
+
+    def __init__(self, stations):
+        """
+        Args:
+            stations: a list of station dictionaries as returned by the CDO
+            stations endpoint, with `id`, `name`, `latitude`, `longitude`,
+            `mindate`, `maxdate` and `datacoverage` keys.
+        """
+        # Imported here, as scipy is slow to import
+        from scipy.spatial import cKDTree
+
+        df_stations = pd.DataFrame.from_records(stations)
+        self.ids = df_stations["id"].to_numpy(object)
+        self.names = df_stations["name"].to_numpy(object)
+        self.latitude = df_stations["latitude"].to_numpy(float)
+        self.longitude = df_stations["longitude"].to_numpy(float)
+        self.mindate = to_datetime64(df_stations["mindate"]).astype(
+            "datetime64[D]"
+        )
+        self.maxdate = to_datetime64(df_stations["maxdate"]).astype(
+            "datetime64[D]"
+        )
+        self.datacoverage = df_stations["datacoverage"].to_numpy(np.float32)
+        self._tree = cKDTree(_unit_vectors(self.latitude, self.longitude))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_json(cls, json_path):
+        """
+        Load a catalog saved from the CDO stations endpoint.
+
+        Args:
+            json_path: a string of the path to a .json file holding either a
+            response with a "results" list, a list of stations or a single
+            station (like `data/station.json`).
+        Returns:
+            A `StationIndex`.
+        """
+        with open(json_path, encoding="utf-8") as file:
+            data = json.load(file)
+        if isinstance(data, dict):
+            data = data.get("results", [data])
+        return cls(data)
+
+    def _eligible(self, rows, min_coverage, start_date, end_date):
+        keep = self.datacoverage[rows] >= min_coverage
+        if start_date is not None:
+            keep &= self.mindate[rows] <= np.datetime64(start_date, "D")
+        if end_date is not None:
+            keep &= self.maxdate[rows] >= np.datetime64(end_date, "D")
+        return rows[keep]
+
+    def query(
+        self,
+        latitude,
+        longitude,
+        k=1,
+        min_coverage=MIN_COVERAGE,
+        start_date=None,
+        end_date=None,
+    ):
+        """
+        Find the positions in the catalog of the nearest stations to a
+        location that have enough data.
+
+        The KD-tree is asked for a growing number of neighbours until `k` of
+        them pass the coverage and date filters. Only arrays are built, so
+        this is the fastest way to look up stations.
+
+        Args:
+            latitude: a float of the latitude of the location in degrees.
+            longitude: a float of the longitude of the location in degrees.
+            k: an integer of the number of stations to return.
+            min_coverage: a float of the minimum `datacoverage` of a station.
+            start_date: an optional string of a date the station's data must
+            start on or before.
+            end_date: an optional string of a date the station's data must
+            end on or after.
+        Returns:
+            A numpy array of at most `k` integer positions, sorted by
+            distance.
+        """
+        point = _unit_vectors(latitude, longitude)
+        n_query = min(len(self), max(4 * k, 16))
+        while True:
+            _, rows = self._tree.query(point, k=n_query)
+            rows = np.atleast_1d(rows)
+            eligible = self._eligible(rows, min_coverage, start_date, end_date)
+            if len(eligible) >= k or n_query == len(self):
+                return eligible[:k]
+            n_query = min(len(self), n_query * 4)
+
+    def nearest(self, latitude, longitude, k=1, **kwargs):
+        """
+        Find the nearest stations to a location that have enough data.
+
+        Args:
+            latitude: a float of the latitude of the location in degrees.
+            longitude: a float of the longitude of the location in degrees.
+            k: an integer of the number of stations to return.
+            **kwargs: the filters `min_coverage`, `start_date` and `end_date`
+            described in `query`.
+        Returns:
+            A pandas dataframe of at most `k` stations sorted by distance,
+            with `id`, `name`, `latitude`, `longitude`, `datacoverage` and
+            `distance_km` columns.
+        """
+        rows = self.query(latitude, longitude, k, **kwargs)
+        return pd.DataFrame(
+            {
+                "id": self.ids[rows],
+                "name": self.names[rows],
+                "latitude": self.latitude[rows],
+                "longitude": self.longitude[rows],
+                "datacoverage": self.datacoverage[rows],
+                "distance_km": haversine_km(
+                    latitude,
+                    longitude,
+                    self.latitude[rows],
+                    self.longitude[rows],
+                ),
+            }
+        )
+
+
+def fetch_station_catalog(location_id, dataset_id=DATASET_ID, token=None):
+    """
+    Fetch every station of a dataset in a location (ex. FIPS:25 for
+    Massachusetts) from the CDO stations endpoint.
+
+    Args:
+        location_id: a string of the CDO location ID.
+        dataset_id: a string of the CDO dataset ID.
+        token: an optional string of the CDO API token. Read from
+        `API_KEY.txt` if None.
+    Returns:
+        A `StationIndex` of the stations.
+    """
+    if token is None:
+        token = read_api_key()
+    query = {"locationid": location_id, "datasetid": dataset_id}
+    (stations,) = fetch_data([query], token, url=STATIONS_URL)
+    return StationIndex(stations)
+
+
+def _capture(function, *args):
+    """
+    Call a function, returning its output and None, or None and a string of
+    the error it raised, so that one failing site does not stop a batch.
+    """
+    try:
+        return function(*args), None
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        return None, f"{type(error).__name__}: {error}"
+
+
+def _fetch_site(
+    site,
+    index,
+    datatype_ids,
+    fetch,
+    start_date=START_DATE,
+    end_date=END_DATE,
+    min_coverage=MIN_COVERAGE,
+    cache=None,
+):
+    """
+    Pick the nearest station with enough data for a site and fetch its
+    weather. Returns the station ID and a list of one dataframe per datatype.
+    """
+    df_station = index.nearest(
+        site["latitude"],
+        site["longitude"],
+        min_coverage=min_coverage,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    if df_station.empty:
+        raise ValueError(f"No station with enough data for {site['name']}")
+    station_id = df_station["id"].iloc[0]
+
+    results = cached_fetch(
+        fetch,
+        DATASET_ID,
+        [station_id],
+        datatype_ids,
+        start_date,
+        end_date,
+        "standard",
+        cache,
+    )
+    list_df_weather = []
+    for datatype in datatype_ids:
+        records = results[(station_id, datatype)]
+        if not records:
+            raise ValueError(
+                f"No {datatype} data from {station_id} for {site['name']}"
+            )
+        list_df_weather.append(
+            pd.DataFrame.from_records(records, columns=WEATHER_COLUMNS)
+        )
+    return station_id, list_df_weather
+
+
+def _score_site(list_df_weather, utility_path):
+    """
+    Merge the weather of a site with its utility data and run the F-test.
+    """
+    df_all_data = merge_all_df(list_df_weather, pd.read_csv(utility_path))
+    features = df_all_data.drop(columns=["total_consumption", "year-month"])
+    target = df_all_data["total_consumption"]
+    return feature_selection(features, target)
+
+
+def run_site(
+    site,
+    index,
+    datatype_ids,
+    fetch,
+    start_date=START_DATE,
+    end_date=END_DATE,
+    min_coverage=MIN_COVERAGE,
+    cache=None,
+):
+    """
+    Run the fetch, merge and F-test steps for one site, using the nearest
+    station with enough data.
+
+    Args:
+        site: a dictionary with the `name`, `latitude` and `longitude` of the
+        site and the path of its utility .csv file as `utility_path`.
+        index: a `StationIndex` of candidate stations.
+        datatype_ids: a list of strings of the CDO datatype IDs.
+        fetch: a function that takes a list of query parameter dictionaries
+        and returns a list of lists of results, like `fetch_data`.
+        start_date: a string of the first date in "YYYY-MM-DD" format.
+        end_date: a string of the last date in "YYYY-MM-DD" format.
+        min_coverage: a float of the minimum `datacoverage` of the station.
+        cache: an optional `ResponseCache` of the fetched data.
+    Returns:
+        A dictionary with the `station` ID used and the F-test `results`.
+    Raises:
+        ValueError: if no station has enough data, or if the station has no
+        data for a datatype.
+    """
+    station_id, list_df_weather = _fetch_site(
+        site,
+        index,
+        datatype_ids,
+        fetch,
+        start_date,
+        end_date,
+        min_coverage,
+        cache,
+    )
+    return {
+        "station": station_id,
+        "results": _score_site(list_df_weather, site["utility_path"]),
+    }
+
+
+def run_sites(
+    sites,
+    index,
+    datatype_ids,
+    fetch=None,
+    max_workers=MAX_SITE_WORKERS,
+    max_processes=None,
+    **kwargs,
+):
+    """
+    Run the analysis for many sites in parallel.
+
+    Fetching mostly waits on the API, so sites are fetched in threads that
+    share one pooled session, one rate limiter and one response cache,
+    keeping the whole batch under the CDO quotas. The merge and F-test are
+    CPU-bound, so they then run in a process pool.
+
+    A site that fails (ex. a station without data for a datatype) does not
+    stop the others: its error is reported in its output instead.
+
+    Args:
+        sites: a list of site dictionaries, as described in `run_site`.
+        index: a `StationIndex` of candidate stations.
+        datatype_ids: a list of strings of the CDO datatype IDs.
+        fetch: an optional function like `fetch_data` taking a list of
+        queries. Defaults to fetching from the CDO API.
+        max_workers: an integer of the number of sites fetched at once.
+        max_processes: an optional integer of the number of processes of the
+        merge and F-test. Defaults to the number of CPUs. They run in this
+        process if it is 1.
+        **kwargs: other keyword arguments passed to `run_site`, such as a
+        shared `cache`.
+    Returns:
+        A dictionary mapping each site name to a dictionary with the
+        `station` ID used, the F-test `results` and a string of the `error`
+        that stopped the site, None where they do not apply.
+    """
+    if fetch is None:
+        token = read_api_key()
+        limiter = RateLimiter()
+        session = make_session()
+
+        def fetch(queries):
+            return fetch_data(queries, token, limiter=limiter, session=session)
+
+    kwargs.setdefault("cache", ResponseCache())
+    fetch_site = partial(
+        _fetch_site,
+        index=index,
+        datatype_ids=datatype_ids,
+        fetch=fetch,
+        **kwargs,
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        fetched = list(executor.map(partial(_capture, fetch_site), sites))
+
+    outputs = {}
+    jobs = []
+    for site, (site_fetched, error) in zip(sites, fetched):
+        outputs[site["name"]] = {
+            "station": None,
+            "results": None,
+            "error": error,
+        }
+        if site_fetched is not None:
+            outputs[site["name"]]["station"] = site_fetched[0]
+            jobs.append((site["name"], site_fetched[1], site["utility_path"]))
+
+    n_processes = min(max_processes or os.cpu_count() or 1, len(jobs))
+    if n_processes <= 1:
+        scored = [_capture(_score_site, *job[1:]) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=n_processes) as executor:
+            futures = [
+                executor.submit(_capture, _score_site, *job[1:]) for job in jobs
+            ]
+            scored = [future.result() for future in futures]
+    for job, (results, error) in zip(jobs, scored):
+        outputs[job[0]].update(results=results, error=error)
+    return outputs
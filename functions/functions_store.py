@@ -0,0 +1,169 @@
+"""
+File containing helper functions for a columnar, memory-mapped on-disk store
+of CDO results, so that a subset of columns or dates can be loaded without
+parsing the whole dataset.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from functions.functions_parse import to_datetime64
+
+STORE_DIR = "data/columnar"
+META_NAME = "meta.json"
+
+# Columns stored as integer codes into a list of distinct strings
+CATEGORY_COLUMNS = ("datatype", "station", "attributes")
+DATE_COLUMN = "date"
+# Columns of a CDO result, stored for responses without any results
+RESULT_COLUMNS = ("date", "datatype", "station", "attributes", "value")
+
+
+def store_path(name, directory=STORE_DIR):
+    """
+    Get the folder a dataset is stored in.
+
+    Args:
+        name: a string of the dataset name (ex. TAVG).
+        directory: a string of the folder containing all stores.
+    Returns:
+        A string of the path to the dataset's folder.
+    """
+    return os.path.join(directory, name)
+
+
+def write_columnar(records, name, directory=STORE_DIR):
+    """
+    Save CDO results as one .npy file per column, sorted by date.
+
+    Dates are saved as `datetime64[s]`, values as floats, and the string
+    columns in `CATEGORY_COLUMNS` as integer codes with their distinct
+    values listed in `meta.json` (missing strings get the code -1). Results
+    without any rows are saved with empty `RESULT_COLUMNS`.
+
+    Args:
+        records: a pandas dataframe of CDO results, as produced by
+        `pd.json_normalize` on the "results" of a response.
+        name: a string of the dataset name (ex. TAVG).
+        directory: a string of the folder containing all stores.
+    Returns:
+        Nothing.
+    """
+    path = store_path(name, directory)
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    if records.empty and DATE_COLUMN not in records:
+        records = pd.DataFrame(
+            {column: pd.Series(dtype=object) for column in RESULT_COLUMNS}
+        )
+    dates = to_datetime64(records[DATE_COLUMN]).astype("datetime64[s]")
+    order = np.argsort(dates, kind="stable")
+    meta = {"rows": len(records), "columns": {}}
+    for column in records.columns:
+        if column == DATE_COLUMN:
+            array = dates[order]
+            meta["columns"][column] = {"kind": "datetime"}
+        elif column in CATEGORY_COLUMNS:
+            codes, categories = pd.factorize(records[column], sort=True)
+            dtype = np.int8 if len(categories) < 128 else np.int32
+            array = codes.astype(dtype)[order]
+            meta["columns"][column] = {
+                "kind": "category",
+                "categories": categories.tolist(),
+            }
+        else:
+            array = pd.to_numeric(records[column]).to_numpy(float)[order]
+            meta["columns"][column] = {"kind": "float"}
+        np.save(os.path.join(tmp_path, column + ".npy"), array)
+
+    with open(os.path.join(tmp_path, META_NAME), "w", encoding="utf-8") as file:
+        json.dump(meta, file, indent=1)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def read_columnar(
+    name,
+    columns=None,
+    start_date=None,
+    end_date=None,
+    directory=STORE_DIR,
+    compact=False,
+):
+    """
+    Load a dataset saved by `write_columnar` into a pandas dataframe.
+
+    Columns are memory-mapped, so only the requested columns and the rows
+    between `start_date` and `end_date` are read from disk. In compact mode,
+    string columns are loaded as categoricals straight from their stored
+    codes and values as float32.
+
+    Args:
+        name: a string of the dataset name (ex. TAVG).
+        columns: an optional list of strings of the columns to load. All
+        columns are loaded if None.
+        start_date: an optional string of the first date to load.
+        end_date: an optional string of the last date to load.
+        directory: a string of the folder containing all stores.
+        compact: a boolean of whether to load the compact dtypes.
+    Returns:
+        A pandas dataframe with one column per loaded column.
+    """
+    path = store_path(name, directory)
+    with open(os.path.join(path, META_NAME), encoding="utf-8") as file:
+        meta = json.load(file)
+    if columns is None:
+        columns = list(meta["columns"])
+
+    # Dates are sorted, so a date range is a contiguous slice of rows
+    start, stop = 0, meta["rows"]
+    if start_date is not None or end_date is not None:
+        dates = np.load(os.path.join(path, DATE_COLUMN + ".npy"), mmap_mode="r")
+        if start_date is not None:
+            start = np.searchsorted(dates, np.datetime64(start_date), "left")
+        if end_date is not None:
+            stop = np.searchsorted(dates, np.datetime64(end_date), "right")
+
+    data = {}
+    for column in columns:
+        info = meta["columns"][column]
+        array = np.load(os.path.join(path, column + ".npy"), mmap_mode="r")
+        array = np.array(array[start:stop])
+        if info["kind"] == "category" and compact:
+            array = pd.Categorical.from_codes(array, info["categories"])
+        elif info["kind"] == "category":
+            # The code -1 of missing strings takes the trailing None
+            categories = info["categories"] + [None]
+            array = np.array(categories, dtype=object).take(array)
+        elif info["kind"] == "datetime":
+            array = array.astype("datetime64[ns]")
+        elif compact:
+            array = array.astype(np.float32)
+        data[column] = array
+    return pd.DataFrame(data)
+
+
+def is_up_to_date(name, source_path, directory=STORE_DIR):
+    """
+    Check if a dataset's store exists and is newer than its source file.
+
+    Args:
+        name: a string of the dataset name (ex. TAVG).
+        source_path: a string of the path to the file the store was built
+        from.
+        directory: a string of the folder containing all stores.
+    Returns:
+        A boolean of whether the store can be used.
+    """
+    meta_path = os.path.join(store_path(name, directory), META_NAME)
+    if not os.path.isfile(meta_path):
+        return False
+    if not os.path.isfile(source_path):
+        return True
+    return os.path.getmtime(meta_path) >= os.path.getmtime(source_path)
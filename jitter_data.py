@@ -3,86 +3,86 @@ Function file for scrambling the Olin Utility data so that there is data to
 demonstrate on while keeping the Olin data secure.
 """
 
-import pandas as pd
 import numpy as np
+import pandas as pd
+
+from functions.functions_parse import time_to_minutes
 
+# Standard deviation of the noise added to each column, depending on their
+# typical magnitude
+JITTER_FACTORS = {
+    "total_consumption": 5e4,
+    "time_of_peak_demand": 1e0,
+    "total_cost": 5e3,
+}
+CHUNK_SIZE = 100000
+PATH_JITTERED = "data/electricity_FY13_23_jittered.csv"
 
-def add_jitter(x_int, factor):
+MINUTES_PER_DAY = 24 * 60
+# "HH:MM:00" label of every minute of the day, indexed by minute
+TIME_LABELS = np.array(
+    [f"{minute // 60:02d}:{minute % 60:02d}:00" for minute in range(1440)],
+    dtype=object,
+)
+
+
+def jitter_chunk(df_utility_raw, rng):
     """
-    Add jitter to the value by adding a random value with a factor.
+    Apply jitter to the sensitive columns of a chunk of utility data.
+
+    The noise for every row and column is drawn in a single call, row by row,
+    so the output only depends on the seed and not on how the data is split
+    into chunks.
 
     Args:
-        x: An integer value to be jittered.
-        factor: An integer value that represents the factor in which the random
-        value between -1 and +1 will be multiplied by and added to `x`.
+        df_utility_raw: A pandas dataframe of raw utility data.
+        rng: A `np.random.Generator` to draw the noise from.
     Returns:
-        x_jittered: An integer that represents the value aftering jittering.
+        A pandas dataframe of the read dates and the jittered columns.
     """
-    x_jittered = x_int + factor * np.random.normal(0, 1)
-    return x_jittered
+    noise = rng.standard_normal((len(df_utility_raw), len(JITTER_FACTORS)))
+    noise *= np.array(list(JITTER_FACTORS.values()))
+
+    df_jittered = df_utility_raw.filter(
+        items=["start_read_date", "end_read_date"]
+    )
+    for i, column in enumerate(JITTER_FACTORS):
+        if column == "time_of_peak_demand":
+            # The noise is in hours, and is added as whole minutes so that
+            # times are not shifted by floating-point rounding
+            minutes = time_to_minutes(df_utility_raw[column])
+            minutes = minutes.to_numpy(np.int64) + np.rint(
+                noise[:, i] * 60
+            ).astype(np.int64)
+            df_jittered[column] = TIME_LABELS[minutes % MINUTES_PER_DAY]
+        else:
+            df_jittered[column] = (
+                df_utility_raw[column].to_numpy(float) + noise[:, i]
+            )
+    return df_jittered
 
 
-def jitter_utility_df(file_directory):
+def jitter_utility_df(
+    file_directory, output_path=PATH_JITTERED, seed=None, chunksize=CHUNK_SIZE
+):
     """
     Apply jitter to the raw utility data and save it as a .csv file.
 
+    The raw data is read and written `chunksize` rows at a time, so large
+    meter exports are anonymized with bounded memory.
+
     Args:
         file_directory: A string that represents the file directory to the raw
         utility data.
+        output_path: A string of the path of the .csv file to save.
+        seed: An optional integer seed, making the output reproducible.
+        chunksize: An integer of the number of rows processed at a time.
     Returns:
         Nothing.
     """
-    df_utility_raw = pd.read_csv(file_directory)
-
-    # filter only sensitive data
-    df_jittered = df_utility_raw.filter(
-        items=[
-            "total_consumption",
-            "time_of_peak_demand",
-            "total_cost",
-        ]
-    )
-
-    # convert time of day into a float value
-    df_jittered["time_of_peak_demand"] = df_jittered["time_of_peak_demand"] = (
-        pd.to_datetime(df_jittered["time_of_peak_demand"]).dt.hour
-        + pd.to_datetime(df_jittered["time_of_peak_demand"]).dt.minute / 60
-    )
-
-    # apply the jitter function to the dataframes with different factors
-    # depending on their typical magnitude
-    df_jittered["total_consumption"] = df_jittered["total_consumption"].apply(
-        add_jitter, factor=5e4
-    )
-    df_jittered["total_cost"] = df_jittered["total_cost"].apply(
-        add_jitter, factor=5e3
-    )
-    df_jittered["time_of_peak_demand"] = df_jittered[
-        "time_of_peak_demand"
-    ].apply(add_jitter, factor=1e0)
-
-    # convert the time of peak demand to a time object
-    df_jittered["hour"] = (df_jittered["time_of_peak_demand"] // 1).astype(int)
-    df_jittered["minute"] = (
-        df_jittered["time_of_peak_demand"] - df_jittered["hour"]
-    ) * 60
-    df_jittered["minute"] = df_jittered["minute"].astype(int)
-    df_jittered["time_of_peak_demand"] = pd.to_datetime(
-        df_jittered["hour"].astype(str)
-        + ":"
-        + df_jittered["minute"].astype(str),
-        format="%H:%M",
-    ).dt.time
-
-    df_jittered = df_jittered.drop(columns=["hour", "minute"])
-
-    # merge back with the data that was excluded from the jitter
-    df_jittered = pd.merge(
-        df_utility_raw.filter(items=["start_read_date", "end_read_date"]),
-        df_jittered,
-        left_index=True,
-        right_index=True,
-    )
-
-    # save as a csv file locally
-    df_jittered.to_csv("data/electricity_FY13_23_jittered.csv", index=False)
+    rng = np.random.default_rng(seed)
+    chunks = pd.read_csv(file_directory, chunksize=chunksize)
+    for i, df_utility_raw in enumerate(chunks):
+        jitter_chunk(df_utility_raw, rng).to_csv(
+            output_path, mode="w" if i == 0 else "a", header=i == 0, index=False
+        )
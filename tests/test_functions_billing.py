@@ -0,0 +1,68 @@
+"""
+File to run pytest unit tests on different helper functions in
+functions_billing.py
+"""
+
+import importlib.util
+import numpy as np
+import pandas as pd
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "function", "./functions/functions_billing.py"
+)
+func_billing = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func_billing)
+
+
+@pytest.fixture(name="df_bills")
+def fixture_df_bills():
+    """
+    Aggregates ten days of made-up temperatures, with the 4th day missing,
+    over three bills: two consecutive ones, one overlapping them, and one
+    after the end of the data.
+
+    Returns:
+        A pandas dataframe of the bills with the aggregated weather columns.
+    """
+    dates = pd.date_range("2013-01-01", periods=10, freq="D")
+    df_daily = pd.DataFrame(
+        {"date": dates, "datatype": "TAVG", "value": np.arange(10.0)}
+    ).drop(index=3)
+    df_util = pd.DataFrame(
+        {
+            "start_read_date": [
+                "2013-01-01",
+                "2013-01-06",
+                "2013-01-03",
+                "2013-02-01",
+            ],
+            "end_read_date": [
+                "2013-01-06",
+                "2013-01-11",
+                "2013-01-08",
+                "2013-02-05",
+            ],
+        }
+    )
+    return func_billing.aggregate_billing_windows(df_daily, df_util)
+
+
+def test_sum_and_mean(df_bills):
+    """
+    Check that sums and means cover the days from the start read date up to
+    the end read date, skipping missing days.
+    """
+    assert df_bills["TAVG_sum"].tolist()[:3] == [0 + 1 + 2 + 4, 35.0, 17.0]
+    assert df_bills["TAVG_mean"].tolist()[:3] == [7 / 4, 7.0, 17 / 4]
+
+
+def test_min_max_coverage(df_bills):
+    """
+    Check the minimum, maximum and coverage of overlapping bills, and that a
+    bill without data gets NaN aggregates and zero coverage.
+    """
+    assert df_bills["TAVG_min"].tolist()[:3] == [0.0, 5.0, 2.0]
+    assert df_bills["TAVG_max"].tolist()[:3] == [4.0, 9.0, 6.0]
+    assert df_bills["TAVG_coverage"].tolist() == [0.8, 1.0, 0.8, 0.0]
+    assert df_bills.iloc[3][["TAVG_sum", "TAVG_min", "TAVG_max"]].isna().all()
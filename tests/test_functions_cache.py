@@ -0,0 +1,165 @@
+"""
+File to run pytest unit tests on different helper functions in
+functions_cache.py
+"""
+
+import importlib.util
+import os
+
+spec = importlib.util.spec_from_file_location(
+    "function", "./functions/functions_cache.py"
+)
+func_cache = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func_cache)
+
+
+def make_fetch(calls, last_month):
+    """
+    Create a fake `fetch` function returning one monthly result per month up
+    to `last_month` and recording every query it receives.
+
+    Args:
+        calls: a list that every query is appended to.
+        last_month: an integer of the last month of 2013 with data.
+    Returns:
+        A function with the same signature as `fetch_data`.
+    """
+
+    def fetch(queries):
+        calls.extend(queries)
+        output = []
+        for query in queries:
+            output.append(
+                [
+                    {
+                        "date": f"2013-{month:02d}-01T00:00:00",
+                        "datatype": query["datatypeid"],
+                        "station": query["stationid"],
+                        "value": float(month),
+                    }
+                    for month in range(1, last_month + 1)
+                    if query["startdate"]
+                    <= f"2013-{month:02d}-01"
+                    <= query["enddate"]
+                ]
+            )
+        return output
+
+    return fetch
+
+
+def test_refresh_fetches_only_missing_tail(tmp_path):
+    """
+    Check that a refresh only requests dates after the cached ones, and
+    merges them with the cached results.
+    """
+    cache = func_cache.ResponseCache(str(tmp_path))
+    args = ("GSOM", ["S"], ["TAVG"], "2013-01-01", "2013-12-31", "standard")
+
+    calls = []
+    first = func_cache.cached_fetch(make_fetch(calls, 6), *args, cache=cache)
+    assert len(first[("S", "TAVG")]) == 6
+    assert calls[0]["startdate"] == "2013-01-01"
+
+    calls = []
+    second = func_cache.cached_fetch(make_fetch(calls, 8), *args, cache=cache)
+    assert [query["startdate"] for query in calls] == ["2013-06-02"]
+    assert [row["value"] for row in second[("S", "TAVG")]] == [
+        float(month) for month in range(1, 9)
+    ]
+
+
+def test_evict_drops_least_recently_used(tmp_path):
+    """
+    Check that eviction keeps only the most recently used entries and
+    deletes the blobs that are no longer referenced.
+    """
+    now = [0.0]
+    cache = func_cache.ResponseCache(str(tmp_path), clock=lambda: now[0])
+    for i in range(3):
+        now[0] = float(i)
+        cache.put(f"key{i}", [{"date": "2013-01-01", "value": i}], "2013-01")
+
+    assert cache.evict(max_entries=1) == ["key1", "key0"]
+    assert cache.get("key2") is not None
+    blobs = set(os.listdir(tmp_path)) - {
+        func_cache.INDEX_NAME,
+        func_cache.LOCK_NAME,
+    }
+    assert len(blobs) == 1
+
+
+def test_instances_share_directory(tmp_path):
+    """
+    Check that two caches on the same folder keep each other's entries and
+    blobs, and that each one sees the entries the other stored.
+    """
+    first = func_cache.ResponseCache(str(tmp_path))
+    second = func_cache.ResponseCache(str(tmp_path))
+    first.put("k1", [{"date": "2013-01-01", "value": 1}], "2013-01-01")
+    second.put("k2", [{"date": "2013-01-01", "value": 2}], "2013-01-01")
+
+    assert first.get("k1") is not None
+    assert first.get("k2") is not None
+    assert second.get("k1") is not None
+    second.invalidate("k2")
+    assert first.get("k2") is None
+    assert first.get("k1")[0] == [{"date": "2013-01-01", "value": 1}]
+
+
+def test_get_does_not_rewrite_index(tmp_path):
+    """
+    Check that lookups do not save the index, and that their access times
+    are saved with the next change.
+    """
+    now = [0.0]
+    cache = func_cache.ResponseCache(str(tmp_path), clock=lambda: now[0])
+    cache.put("key", [], "2013-01-01")
+    index_path = tmp_path / func_cache.INDEX_NAME
+    modified = os.stat(index_path).st_mtime_ns
+
+    now[0] = 5.0
+    assert cache.get("key") == ([], "2013-01-01")
+    assert os.stat(index_path).st_mtime_ns == modified
+    cache.put("other", [], "2013-01-01")
+    other = func_cache.ResponseCache(str(tmp_path))
+    assert other.index["key"]["last_access"] == 5.0
+
+
+def test_refresh_saves_access_time(tmp_path):
+    """
+    Check that a refresh without new data saves the time the entry was used,
+    so that it is not evicted as unused.
+    """
+    args = ("GSOM", ["S"], ["TAVG"], "2013-01-01", "2013-06-01", "standard")
+    cache = func_cache.ResponseCache(str(tmp_path), clock=lambda: 0.0)
+    func_cache.cached_fetch(make_fetch([], 6), *args, cache=cache)
+
+    now = 400 * 86400.0
+    for _ in range(3):
+        cache = func_cache.ResponseCache(str(tmp_path), clock=lambda: now)
+        calls = []
+        func_cache.cached_fetch(make_fetch(calls, 6), *args, cache=cache)
+        assert not calls
+
+    cache = func_cache.ResponseCache(str(tmp_path), clock=lambda: now)
+    assert cache.evict() == []
+    assert list(cache.index.values())[0]["last_access"] == now
+
+
+def test_empty_query_is_cached(tmp_path):
+    """
+    Check that a query without any data is not fetched again in full.
+    """
+    cache = func_cache.ResponseCache(str(tmp_path))
+    args = ("GSOM", ["S"], ["TAVG"], "2013-01-01", "2013-12-31", "standard")
+
+    calls = []
+    first = func_cache.cached_fetch(make_fetch(calls, 0), *args, cache=cache)
+    assert first == {("S", "TAVG"): []}
+    assert len(calls) == 1
+
+    calls = []
+    second = func_cache.cached_fetch(make_fetch(calls, 0), *args, cache=cache)
+    assert second == {("S", "TAVG"): []}
+    assert not calls
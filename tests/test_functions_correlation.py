@@ -0,0 +1,82 @@
+"""
+File to run pytest unit tests on different helper functions in
+functions_correlation.py
+"""
+
+import importlib.util
+import numpy as np
+import pandas as pd
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "function", "./functions/functions_correlation.py"
+)
+func_corr = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func_corr)
+
+
+@pytest.fixture(name="df_all_data")
+def fixture_df_all_data():
+    """
+    Creates a wide dataframe of 120 months of made-up weather features and a
+    consumption that depends on two of them.
+
+    Returns:
+        A pandas dataframe with TAVG, AWND, PRCP and total_consumption
+        columns.
+    """
+    rng = np.random.default_rng(0)
+    df_all_data = pd.DataFrame(
+        {
+            "TAVG": rng.normal(50, 15, 120),
+            "AWND": rng.normal(10, 2, 120),
+            "PRCP": rng.gamma(2, 2, 120),
+        }
+    )
+    df_all_data["total_consumption"] = (
+        3e5 + 2e3 * df_all_data["TAVG"] - 5e3 * df_all_data["AWND"]
+    ) + rng.normal(0, 2e4, 120)
+    return df_all_data
+
+
+def test_corr_with_target(df_all_data):
+    """
+    Check that every correlation matches `np.corrcoef`.
+    """
+    r_values = func_corr.corr_with_target(df_all_data)
+    for feature in ["TAVG", "AWND", "PRCP"]:
+        expected = np.corrcoef(
+            df_all_data[feature], df_all_data["total_consumption"]
+        )[0][1]
+        assert r_values[feature] == pytest.approx(expected)
+
+
+def test_rolling_corr(df_all_data):
+    """
+    Check that rolling correlations match pandas' rolling correlation.
+    """
+    df_rolling = func_corr.rolling_corr(df_all_data, windows=(12, 24))
+    for feature in ["TAVG", "AWND", "PRCP"]:
+        for window in (12, 24):
+            expected = (
+                df_all_data[feature]
+                .rolling(window)
+                .corr(df_all_data["total_consumption"])
+            )
+            np.testing.assert_allclose(
+                df_rolling[f"{feature}_{window}"], expected
+            )
+
+
+def test_bootstrap_corr_ci(df_all_data):
+    """
+    Check that the confidence intervals contain the observed correlation and
+    are reproducible with a seed.
+    """
+    df_ci = func_corr.bootstrap_corr_ci(df_all_data, n_bootstrap=500, seed=1)
+    assert (df_ci["ci_low"] <= df_ci["pearson_r_value"]).all()
+    assert (df_ci["pearson_r_value"] <= df_ci["ci_high"]).all()
+    pd.testing.assert_frame_equal(
+        df_ci,
+        func_corr.bootstrap_corr_ci(df_all_data, n_bootstrap=500, seed=1),
+    )
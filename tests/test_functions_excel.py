@@ -0,0 +1,75 @@
+"""
+File to run pytest unit tests on different helper functions in
+functions_excel.py
+"""
+
+import importlib
+import os
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+# Imported by its package name rather than from its file, so that the process
+# pool can find `parse_sheet` in the worker processes
+func_excel = importlib.import_module("functions.functions_excel")
+
+ROW_LABELS = [
+    "Start Read Date",
+    "End Read Date",
+    "Total Cons. (kwh)",
+    "Time of Peak Demand",
+    "Total Monthly Electricity Cost",
+    "Demand (kw)",
+]
+
+
+def write_workbook(path, fiscal_years):
+    """
+    Write a workbook laid out like the Olin utility spreadsheet, with one
+    sheet per fiscal year and a sheet that is not a fiscal year.
+
+    Args:
+        path: a string of the path of the workbook to write.
+        fiscal_years: a list of integers of the fiscal years (ex. 13).
+    """
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Notes"
+    for year in fiscal_years:
+        sheet = workbook.create_sheet(f"FY{year}")
+        for row, label in enumerate(ROW_LABELS, start=1):
+            sheet.cell(row=row, column=3, value=label)
+            for month in range(12):
+                sheet.cell(row=row, column=4 + month, value=year * 100 + month)
+    workbook.save(path)
+
+
+def test_load_sheets_discovers_fiscal_years(tmp_path):
+    """
+    Check that only fiscal-year sheets are read, one row per month, with the
+    useful columns renamed.
+    """
+    workbook_path = str(tmp_path / "utility.xlsx")
+    write_workbook(workbook_path, [14, 13])
+    frames = func_excel.load_sheets(workbook_path, str(tmp_path / "cache"))
+    assert len(frames) == 2
+    assert list(frames[0].columns) == func_excel.COLUMN_NAMES
+    assert frames[0]["total_consumption"].tolist() == list(range(1300, 1312))
+    assert frames[1]["start_read_date"].tolist() == list(range(1400, 1412))
+
+
+def test_load_sheets_parses_only_new_sheets(tmp_path):
+    """
+    Check that adding a sheet keeps the cached sheets of the existing ones
+    and caches only the new one.
+    """
+    workbook_path = str(tmp_path / "utility.xlsx")
+    cache_dir = tmp_path / "cache"
+    write_workbook(workbook_path, [13, 14])
+    func_excel.load_sheets(workbook_path, str(cache_dir))
+    cached = set(os.listdir(cache_dir))
+
+    write_workbook(workbook_path, [13, 14, 15])
+    frames = func_excel.load_sheets(workbook_path, str(cache_dir))
+    assert len(frames) == 3
+    assert cached < set(os.listdir(cache_dir))
+    assert len(set(os.listdir(cache_dir)) - cached) == 1
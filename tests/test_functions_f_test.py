@@ -3,8 +3,11 @@ File to run pytest unit tests on different helper functions in
 functions_f_test.py
 """
 
+import importlib
 import importlib.util
 from os import path
+import numpy as np
+import pandas as pd
 import pytest
 
 spec = importlib.util.spec_from_file_location(
@@ -23,21 +26,21 @@ DATATYPES = ["TAVG", "PRCP", "AWND"]
 
 
 @pytest.fixture(scope="session")
-def input_results():
+def input_data():
     """
-    Fixture to return a pandas dataframe of results after F-test.
+    Fixture to return the features and target used in the F-test.
 
     Args:
         Nothing.
     Returns:
-        df_results: A pandas dataframe that represent the results of the F-test
-        with features, F-score, p-value as its columns.
+        A tuple of a pandas dataframe of the features and a pandas series of
+        the total monthly electricity consumption.
     """
     for datatype in DATATYPES:
-        if path.isfile(f"data/{datatype}.json"):
-            pass
-        else:
-            func_manage_data.get_data_api(datatype)
+        if not path.isfile(f"data/{datatype}.json"):
+            pytest.skip(
+                f"data/{datatype}.json is missing, run get_data_api to fetch it"
+            )
 
     df_avg_temp = func_manage_data.flatten_json("TAVG")
     df_total_prcp = func_manage_data.flatten_json("PRCP")
@@ -48,9 +51,22 @@ def input_results():
     )
     features = df_all_data.drop(columns=["total_consumption", "year-month"])
     target = df_all_data["total_consumption"]
+    return features, target
+
+
+@pytest.fixture(scope="session")
+def input_results(input_data):
+    """
+    Fixture to return a pandas dataframe of results after F-test.
+
+    Args:
+        input_data: the features and target returned by input_data().
+    Returns:
+        df_results: A pandas dataframe that represent the results of the F-test
+        with features, F-score, p-value as its columns.
+    """
+    features, target = input_data
     df_results = func_f_test.feature_selection(features, target)
-    print("test")
-    print(df_results)
     return df_results
 
 
@@ -80,3 +96,118 @@ def test_p_value(input_results):
         with "p-value" as one of its columns.
     """
     assert (input_results["p-value"] >= 0).all()
+
+
+def test_incremental_f_regression(input_data, tmp_path):
+    """
+    Check that updating the incremental F-test in batches, saving and loading
+    it, gives the same results as `feature_selection` for every target.
+
+    Args:
+        input_data: the features and target returned by input_data().
+        tmp_path: a temporary folder to save the state in.
+    """
+    features, target = input_data
+    targets = features[["total_cost"]].assign(total_consumption=target)
+    features = features.drop(columns=["total_cost"])
+    state_path = str(tmp_path / "state.json")
+
+    scorer = func_f_test.IncrementalFRegression(
+        features.columns, targets.columns
+    )
+    scorer.update(features.iloc[:50], targets.iloc[:50])
+    scorer.save(state_path)
+    scorer = func_f_test.IncrementalFRegression.load(state_path)
+    scorer.update(features.iloc[50:], targets.iloc[50:])
+
+    for target_name in targets.columns:
+        expected = func_f_test.feature_selection(
+            features, targets[target_name]
+        )
+        df_results = scorer.results(target_name)
+        assert df_results["Feature"].tolist() == expected["Feature"].tolist()
+        np.testing.assert_allclose(df_results["F-Score"], expected["F-Score"])
+        np.testing.assert_allclose(df_results["p-value"], expected["p-value"])
+
+
+def test_permutation_p_values(input_data):
+    """
+    Check that permutation p-values keep the shape of the results, are
+    reproducible with a seed, and agree with the parametric p-values about
+    which features are significant.
+
+    Args:
+        input_data: the features and target returned by input_data().
+    """
+    features, target = input_data
+    expected = func_f_test.feature_selection(features, target)
+    df_results = func_f_test.feature_selection(
+        features, target, n_permutations=2000, seed=0
+    )
+    assert list(df_results.columns) == list(expected.columns)
+    assert df_results["Feature"].tolist() == expected["Feature"].tolist()
+    assert (df_results["p-value"] > 0).all()
+    assert (df_results["p-value"] <= 1).all()
+    significant = df_results["p-value"] < 0.01
+    assert (significant == (expected["p-value"] < 0.01)).all()
+    pd.testing.assert_frame_equal(
+        df_results,
+        func_f_test.feature_selection(
+            features, target, n_permutations=2000, seed=0
+        ),
+    )
+
+
+def test_permutation_p_values_process_pool(input_data):
+    """
+    Check that spreading the permutations over a process pool gives the same
+    p-values as a single process with the same seed.
+
+    Args:
+        input_data: the features and target returned by input_data().
+    """
+    # Imported by its package name rather than from its file, so that the
+    # process pool can find the worker function
+    func_f_test_pkg = importlib.import_module("functions.functions_f_test")
+    features, target = input_data
+    p_values = func_f_test_pkg.permutation_p_values(
+        features, target, 4000, seed=0, max_workers=2
+    )
+    expected = func_f_test.permutation_p_values(features, target, 4000, seed=0)
+    np.testing.assert_array_equal(p_values, expected)
+
+
+def test_feature_selection_sweep(input_data, input_results):
+    """
+    Check that the sweep has one row per configuration and feature, that its
+    F-scores over all months match `feature_selection`, and that a process
+    pool gives the same table.
+    """
+    features, target = input_data
+    df_sweep = func_f_test.feature_selection_sweep(
+        features, target, ks=(2, 4), n_splits=3, seed=0
+    )
+    n_configs = 2 * (1 + len(func_f_test.SEASONS)) * 2
+    assert len(df_sweep) == n_configs * features.shape[1]
+    assert df_sweep["stability"].between(0, 1).all()
+
+    df_all = df_sweep[
+        (df_sweep["score_function"] == "f_regression")
+        & (df_sweep["season"] == "All")
+        & (df_sweep["k"] == 2)
+    ]
+    assert df_all["feature"].tolist() == input_results["Feature"].tolist()
+    assert df_all["score"].to_numpy() == pytest.approx(
+        input_results["F-Score"].to_numpy()
+    )
+    assert df_all["selected"].tolist() == [True, True] + [False] * (
+        len(df_all) - 2
+    )
+
+    # Imported by its package name rather than from its file, so that the
+    # process pool can find the worker function
+    func_f_test_pkg = importlib.import_module("functions.functions_f_test")
+    df_pool = func_f_test_pkg.feature_selection_sweep(
+        features, target, ks=(2, 4), n_splits=3, seed=0, max_workers=2
+    )
+    pd.testing.assert_frame_equal(df_sweep, df_pool)
@@ -0,0 +1,131 @@
+"""
+File to run pytest unit tests on the feature engineering in
+functions_features.py
+"""
+
+import importlib.util
+import numpy as np
+import pandas as pd
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "function", "./functions/functions_features.py"
+)
+func_features = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func_features)
+
+
+@pytest.fixture(name="df_wide")
+def fixture_df_wide():
+    """
+    Creates a wide table of 90 days of random temperature and precipitation.
+
+    Returns:
+        A pandas dataframe shaped like the output of `build_wide_table`.
+    """
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "date": pd.date_range("2013-01-01", periods=90, freq="D"),
+            "TAVG": rng.normal(55, 15, 90),
+            "PRCP": rng.exponential(0.1, 90),
+        }
+    )
+
+
+def test_degree_days():
+    """
+    Check the heating and cooling degree days of each base temperature.
+    """
+    heating, cooling = func_features.degree_days([50.0, 70.0], (60, 65))
+    assert heating.tolist() == [[10.0, 15.0], [0.0, 0.0]]
+    assert cooling.tolist() == [[0.0, 0.0], [10.0, 5.0]]
+
+
+def test_build_features_matches_pandas(df_wide):
+    """
+    Check that the lags and rolling features match the ones computed column
+    by column with pandas.
+    """
+    df_features = func_features.build_features(
+        df_wide, bases=(65,), lags=(1, 7), windows=(3, 30)
+    )
+    assert len(df_features.columns) == 1 + 4 * (1 + 2 + 2 * 2)
+    for column in ["TAVG", "PRCP", "HDD_65", "CDD_65"]:
+        series = df_features[column]
+        pd.testing.assert_series_equal(
+            df_features[f"{column}_lag7"], series.shift(7), check_names=False
+        )
+        for window in (3, 30):
+            rolling = series.rolling(window)
+            np.testing.assert_allclose(
+                df_features[f"{column}_mean{window}"], rolling.mean()
+            )
+            np.testing.assert_allclose(
+                df_features[f"{column}_max{window}"], rolling.max()
+            )
+
+
+def test_rolling_with_missing_values():
+    """
+    Check that a missing value only makes the rolling windows containing it
+    missing, like pandas.
+    """
+    values = np.arange(10.0).reshape(-1, 1)
+    values[2] = np.nan
+    expected = pd.Series(values[:, 0]).rolling(3)
+    np.testing.assert_allclose(
+        func_features.rolling_mean(values, 3)[:, 0], expected.mean()
+    )
+    np.testing.assert_allclose(
+        func_features.rolling_max(values, 3)[:, 0], expected.max()
+    )
+    assert np.isfinite(func_features.rolling_mean(values, 3)[5:]).all()
+
+
+def test_monthly_features(df_wide):
+    """
+    Check that daily features are averaged over each month, ignoring the
+    missing values of the first rolling windows.
+    """
+    df_features = func_features.build_features(
+        df_wide, bases=(), lags=(), windows=(40,)
+    )
+    df_monthly = func_features.monthly_features(df_features)
+    assert df_monthly["date"].tolist() == list(
+        pd.date_range("2013-01-01", periods=3, freq="MS")
+    )
+    assert df_monthly["TAVG"].iloc[1] == pytest.approx(
+        df_wide["TAVG"].iloc[31:59].mean()
+    )
+    assert np.isnan(df_monthly["TAVG_mean40"].iloc[0])
+    assert df_monthly["TAVG_mean40"].iloc[1] == pytest.approx(
+        df_features["TAVG_mean40"].iloc[39:59].mean()
+    )
+
+
+def test_feature_matrix(df_wide):
+    """
+    Check that the features line up with the bills of the same month, and
+    that rows with missing features are dropped.
+    """
+    list_df_weather = [
+        df_wide[["date", datatype]]
+        .rename(columns={datatype: "value"})
+        .assign(datatype=datatype)
+        for datatype in ["TAVG", "PRCP"]
+    ]
+    df_util = pd.DataFrame(
+        {
+            "start_read_date": ["2013-01-05", "2013-02-04", "2013-03-06"],
+            "total_consumption": [3.0, 2.0, 1.0],
+        }
+    )
+    features, target = func_features.feature_matrix(
+        list_df_weather, df_util, lags=(1,), windows=(40,)
+    )
+    assert target.tolist() == [2.0, 1.0]
+    assert features.notna().all().all()
+    assert features["TAVG"].iloc[0] == pytest.approx(
+        df_wide["TAVG"].iloc[31:59].mean()
+    )
@@ -0,0 +1,150 @@
+"""
+File to run pytest unit tests on different helper functions in
+functions_fetch_data.py
+"""
+
+import importlib.util
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "function", "./functions/functions_fetch_data.py"
+)
+func_fetch_data = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func_fetch_data)
+
+RESULT_COUNT = 25
+
+
+class FakeCDOHandler(BaseHTTPRequestHandler):
+    """
+    Serves paginated results shaped like the CDO API's `data` endpoint.
+    """
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Respond with the page of results requested by `offset` and `limit`.
+        """
+        query = parse_qs(urlparse(self.path).query)
+        offset = int(query["offset"][0])
+        limit = int(query["limit"][0])
+        results = [
+            {
+                "date": f"2013-01-{i:02d}T00:00:00",
+                "datatype": query["datatypeid"][0],
+                "station": query["stationid"][0],
+                "attributes": ",W",
+                "value": float(i),
+            }
+            for i in range(offset, min(offset + limit, RESULT_COUNT + 1))
+        ]
+        body = json.dumps(
+            {
+                "metadata": {
+                    "resultset": {
+                        "offset": offset,
+                        "count": RESULT_COUNT,
+                        "limit": limit,
+                    }
+                },
+                "results": results,
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+@pytest.fixture(scope="module")
+def fake_cdo_url():
+    """
+    Runs a local stand-in for the CDO API for the duration of the tests.
+
+    Returns:
+        A string of the URL of the local server.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeCDOHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/data"
+    server.shutdown()
+
+
+def test_split_date_range():
+    """
+    Check that a date range is split into consecutive chunks that cover the
+    whole range without overlapping.
+    """
+    ranges = func_fetch_data.split_date_range("2013-04-01", "2015-12-31", 1)
+    assert ranges == [
+        ("2013-04-01", "2014-03-31"),
+        ("2014-04-01", "2015-03-31"),
+        ("2015-04-01", "2015-12-31"),
+    ]
+
+
+def test_token_bucket_waits_when_empty():
+    """
+    Check that the token bucket sleeps once its capacity is used up.
+    """
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    bucket = func_fetch_data.TokenBucket(5, 5, lambda: now[0], sleep)
+    for _ in range(10):
+        bucket.acquire()
+    assert now[0] == pytest.approx(1.0)
+
+
+def test_daily_usage_shared_between_limiters(tmp_path):
+    """
+    Check that limiters sharing a usage file share the daily quota, and wait
+    for the next day once it is used up.
+    """
+    now = [86400 * 20000 + 3600.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    usage_path = str(tmp_path / "usage.json")
+    for _ in range(2):
+        usage = func_fetch_data.DailyUsage(
+            usage_path, 3, lambda: now[0], sleep
+        )
+        usage.acquire()
+        usage.acquire()
+    assert now[0] == 86400 * 20001
+    with open(usage_path, encoding="utf-8") as file:
+        assert list(json.load(file).values()) == [1]
+
+
+def test_fetch_data_follows_pagination(fake_cdo_url, tmp_path):
+    """
+    Check that every page of every query is fetched and kept in order.
+    """
+    queries = func_fetch_data.build_queries(
+        "GSOM", ["GHCND:A"], ["TAVG", "PRCP"], "2013-01-01", "2013-12-31", ""
+    )
+    limiter = func_fetch_data.RateLimiter(
+        usage_path=str(tmp_path / "usage.json")
+    )
+    results = func_fetch_data.fetch_data(
+        queries, "token", url=fake_cdo_url, limit=10, limiter=limiter
+    )
+    assert len(results) == 2
+    for query, query_results in zip(queries, results):
+        assert [row["value"] for row in query_results] == [
+            float(i) for i in range(1, RESULT_COUNT + 1)
+        ]
+        assert {row["datatype"] for row in query_results} == {
+            query["datatypeid"]
+        }
@@ -5,6 +5,8 @@ functions_manage_data.py
 
 from os import path
 import importlib.util
+import json
+import shutil
 import pandas as pd
 import pytest
 
@@ -27,14 +29,18 @@ def create_df():
         A pandas dataframe containing all weather and utility information
         about the TAVG datatype.
     """
-    if path.isfile("data/TAVG.json"):
-        pass
-    else:
-        func_manage_data.get_data_api("TAVG")
+    if not path.isfile("data/TAVG.json"):
+        pytest.skip("data/TAVG.json is missing, run get_data_api to fetch it")
 
     df_avg_temp = func_manage_data.flatten_json("TAVG")
-    df_util = pd.read_csv("./data/electricity_FY13_23.csv")
-    df_util_temp = func_manage_data.join_dataframes(df_avg_temp, df_util)
+    # The original utility data is private, fall back to the jittered data
+    if path.isfile(func_manage_data.PATH_UTILITY):
+        df_util = pd.read_csv(func_manage_data.PATH_UTILITY)
+    else:
+        df_util = pd.read_csv(func_manage_data.PATH_UTILITY_JITTERED)
+    df_util_temp = func_manage_data.join_dataframes(
+        df_avg_temp, df_util, year_month=True
+    )
     return df_util_temp
 
 
@@ -65,3 +71,221 @@ def test_filter_season(season_name, season_nums, create_df):
         .dt.strftime("%m")
         .isin(season_nums)
     )
+
+
+def test_filter_unknown_season(create_df):
+    """
+    Check that a misspelled season raises an error instead of giving an
+    empty dataframe.
+
+    Args:
+        create_df: the dataframe returned by create_df().
+    """
+    with pytest.raises(KeyError):
+        func_manage_data.filter_season("Autumn", create_df)
+
+
+@pytest.mark.parametrize("read_size", [7, 1 << 16])
+def test_iter_json_results(read_size):
+    """
+    Check that streaming the results of a .json file yields the same results
+    as loading the whole file, however the reads split the file.
+
+    Args:
+        read_size: the number of characters read from the file at a time.
+    """
+    with open("data/TAVG.json", encoding="utf-8") as file:
+        expected = json.load(file)["results"]
+    results = list(
+        func_manage_data.iter_json_results("data/TAVG.json", read_size)
+    )
+    assert results == expected
+
+
+def test_flatten_json_chunks():
+    """
+    Check that the chunks of a streamed .json file have at most `chunk_size`
+    rows and together match the flattened file.
+    """
+    chunks = list(func_manage_data.flatten_json_chunks("TAVG", chunk_size=50))
+    assert [len(chunk) for chunk in chunks] == [50, 50, 17]
+    df_streamed = pd.concat(chunks, ignore_index=True)
+    df_avg_temp = func_manage_data.flatten_json("TAVG")
+    assert df_streamed["value"].tolist() == df_avg_temp["value"].tolist()
+    assert (df_streamed["date"] == df_avg_temp["date"]).all()
+
+
+def test_flatten_json_chunks_data_dir(tmp_path):
+    """
+    Check that a .json file is streamed from a folder given without a
+    trailing separator.
+    """
+    shutil.copy("data/TAVG.json", tmp_path / "TAVG.json")
+    chunks = func_manage_data.flatten_json_chunks(
+        "TAVG", data_dir=str(tmp_path)
+    )
+    assert sum(len(chunk) for chunk in chunks) == 117
+
+
+def test_flatten_json_data_dir(tmp_path):
+    """
+    Check that a .json file in another folder is flattened into a columnar
+    store in that folder.
+    """
+    shutil.copy("data/TAVG.json", tmp_path / "TAVG.json")
+    df_avg_temp = func_manage_data.flatten_json("TAVG", data_dir=tmp_path)
+    assert (tmp_path / "columnar" / "TAVG").is_dir()
+    assert len(df_avg_temp) == 117
+
+
+def test_join_dataframes_leaves_inputs_untouched():
+    """
+    Check that joining matches rows by month and does not add or convert
+    columns of the input dataframes.
+    """
+    df_weather = pd.DataFrame(
+        {
+            "date": ["2013-04-01T00:00:00", "2013-05-01T00:00:00"],
+            "value": [1, 2],
+        }
+    )
+    df_util = pd.DataFrame(
+        {
+            "start_read_date": ["2013-05-06 00:00:00", "2013-04-05 00:00:00"],
+            "total_consumption": [20, 10],
+        }
+    )
+    df_weather_copy = df_weather.copy()
+    df_util_copy = df_util.copy()
+
+    df_joined = func_manage_data.join_dataframes(
+        df_weather, df_util, year_month=True
+    )
+    assert df_joined["value"].tolist() == [2, 1]
+    assert df_joined["year-month"].tolist() == ["2013-05", "2013-04"]
+    assert df_joined["period"].tolist() == [
+        (2013 - 1970) * 12 + 4,
+        (2013 - 1970) * 12 + 3,
+    ]
+    pd.testing.assert_frame_equal(df_weather, df_weather_copy)
+    pd.testing.assert_frame_equal(df_util, df_util_copy)
+
+
+def test_build_wide_table():
+    """
+    Check that the wide table has one column per datatype, named after the
+    data, and keeps only the dates present in every dataframe.
+    """
+    df_temp = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2013-01-01", "2013-02-01", "2013-03-01"]),
+            "datatype": "TAVG",
+            "value": [30.0, 32.0, 40.0],
+        }
+    )
+    df_prcp = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2013-03-01", "2013-01-01"]),
+            "datatype": "PRCP",
+            "value": [3.0, 1.0],
+        }
+    )
+    df_wide = func_manage_data.build_wide_table([df_prcp, df_temp])
+    assert list(df_wide.columns) == ["date", "PRCP", "TAVG"]
+    assert df_wide["PRCP"].tolist() == [1.0, 3.0]
+    assert df_wide["TAVG"].tolist() == [30.0, 40.0]
+
+
+def test_read_utility_compact(tmp_path):
+    """
+    Check that a compact load of the utility data gives float32 values and
+    times of peak demand as minutes after midnight.
+    """
+    util_path = tmp_path / "utility.csv"
+    pd.DataFrame(
+        {
+            "start_read_date": ["2013-04-05", "2013-05-06"],
+            "end_read_date": ["2013-05-06", "2013-06-04"],
+            "total_consumption": [10.5, 20.25],
+            "time_of_peak_demand": ["13:30:00", "00:05:00"],
+        }
+    ).to_csv(util_path, index=False)
+    df_util = func_manage_data.read_utility(util_path, compact=True)
+    assert df_util["total_consumption"].dtype == "float32"
+    assert df_util["time_of_peak_demand"].dtype == "int16"
+    assert df_util["time_of_peak_demand"].tolist() == [810, 5]
+
+
+def test_merge_all_df_compact():
+    """
+    Check that the compact merged dataframe uses less memory and holds the
+    same values as the default one.
+    """
+    df_util = pd.read_csv(func_manage_data.PATH_UTILITY_JITTERED)
+    df_default = func_manage_data.merge_all_df(
+        [func_manage_data.flatten_json("TAVG")], df_util
+    )
+    df_compact = func_manage_data.merge_all_df(
+        [func_manage_data.flatten_json("TAVG", compact=True)],
+        df_util,
+        compact=True,
+    )
+    assert list(df_compact.columns) == list(df_default.columns)
+    assert df_compact["TAVG"].dtype == "float32"
+    assert df_compact["year-month"].dtype == "category"
+    assert (
+        df_compact.memory_usage(deep=True).sum()
+        < df_default.memory_usage(deep=True).sum()
+    )
+    for column in ["TAVG", "total_consumption"]:
+        assert df_compact[column].to_numpy(float) == pytest.approx(
+            df_default[column].to_numpy(float), rel=1e-6
+        )
+    # The default dataframe holds hours, the compact one minutes
+    assert df_compact["time_of_peak_demand"].to_numpy() / 60 == pytest.approx(
+        df_default["time_of_peak_demand"].to_numpy()
+    )
+
+
+@pytest.fixture(name="df_months")
+def fixture_df_months():
+    """
+    Creates a dataframe with one row per month from July 2012 to June 2014.
+
+    Returns:
+        A pandas dataframe with `date` and `total_consumption` columns.
+    """
+    return pd.DataFrame(
+        {
+            "date": pd.date_range("2012-07-01", periods=24, freq="MS"),
+            "total_consumption": range(24),
+        }
+    )
+
+
+def test_partition_seasons(df_months):
+    """
+    Check that partitioning gives the same rows as filtering each season,
+    and that every row belongs to one season.
+    """
+    partitions = func_manage_data.partition_seasons(df_months)
+    assert list(partitions) == list(func_manage_data.SEASONS)
+    for season, df_season in partitions.items():
+        pd.testing.assert_frame_equal(
+            df_season, func_manage_data.filter_season(season, df_months)
+        )
+    assert sum(len(df) for df in partitions.values()) == len(df_months)
+
+
+def test_season_summary_custom_seasons(df_months):
+    """
+    Check the counts and means of custom seasons grouped by fiscal year.
+    """
+    seasons = {"Cooling": (6, 7, 8, 9), "Heating": (12, 1, 2)}
+    df_summary = func_manage_data.season_summary(
+        df_months, seasons=seasons, by_fiscal_year=True
+    )
+    assert df_summary.loc[("Cooling", 2013), "count"] == 4
+    assert df_summary.loc[("Cooling", 2013), "mean"] == (0 + 1 + 2 + 11) / 4
+    assert df_summary.loc[("Heating", 2013), "mean"] == 6.0
+    assert df_summary.loc[("Heating", 2014), "q1"] == 19.0
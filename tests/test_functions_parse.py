@@ -0,0 +1,69 @@
+"""
+File to run pytest unit tests on the shared parsing in functions_parse.py
+"""
+
+import importlib.util
+import numpy as np
+import pandas as pd
+
+spec = importlib.util.spec_from_file_location(
+    "function", "./functions/functions_parse.py"
+)
+func_parse = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func_parse)
+
+
+def test_time_to_minutes():
+    """
+    Check that times with and without seconds are converted to minutes, that
+    missing times stay missing, and that the index is kept.
+    """
+    times = pd.Series(
+        ["13:13:00", "00:05", None, "13:13:00"], index=[4, 3, 2, 1]
+    )
+    minutes = func_parse.time_to_minutes(times)
+    assert minutes.dtype == "Int16"
+    assert minutes.index.tolist() == [4, 3, 2, 1]
+    assert minutes.tolist()[:2] == [793, 5]
+    assert minutes.isna().tolist() == [False, False, True, False]
+    assert func_parse.time_to_minutes(times[[4, 3]]).dtype == "int16"
+
+
+def test_to_datetime64_formats():
+    """
+    Check that CDO dates and utility read dates are parsed without inferring
+    their format.
+    """
+    dates = pd.Series(["2013-04-01T00:00:00", "2013-04-05 12:30:00"])
+    assert func_parse.to_datetime64(dates).tolist() == [
+        np.datetime64("2013-04-01T00:00:00", "ns").item(),
+        np.datetime64("2013-04-05T12:30:00", "ns").item(),
+    ]
+
+
+def test_parse_after_change():
+    """
+    Check that a column changed in place is parsed again from its new
+    values.
+    """
+    df_util = pd.DataFrame(
+        {
+            "date": ["2020-06-01", "2020-06-02"],
+            "time_of_peak_demand": ["13:13:00", "00:05:00"],
+        }
+    )
+    func_parse.to_datetime64(df_util["date"])
+    func_parse.time_to_minutes(df_util["time_of_peak_demand"])
+    df_util.loc[0, "date"] = "2020-07-01"
+    df_util.loc[0, "time_of_peak_demand"] = "23:59"
+    assert func_parse.to_datetime64(df_util["date"])[0] == np.datetime64(
+        "2020-07-01"
+    )
+    assert func_parse.time_to_minutes(
+        df_util["time_of_peak_demand"]
+    ).tolist() == [1439, 5]
+
+    times = np.array(["13:13", "00:05"], dtype=object)
+    func_parse.time_to_minutes(pd.Series(times, copy=False))
+    times[0] = "23:59"
+    assert func_parse.time_to_minutes(pd.Series(times, copy=False))[0] == 1439
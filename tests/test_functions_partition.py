@@ -0,0 +1,121 @@
+"""
+File to run pytest unit tests on the partitioned merge and scoring in
+functions_partition.py
+"""
+
+import importlib
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+
+# Imported by its package name rather than from its file, so that the process
+# pool can find the worker function
+func_partition = importlib.import_module("functions.functions_partition")
+func_manage_data = importlib.import_module("functions.functions_manage_data")
+
+DATATYPES = ["TAVG", "PRCP"]
+
+
+@pytest.fixture(name="data_dir")
+def fixture_data_dir(tmp_path):
+    """
+    Copies the weather .json files into a temporary folder.
+
+    Returns:
+        A pathlib path of the folder.
+    """
+    for datatype in DATATYPES:
+        shutil.copy(f"data/{datatype}.json", tmp_path / f"{datatype}.json")
+    return tmp_path
+
+
+def test_split_utility(tmp_path):
+    """
+    Check that splitting the utility data in chunks gives one file per
+    partition of years, which together hold every row.
+    """
+    util_path = func_manage_data.PATH_UTILITY_JITTERED
+    paths = func_partition.split_utility(
+        util_path, tmp_path, years_per_partition=2, chunksize=7
+    )
+    assert list(paths) == [2012, 2014, 2016, 2018, 2020, 2022]
+    df_parts = pd.concat(pd.read_csv(path) for path in paths.values())
+    pd.testing.assert_frame_equal(
+        df_parts.reset_index(drop=True), pd.read_csv(util_path)
+    )
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_partitioned_matches_whole(data_dir, max_workers):
+    """
+    Check that the statistics combined from the partitions match the ones of
+    the whole merged dataframe, and that the merged partitions are saved.
+    """
+    util_path = func_manage_data.PATH_UTILITY_JITTERED
+    scorer, df_partitions = func_partition.merge_and_score_partitioned(
+        DATATYPES,
+        util_path,
+        data_dir,
+        output_dir=data_dir / "merged",
+        max_workers=max_workers,
+    )
+    df_all_data = func_manage_data.merge_all_df(
+        [
+            func_manage_data.flatten_json(datatype, data_dir=data_dir)
+            for datatype in DATATYPES
+        ],
+        pd.read_csv(util_path),
+    )
+    whole = func_partition.IncrementalFRegression(
+        scorer.features, scorer.targets
+    ).update(df_all_data, df_all_data)
+
+    assert scorer.n_rows == len(df_all_data) == df_partitions["rows"].sum()
+    assert np.allclose(scorer.corr(), whole.corr(), rtol=1e-12)
+    assert np.allclose(scorer.f_scores()[0], whole.f_scores()[0], rtol=1e-9)
+    df_merged = pd.concat(map(pd.read_pickle, df_partitions["path"]))
+    pd.testing.assert_frame_equal(
+        df_merged.reset_index(drop=True), df_all_data
+    )
+
+
+def test_year_without_weather(data_dir):
+    """
+    Check that a year of utility data without any weather is skipped rather
+    than scored on other features, and does not change the statistics.
+    """
+    df_util = pd.read_csv(func_manage_data.PATH_UTILITY_JITTERED)
+    df_late = df_util.tail(2).assign(
+        start_read_date=["2030-01-05 00:00:00", "2030-02-04 00:00:00"],
+        end_read_date=["2030-02-04 00:00:00", "2030-03-06 00:00:00"],
+    )
+    util_path = data_dir / "utility.csv"
+    pd.concat([df_util, df_late]).to_csv(util_path, index=False)
+
+    scorer, df_partitions = func_partition.merge_and_score_partitioned(
+        DATATYPES, util_path, data_dir, output_dir=data_dir / "merged"
+    )
+    whole, _ = func_partition.merge_and_score_partitioned(
+        DATATYPES,
+        func_manage_data.PATH_UTILITY_JITTERED,
+        data_dir,
+        years_per_partition=100,
+    )
+    last = df_partitions.iloc[-1]
+    assert last["partition"] == 2030
+    assert last["rows"] == 0
+    assert pd.isna(last["path"])
+    assert scorer.features == whole.features
+    assert scorer.n_rows == whole.n_rows
+    assert np.allclose(scorer.corr(), whole.corr(), rtol=1e-12)
+
+
+def test_no_datatypes(data_dir):
+    """
+    Check that scoring without any weather datatype is refused.
+    """
+    with pytest.raises(ValueError):
+        func_partition.merge_and_score_partitioned(
+            [], func_manage_data.PATH_UTILITY_JITTERED, data_dir
+        )
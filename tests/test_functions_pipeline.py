@@ -0,0 +1,181 @@
+"""
+File to run pytest unit tests on the pipeline runner in
+functions_pipeline.py
+"""
+
+import importlib.util
+import threading
+import time
+
+spec = importlib.util.spec_from_file_location(
+    "function", "./functions/functions_pipeline.py"
+)
+func_pipeline = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func_pipeline)
+
+
+def read_number(path):
+    """
+    Read a number from a text file.
+    """
+    with open(path, encoding="utf-8") as file:
+        return int(file.read())
+
+
+def scale(number, factor):
+    """
+    Multiply a number by a factor.
+    """
+    return number * factor
+
+
+def add(*numbers):
+    """
+    Add numbers.
+    """
+    return sum(numbers)
+
+
+def make_stages(input_path, factor=2):
+    """
+    Build a pipeline reading a number, scaling it in two branches and adding
+    the branches.
+
+    Args:
+        input_path: a path of the text file holding the number.
+        factor: an integer of the factor of the first branch.
+    Returns:
+        A list of `Stage` objects.
+    """
+    return [
+        func_pipeline.Stage(
+            "read",
+            read_number,
+            params={"path": input_path},
+            files=(input_path,),
+        ),
+        func_pipeline.Stage(
+            "double", scale, deps=("read",), params={"factor": factor}
+        ),
+        func_pipeline.Stage(
+            "triple", scale, deps=("read",), params={"factor": 3}
+        ),
+        func_pipeline.Stage("add", add, deps=("double", "triple")),
+    ]
+
+
+def run(stages, directory, force=()):
+    """
+    Run a new pipeline over the stages without printing.
+
+    Returns:
+        A tuple of the set of names of the stages that ran and the pipeline.
+    """
+    pipeline = func_pipeline.Pipeline(stages, directory)
+    timings = pipeline.run(force, max_workers=2, log=lambda line: None)
+    return set(timings), pipeline
+
+
+def test_only_stale_stages_run(tmp_path):
+    """
+    Check that stages only run again when their inputs change, and that the
+    stages after a changed stage run again too.
+    """
+    input_path = str(tmp_path / "number.txt")
+    (tmp_path / "number.txt").write_text("5")
+    directory = tmp_path / "pipeline"
+
+    ran, pipeline = run(make_stages(input_path), directory)
+    assert ran == {"read", "double", "triple", "add"}
+    assert pipeline.output("add") == 25
+
+    ran, _ = run(make_stages(input_path), directory)
+    assert not ran
+
+    ran, pipeline = run(make_stages(input_path, factor=4), directory)
+    assert ran == {"double", "add"}
+    assert pipeline.output("add") == 35
+
+    (tmp_path / "number.txt").write_text("1")
+    ran, pipeline = run(make_stages(input_path, factor=4), directory)
+    assert ran == {"read", "double", "triple", "add"}
+    assert pipeline.output("add") == 7
+
+    ran, _ = run(make_stages(input_path, factor=4), directory, ["triple"])
+    assert ran == {"triple", "add"}
+
+
+def test_source_stage_adopts_files(tmp_path):
+    """
+    Check that a source stage is not run when its files already exist, and
+    runs before the stages reading its files otherwise.
+    """
+    input_path = str(tmp_path / "number.txt")
+    calls = []
+
+    def write_number():
+        calls.append(1)
+        (tmp_path / "number.txt").write_text("2")
+
+    stages = [
+        func_pipeline.Stage(
+            "write", write_number, files=(input_path,), source=True
+        ),
+        func_pipeline.Stage(
+            "read",
+            read_number,
+            after=("write",),
+            params={"path": input_path},
+            files=(input_path,),
+        ),
+    ]
+    ran, pipeline = run(stages, tmp_path / "pipeline")
+    assert ran == {"write", "read"}
+    assert pipeline.output("read") == 2
+
+    (tmp_path / "pipeline" / "manifest.json").unlink()
+    ran, _ = run(stages, tmp_path / "pipeline")
+    assert ran == {"read"}
+    assert len(calls) == 1
+
+
+def test_stages_sharing_lock_run_one_at_a_time(tmp_path):
+    """
+    Check that independent stages with the same lock do not overlap, while
+    other independent stages still run at the same time.
+    """
+    active = {"cdo": 0, None: 0}
+    overlaps = {"cdo": 0, None: 0}
+    guard = threading.Lock()
+
+    def sleep(lock):
+        with guard:
+            active[lock] += 1
+            overlaps[lock] = max(overlaps[lock], active[lock])
+        time.sleep(0.05)
+        with guard:
+            active[lock] -= 1
+
+    stages = [
+        func_pipeline.Stage(
+            f"{lock}_{i}", sleep, params={"lock": lock}, lock=lock
+        )
+        for lock in ("cdo", None)
+        for i in range(3)
+    ]
+    ran, _ = run(stages, tmp_path / "pipeline")
+    assert len(ran) == 6
+    assert overlaps == {"cdo": 1, None: 2}
+
+
+def test_plots_stage_tracks_plot_code():
+    """
+    Check that the figures are rendered again when the plotting functions
+    change.
+    """
+    stages = {
+        stage.name: stage for stage in func_pipeline.default_stages(("TAVG",))
+    }
+    code = stages["plots"].code
+    assert func_pipeline.plot_f_test in code
+    assert set(func_pipeline.WEATHER_UTIL_PLOTS) <= set(code)
@@ -0,0 +1,61 @@
+"""
+File to run pytest unit tests on different helper functions in
+functions_plot_data.py
+"""
+
+import importlib.util
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+
+spec = importlib.util.spec_from_file_location(
+    "function", "./functions/functions_plot_data.py"
+)
+func_plot = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func_plot)
+
+
+@pytest.mark.parametrize("n_points", [10, 2000, 2001, 123457])
+def test_decimate(n_points):
+    """
+    Check that decimation keeps at most `MAX_POINTS` sorted positions,
+    including both ends and the extremes of the series.
+
+    Args:
+        n_points: an integer of the length of the series.
+    """
+    values = np.random.default_rng(0).normal(size=n_points)
+    values[n_points // 3] = np.nan
+    positions = func_plot.decimate(values)
+
+    assert len(positions) <= func_plot.MAX_POINTS
+    assert np.all(np.diff(positions) > 0)
+    assert positions[0] == 0 and positions[-1] == n_points - 1
+    assert np.nanargmax(values) in positions
+    assert np.nanargmin(values) in positions
+
+
+def test_corr_hexbin():
+    """
+    Check that scatter plots with many rows are drawn as hexagonal bins.
+    """
+    n_rows = func_plot.HEXBIN_THRESHOLD + 1
+    values = np.random.default_rng(0).normal(size=n_rows)
+    df_util_weather = pd.DataFrame(
+        {"datatype": "TAVG", "value": values, "total_consumption": values * 2}
+    )
+    subplot = Figure().subplots()
+    func_plot.plot_weather_util_corr(df_util_weather, subplot)
+    assert isinstance(subplot.collections[0], PolyCollection)
+
+
+def test_setup_fonts_cached():
+    """
+    Check that a missing font family keeps the default font, and that the
+    font lookup only runs once.
+    """
+    assert func_plot.setup_fonts("No Such Font Family") is False
+    func_plot.setup_fonts("No Such Font Family")
+    assert func_plot.setup_fonts.cache_info().hits >= 1
@@ -0,0 +1,88 @@
+"""
+File to run pytest unit tests on the profiler in functions_profile.py
+"""
+
+import importlib.util
+import types
+import numpy as np
+
+spec = importlib.util.spec_from_file_location(
+    "function", "./functions/functions_profile.py"
+)
+func_profile = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func_profile)
+
+PIPELINE_SOURCE = """
+def load():
+    return list(range(5))
+
+
+def run():
+    return load()[:3]
+"""
+
+
+def make_pipeline():
+    """
+    Make a module of two functions, one calling the other.
+
+    Returns:
+        A module object.
+    """
+    module = types.ModuleType("pipeline")
+    exec(PIPELINE_SOURCE, module.__dict__)  # pylint: disable=exec-used
+    return module
+
+
+def test_nested_stages():
+    """
+    Check that nested stages record their parent, and that the peak memory
+    of the inner stage counts towards the outer stage.
+    """
+    with func_profile.profile(modules=[]) as profiler:
+        with func_profile.stage("outer"):
+            with func_profile.stage("inner") as span:
+                span["rows"] = len(np.ones(10**6))
+    spans = {span["name"]: span for span in profiler.spans}
+
+    assert spans["inner"]["parent"] == "outer"
+    assert spans["inner"]["depth"] == 1
+    assert spans["inner"]["rows"] == 10**6
+    assert spans["outer"]["wall_s"] >= spans["inner"]["wall_s"]
+    assert spans["inner"]["peak_mb"] >= 8
+    assert spans["outer"]["peak_mb"] >= spans["inner"]["peak_mb"]
+
+
+def test_instrument_module():
+    """
+    Check that the functions of a module are profiled, including calls
+    between them, and restored afterwards.
+    """
+    pipeline = make_pipeline()
+    original_run = pipeline.run
+    with func_profile.profile(modules=[pipeline]) as profiler:
+        assert pipeline.run is not original_run
+        assert pipeline.run() == [0, 1, 2]
+    assert pipeline.run is original_run
+
+    df_summary = profiler.summary()
+    assert df_summary.loc["pipeline.run", "rows"] == 3
+    assert df_summary.loc["pipeline.load", "rows"] == 5
+
+    events = profiler.to_chrome_trace()["traceEvents"]
+    assert [event["name"] for event in events] == [
+        "pipeline.run",
+        "pipeline.load",
+    ]
+    assert all(event["ph"] == "X" for event in events)
+
+
+def test_disabled():
+    """
+    Check that stages and profiled functions still run when profiling is
+    disabled.
+    """
+    pipeline = make_pipeline()
+    with func_profile.stage("ignored") as span:
+        span["rows"] = 1
+    assert func_profile.profiled(pipeline.run)() == [0, 1, 2]
@@ -0,0 +1,103 @@
+"""
+File to run pytest unit tests on different helper functions in
+functions_render.py
+"""
+
+import importlib
+import importlib.util
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "function", "./functions/functions_render.py"
+)
+func_render = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func_render)
+
+
+@pytest.fixture(name="jobs")
+def fixture_jobs():
+    """
+    Builds the jobs of two made-up weather against consumption figures.
+
+    Returns:
+        A list of (name, kind, data) tuples.
+    """
+    dates = pd.date_range("2013-01-01", periods=24, freq="MS")
+    jobs = []
+    for datatype in ("TAVG", "PRCP"):
+        df_util_weather = pd.DataFrame(
+            {
+                "date": dates,
+                "datatype": datatype,
+                "value": np.sin(np.arange(24.0)),
+                "total_consumption": np.arange(24.0) * 1e4,
+            }
+        )
+        jobs.append((datatype, "weather_util", df_util_weather))
+    return jobs
+
+
+def test_render_skips_unchanged(jobs, tmp_path):
+    """
+    Check that figures are written in every format, that rendering again
+    skips them, and that only the figure whose data changed is rendered.
+    """
+    formats = ("png", "svg")
+    rendered = func_render.render_figures(jobs, tmp_path, formats, 1)
+    assert rendered == ["TAVG", "PRCP"]
+    for name in rendered:
+        for file_format in formats:
+            assert (tmp_path / f"{name}.{file_format}").stat().st_size > 0
+
+    assert not func_render.render_figures(jobs, tmp_path, formats, 1)
+
+    jobs[1][2].loc[0, "value"] = 10.0
+    assert func_render.render_figures(jobs, tmp_path, formats, 1) == ["PRCP"]
+
+
+def test_render_pool(jobs, tmp_path):
+    """
+    Check that figures are rendered by a process pool.
+    """
+    # Workers must be importable by name, which a module loaded from its file
+    # path is not
+    func_render_pkg = importlib.import_module("functions.functions_render")
+    rendered = func_render_pkg.render_figures(jobs, tmp_path, max_workers=2)
+    assert sorted(rendered) == ["PRCP", "TAVG"]
+    assert (tmp_path / "TAVG.png").is_file()
+
+
+def test_render_without_pyplot(tmp_path):
+    """
+    Check that rendering figures to files never imports pyplot.
+    """
+    code = f"""
+import sys
+import numpy as np
+import pandas as pd
+from functions.functions_render import render_batch
+df_results = pd.DataFrame({{"F-Score": np.arange(6.0)}})
+df_util_weather = pd.DataFrame(
+    {{
+        "date": pd.date_range("2013-01-01", periods=12, freq="MS"),
+        "datatype": "TAVG",
+        "value": np.arange(12.0),
+        "total_consumption": np.arange(12.0) ** 2,
+    }}
+)
+render_batch(
+    [
+        ("f_test", "f_test", df_results),
+        ("TAVG", "weather_util", df_util_weather),
+    ],
+    {str(tmp_path)!r},
+)
+assert "matplotlib.pyplot" not in sys.modules
+"""
+    subprocess.run([sys.executable, "-c", code], check=True)
+    for name in ["f_test", "TAVG"]:
+        assert (tmp_path / f"{name}.png").stat().st_size > 0
@@ -0,0 +1,154 @@
+"""
+File to run pytest unit tests on different helper functions in
+functions_stations.py
+"""
+
+import importlib
+import importlib.util
+import json
+import numpy as np
+import pytest
+
+# Imported by its package name rather than from its file, so that the process
+# pool can find the worker function
+func_stations = importlib.import_module("functions.functions_stations")
+
+spec = importlib.util.spec_from_file_location(
+    "function", "./functions/functions_cache.py"
+)
+func_cache = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func_cache)
+
+
+@pytest.fixture(name="stations", scope="module")
+def fixture_stations():
+    """
+    Creates a catalog of made-up stations spread over New England, with
+    varying coverage and date ranges.
+
+    Returns:
+        A list of station dictionaries shaped like the CDO stations endpoint.
+    """
+    rng = np.random.default_rng(0)
+    return [
+        {
+            "id": f"GHCND:TEST{i:05d}",
+            "name": f"STATION {i}",
+            "latitude": rng.uniform(41, 45),
+            "longitude": rng.uniform(-74, -69),
+            "mindate": "1990-01-01" if i % 3 else "2015-01-01",
+            "maxdate": "2023-03-01",
+            "datacoverage": 1 if i % 2 else 0.5,
+        }
+        for i in range(2000)
+    ]
+
+
+def test_nearest_matches_brute_force(stations):
+    """
+    Check that the nearest eligible stations are the same as found by
+    computing the distance to every station.
+    """
+    index = func_stations.StationIndex(stations)
+    df_nearest = index.nearest(
+        42.29, -71.26, k=5, min_coverage=0.9, start_date="2013-04-01"
+    )
+
+    eligible = [
+        station
+        for station in stations
+        if station["datacoverage"] >= 0.9
+        and station["mindate"] <= "2013-04-01"
+    ]
+    distances = func_stations.haversine_km(
+        42.29,
+        -71.26,
+        np.array([station["latitude"] for station in eligible]),
+        np.array([station["longitude"] for station in eligible]),
+    )
+    order = np.argsort(distances)[:5]
+    assert df_nearest["id"].tolist() == [eligible[i]["id"] for i in order]
+    np.testing.assert_allclose(df_nearest["distance_km"], distances[order])
+
+
+def fetch_local(queries):
+    """
+    Answer CDO queries with the results of the .json files of the data
+    folder, and without any results for AWND.
+    """
+    output = []
+    for query in queries:
+        if query["datatypeid"] == "AWND":
+            output.append([])
+            continue
+        path = f"data/{query['datatypeid']}.json"
+        with open(path, encoding="utf-8") as file:
+            output.append(json.load(file)["results"])
+    return output
+
+
+@pytest.mark.parametrize("max_processes", [1, 2])
+def test_run_sites(tmp_path, max_processes):
+    """
+    Check that a batch run scores every site with the nearest station that
+    has data over the whole date range, and reports the errors of the sites
+    that fail without stopping the others.
+    """
+    index = func_stations.StationIndex.from_json("data/station.json")
+
+    sites = [
+        {
+            "name": name,
+            "latitude": 42.29,
+            "longitude": -71.26,
+            "utility_path": "data/electricity_FY13_23_jittered.csv",
+        }
+        for name in ["Olin", "Olin again"]
+    ]
+    sites.append(dict(sites[0], name="No utility", utility_path="missing"))
+    outputs = func_stations.run_sites(
+        sites,
+        index,
+        ["TAVG", "PRCP"],
+        fetch=fetch_local,
+        max_processes=max_processes,
+        cache=func_cache.ResponseCache(str(tmp_path)),
+    )
+    assert list(outputs) == ["Olin", "Olin again", "No utility"]
+    for name in ["Olin", "Olin again"]:
+        assert outputs[name]["station"] == "GHCND:USW00014739"
+        assert outputs[name]["error"] is None
+        assert set(outputs[name]["results"]["Feature"]) >= {"TAVG", "PRCP"}
+    assert outputs["No utility"]["results"] is None
+    assert outputs["No utility"]["error"].startswith("FileNotFoundError")
+
+
+def test_run_sites_without_data(tmp_path):
+    """
+    Check that a station without results for a datatype gives a clear
+    error for its site.
+    """
+    index = func_stations.StationIndex.from_json("data/station.json")
+    site = {
+        "name": "Olin",
+        "latitude": 42.29,
+        "longitude": -71.26,
+        "utility_path": "data/electricity_FY13_23_jittered.csv",
+    }
+    outputs = func_stations.run_sites(
+        [site],
+        index,
+        ["TAVG", "AWND"],
+        fetch=fetch_local,
+        cache=func_cache.ResponseCache(str(tmp_path)),
+    )
+    assert outputs["Olin"]["results"] is None
+    assert "No AWND data" in outputs["Olin"]["error"]
+    with pytest.raises(ValueError, match="No AWND data"):
+        func_stations.run_site(
+            site,
+            index,
+            ["AWND"],
+            fetch_local,
+            cache=func_cache.ResponseCache(str(tmp_path)),
+        )
@@ -0,0 +1,109 @@
+"""
+File to run pytest unit tests on different helper functions in
+functions_store.py
+"""
+
+import importlib.util
+import pandas as pd
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "function", "./functions/functions_store.py"
+)
+func_store = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func_store)
+
+
+@pytest.fixture(name="records")
+def fixture_records():
+    """
+    Creates a dataframe shaped like the flattened results of a CDO response,
+    with dates out of order.
+
+    Returns:
+        A pandas dataframe of CDO results.
+    """
+    return pd.DataFrame(
+        {
+            "date": [
+                "2013-03-01T00:00:00",
+                "2013-01-01T00:00:00",
+                "2013-02-01T00:00:00",
+            ],
+            "datatype": ["TAVG", "TAVG", "TAVG"],
+            "station": ["GHCND:A", "GHCND:A", "GHCND:A"],
+            "attributes": [",W", ",W", "2,W"],
+            "value": [3.0, 1.0, 2.0],
+        }
+    )
+
+
+def test_round_trip_sorted_by_date(records, tmp_path):
+    """
+    Check that a stored dataset loads back with the same values, sorted by
+    date and with typed date and value columns.
+    """
+    func_store.write_columnar(records, "TAVG", str(tmp_path))
+    loaded = func_store.read_columnar("TAVG", directory=str(tmp_path))
+    assert loaded["value"].tolist() == [1.0, 2.0, 3.0]
+    assert loaded["attributes"].tolist() == [",W", "2,W", ",W"]
+    assert loaded["date"].dtype == "datetime64[ns]"
+
+
+def test_column_subset_and_date_range(records, tmp_path):
+    """
+    Check that only the requested columns and dates are loaded.
+    """
+    func_store.write_columnar(records, "TAVG", str(tmp_path))
+    loaded = func_store.read_columnar(
+        "TAVG",
+        columns=["date", "value"],
+        start_date="2013-02-01",
+        end_date="2013-03-01",
+        directory=str(tmp_path),
+    )
+    assert list(loaded.columns) == ["date", "value"]
+    assert loaded["value"].tolist() == [2.0, 3.0]
+
+
+def test_compact_dtypes(records, tmp_path):
+    """
+    Check that a compact load gives categorical strings and float32 values
+    with the same contents.
+    """
+    func_store.write_columnar(records, "TAVG", str(tmp_path))
+    loaded = func_store.read_columnar(
+        "TAVG", directory=str(tmp_path), compact=True
+    )
+    assert loaded["station"].dtype == "category"
+    assert loaded["value"].dtype == "float32"
+    assert loaded["attributes"].tolist() == [",W", "2,W", ",W"]
+    assert loaded["value"].tolist() == [1.0, 2.0, 3.0]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_missing_strings(records, tmp_path, compact):
+    """
+    Check that missing strings load back as missing, not as another value.
+    """
+    records["attributes"] = [",W", None, "X"]
+    func_store.write_columnar(records, "TAVG", str(tmp_path))
+    loaded = func_store.read_columnar(
+        "TAVG", directory=str(tmp_path), compact=compact
+    )
+    assert loaded["attributes"].isna().tolist() == [True, False, False]
+    assert loaded["attributes"].tolist()[1:] == ["X", ",W"]
+
+
+def test_empty_results(tmp_path):
+    """
+    Check that a response without any results gives an empty dataframe
+    with the columns of CDO results.
+    """
+    records = pd.json_normalize({"results": []}, record_path=["results"])
+    func_store.write_columnar(records, "TAVG", str(tmp_path))
+    loaded = func_store.read_columnar(
+        "TAVG", start_date="2013-01-01", directory=str(tmp_path)
+    )
+    assert loaded.empty
+    assert list(loaded.columns) == list(func_store.RESULT_COLUMNS)
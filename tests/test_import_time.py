@@ -0,0 +1,69 @@
+"""
+File to run pytest checks on how fast the helper modules import, so that
+scripts only using some of them start quickly.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+# Packages that each take from a fraction of a second to seconds to import
+HEAVY_PACKAGES = ("matplotlib", "requests", "scipy", "sklearn")
+
+LIGHT_MODULES = [
+    "functions.functions_billing",
+    "functions.functions_cache",
+    "functions.functions_correlation",
+    "functions.functions_excel",
+    "functions.functions_f_test",
+    "functions.functions_features",
+    "functions.functions_fetch_data",
+    "functions.functions_manage_data",
+    "functions.functions_parse",
+    "functions.functions_partition",
+    "functions.functions_plot_data",
+    "functions.functions_stations",
+    "functions.functions_store",
+    "jitter_data",
+]
+
+
+def import_times(module):
+    """
+    Import a module in a new interpreter with `-X importtime`.
+
+    Args:
+        module: a string of the name of the module to import.
+    Returns:
+        A dictionary mapping the name of every imported module to its
+        cumulative import time in microseconds.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("module", LIGHT_MODULES)
+def test_no_heavy_imports(module):
+    """
+    Check that importing a module does not import any heavy package, which
+    should only be imported by the functions using them.
+
+    Args:
+        module: a string of the name of the module to import.
+    """
+    times = import_times(module)
+    assert module in times
+    heavy = [name for name in times if name.split(".")[0] in HEAVY_PACKAGES]
+    assert not heavy
@@ -0,0 +1,84 @@
+"""
+File to run pytest unit tests on the functions in jitter_data.py
+"""
+
+import importlib.util
+import numpy as np
+import pandas as pd
+
+spec = importlib.util.spec_from_file_location("function", "./jitter_data.py")
+jitter_data = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(jitter_data)
+
+PATH_JITTERED = "data/electricity_FY13_23_jittered.csv"
+
+
+class ZeroNoise:
+    """
+    Stands in for a `np.random.Generator` drawing no noise at all.
+    """
+
+    def standard_normal(self, size):
+        """
+        Returns:
+            A numpy array of zeros of the given shape.
+        """
+        return np.zeros(size)
+
+
+def test_jitter_keeps_times_without_noise():
+    """
+    Check that every minute of the day, with or without seconds, comes back
+    unchanged from a jitter without noise.
+    """
+    times = list(jitter_data.TIME_LABELS) + ["09:05", "00:59:30"]
+    df_raw = pd.DataFrame(
+        {
+            "total_consumption": 1.0,
+            "time_of_peak_demand": times,
+            "total_cost": 1.0,
+        }
+    )
+    df_jittered = jitter_data.jitter_chunk(df_raw, ZeroNoise())
+    assert df_jittered["time_of_peak_demand"].tolist() == list(
+        jitter_data.TIME_LABELS
+    ) + ["09:05:00", "00:59:00"]
+
+
+def test_jitter_times_in_whole_minutes():
+    """
+    Check that jittered times are whole minutes of the day.
+    """
+    df_raw = pd.DataFrame(
+        {
+            "total_consumption": np.zeros(1000),
+            "time_of_peak_demand": "23:59:00",
+            "total_cost": np.zeros(1000),
+        }
+    )
+    df_jittered = jitter_data.jitter_chunk(df_raw, np.random.default_rng(0))
+    times = df_jittered["time_of_peak_demand"]
+    assert times.isin(jitter_data.TIME_LABELS).all()
+    assert times.nunique() > 1
+
+
+def test_jitter_reproducible(tmp_path):
+    """
+    Check that the jittered file only depends on the seed, not the chunk
+    size, and keeps the columns of the raw data.
+    """
+    outputs = []
+    for chunksize in (7, 1000):
+        output_path = tmp_path / f"jittered_{chunksize}.csv"
+        jitter_data.jitter_utility_df(
+            PATH_JITTERED, output_path, seed=0, chunksize=chunksize
+        )
+        outputs.append(pd.read_csv(output_path))
+    df_raw = pd.read_csv(PATH_JITTERED)
+
+    pd.testing.assert_frame_equal(outputs[0], outputs[1])
+    assert list(outputs[0].columns) == list(df_raw.columns)
+    assert len(outputs[0]) == len(df_raw)
+    assert not np.allclose(
+        outputs[0]["total_consumption"], df_raw["total_consumption"]
+    )